@@ -1,920 +1,489 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, g, render_template, request, jsonify, session, stream_with_context
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import base64
+import json
+import sqlite3
+import threading
+import time
 import uuid
 import os
 
+from cpu8085 import (CLOCK_HZ, DECODE_TABLE, FLAG_BITS, MAX_CHECKPOINT_NAME, MAX_RUN_INSTRUCTIONS,
+                     MAX_RUN_SECONDS, TRACE_RECORD, WATCH_ACCESS, ZERO_PAGE, AssemblyCache, AssemblyError,
+                     InterruptController, InterruptEvent, Microprocessor8085, RegisterFile, ScriptedPort,
+                     parse_intel_hex)
+
 app = Flask(__name__)
 # Use environment variable for secret key with a fallback for development
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'dev_key_for_development_only')
 
-class Microprocessor8085:
-    def __init__(self):
-        # Initialize registers
-        self.registers = {
-            'A': 0x00,  # Accumulator
-            'B': 0x00,
-            'C': 0x00,
-            'D': 0x00,
-            'E': 0x00,
-            'H': 0x00,
-            'L': 0x00,
-            'PC': 0x0000,  # Program Counter
-            'SP': 0xFFFF,  # Stack Pointer
-        }
-        self.flags = {
-            'S': False,  # Sign
-            'Z': False,  # Zero
-            'AC': False,  # Auxiliary Carry
-            'P': False,  # Parity
-            'CY': False,  # Carry
-        }
-        self.memory = [0x00] * 65536  # 64KB memory
-        self.is_running = False
-
-    def reset(self):
-        self.__init__()
-
-    def load_program(self, program, start_address=0):
-        """Load a program into memory starting at the specified address"""
-        for i, byte in enumerate(program):
-            self.memory[start_address + i] = byte
-        self.registers['PC'] = start_address
-
-    def get_state(self):
-        """Return the current state of the microprocessor"""
-        # Make sure memory is properly initialized
-        if not hasattr(self, 'memory') or not self.memory or len(self.memory) != 65536:
-            self.memory = [0x00] * 65536
-        
-        # Make sure registers are properly initialized
-        if not hasattr(self, 'registers') or not self.registers:
-            self.registers = {
-                'A': 0x00,  # Accumulator
-                'B': 0x00,
-                'C': 0x00,
-                'D': 0x00,
-                'E': 0x00,
-                'H': 0x00,
-                'L': 0x00,
-                'PC': 0x0000,  # Program Counter
-                'SP': 0xFFFF,  # Stack Pointer
-            }
-        
-        # Make sure flags are properly initialized
-        if not hasattr(self, 'flags') or not self.flags:
-            self.flags = {
-                'S': False,  # Sign
-                'Z': False,  # Zero
-                'AC': False,  # Auxiliary Carry
-                'P': False,  # Parity
-                'CY': False,  # Carry
-            }
-        
-        return {
-            'registers': self.registers,
-            'flags': self.flags,
-            'memory': self.memory,  # Return the entire memory
-            'pc': self.registers['PC']
-        }
-    
-    def goto_address(self, address):
-        """Set the program counter to a specific address"""
-        if 0 <= address <= 0xFFFF:
-            self.registers['PC'] = address
-            return True
-        return False
-    
-    def write_to_memory(self, address, value):
-        """Write a value to a specific memory address"""
-        if 0 <= address <= 0xFFFF and 0 <= value <= 0xFF:
-            self.memory[address] = value
-            return True
-        return False
-    
-    def execute_instruction(self):
-        """Execute the instruction at the current program counter"""
-        # Get the current instruction
-        opcode = self.memory[self.registers['PC']]
-        
-        # Helper function to get HL address
-        def get_hl_address():
-            return (self.registers['H'] << 8) | self.registers['L']
-        
-        # Helper function to set HL address
-        def set_hl(value):
-            self.registers['H'] = (value >> 8) & 0xFF
-            self.registers['L'] = value & 0xFF
-        
-        # Helper function to get BC address
-        def get_bc_address():
-            return (self.registers['B'] << 8) | self.registers['C']
-        
-        # Helper function to get DE address
-        def get_de_address():
-            return (self.registers['D'] << 8) | self.registers['E']
-        
-        # Helper function to update flags for arithmetic operations
-        def update_flags_arithmetic(result, carry=None):
-            self.flags['S'] = (result & 0x80) != 0
-            self.flags['Z'] = (result & 0xFF) == 0
-            if carry is not None:
-                self.flags['CY'] = carry
-            # Calculate parity
-            temp = result & 0xFF
-            parity = True
-            while temp:
-                parity = not parity
-                temp = temp & (temp - 1)
-            self.flags['P'] = parity
-        
-        # Helper function to push value onto stack
-        def push(value):
-            self.registers['SP'] = (self.registers['SP'] - 1) & 0xFFFF
-            self.memory[self.registers['SP']] = (value >> 8) & 0xFF
-            self.registers['SP'] = (self.registers['SP'] - 1) & 0xFFFF
-            self.memory[self.registers['SP']] = value & 0xFF
-        
-        # Helper function to pop value from stack
-        def pop():
-            value = self.memory[self.registers['SP']]
-            self.registers['SP'] = (self.registers['SP'] + 1) & 0xFFFF
-            value |= self.memory[self.registers['SP']] << 8
-            self.registers['SP'] = (self.registers['SP'] + 1) & 0xFFFF
-            return value
-        
-        # Execute the instruction based on opcode
-        if opcode == 0x00:  # NOP
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-            
-        elif opcode == 0x07:  # RLC
-            # Get the current value in accumulator
-            a = self.registers['A']
-            # Get the most significant bit
-            msb = (a & 0x80) != 0
-            # Rotate left by 1 bit
-            a = ((a << 1) | (1 if msb else 0)) & 0xFF
-            # Update accumulator
-            self.registers['A'] = a
-            # Update carry flag with the old MSB
-            self.flags['CY'] = msb
-            # Update other flags
-            self.flags['S'] = (a & 0x80) != 0
-            self.flags['Z'] = (a & 0xFF) == 0
-            # Calculate parity
-            temp = a & 0xFF
-            parity = True
-            while temp:
-                parity = not parity
-                temp = temp & (temp - 1)
-            self.flags['P'] = parity
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        elif opcode == 0x0F:  # RRC (Rotate Right through Carry)
-            # Get the current value in accumulator
-            a = self.registers['A']
-            # Get the least significant bit
-            lsb = (a & 0x01) != 0
-            # Rotate right by 1 bit
-            a = ((a >> 1) | (0x80 if lsb else 0)) & 0xFF
-            # Update accumulator
-            self.registers['A'] = a
-            # Update carry flag with the old LSB
-            self.flags['CY'] = lsb
-            # Update other flags
-            self.flags['S'] = (a & 0x80) != 0
-            self.flags['Z'] = (a & 0xFF) == 0
-            # Calculate parity
-            temp = a & 0xFF
-            parity = True
-            while temp:
-                parity = not parity
-                temp = temp & (temp - 1)
-            self.flags['P'] = parity
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        elif opcode == 0x17:  # RAL (Rotate Left through Accumulator)
-            # Get the current value in accumulator
-            a = self.registers['A']
-            # Get the most significant bit
-            msb = (a & 0x80) != 0
-            # Get the current carry
-            cy = self.flags['CY']
-            # Rotate left by 1 bit
-            a = ((a << 1) | (1 if cy else 0)) & 0xFF
-            # Update accumulator
-            self.registers['A'] = a
-            # Update carry flag with the old MSB
-            self.flags['CY'] = msb
-            # Update other flags
-            self.flags['S'] = (a & 0x80) != 0
-            self.flags['Z'] = (a & 0xFF) == 0
-            # Calculate parity
-            temp = a & 0xFF
-            parity = True
-            while temp:
-                parity = not parity
-                temp = temp & (temp - 1)
-            self.flags['P'] = parity
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        elif opcode == 0x1F:  # RAR (Rotate Right through Accumulator)
-            # Get the current value in accumulator
-            a = self.registers['A']
-            # Get the least significant bit
-            lsb = (a & 0x01) != 0
-            # Get the current carry
-            cy = self.flags['CY']
-            # Rotate right by 1 bit
-            a = ((a >> 1) | (0x80 if cy else 0)) & 0xFF
-            # Update accumulator
-            self.registers['A'] = a
-            # Update carry flag with the old LSB
-            self.flags['CY'] = lsb
-            # Update other flags
-            self.flags['S'] = (a & 0x80) != 0
-            self.flags['Z'] = (a & 0xFF) == 0
-            # Calculate parity
-            temp = a & 0xFF
-            parity = True
-            while temp:
-                parity = not parity
-                temp = temp & (temp - 1)
-            self.flags['P'] = parity
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        elif opcode == 0x27:  # DAA
-            # Get the current value in accumulator
-            a = self.registers['A']
-            # Get the current flags
-            ac = self.flags['AC']
-            cy = self.flags['CY']
-            
-            # Adjust for decimal arithmetic
-            if ((a & 0x0F) > 9) or ac:
-                a += 0x06
-                self.flags['AC'] = True
-            else:
-                self.flags['AC'] = False
-                
-            if ((a & 0xF0) > 0x90) or cy:
-                a += 0x60
-                self.flags['CY'] = True
-            else:
-                self.flags['CY'] = False
-                
-            # Update accumulator with adjusted value
-            self.registers['A'] = a & 0xFF
-            # Update other flags
-            self.flags['S'] = (a & 0x80) != 0
-            self.flags['Z'] = (a & 0xFF) == 0
-            # Calculate parity
-            temp = a & 0xFF
-            parity = True
-            while temp:
-                parity = not parity
-                temp = temp & (temp - 1)
-            self.flags['P'] = parity
-            
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # MOV instructions (register to register)
-        elif 0x40 <= opcode <= 0x7F:
-            src_reg = "BCDEHLMA"[(opcode & 0x07)]
-            dst_reg = "BCDEHLMA"[((opcode >> 3) & 0x07)]
-            
-            # Skip HLT opcode (0x76)
-            if opcode == 0x76:
-                return {'success': True, 'halt': True}
-            
-            # Special handling for MOV B,A (0x47) which is often problematic
-            if opcode == 0x47:  # MOV B,A
-                self.registers['B'] = self.registers['A']
-                self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-                return {'success': True}
-                
-            # Handle memory access
-            if src_reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[src_reg]
-                
-            if dst_reg == 'M':
-                self.memory[get_hl_address()] = value
-            else:
-                self.registers[dst_reg] = value
-                
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # XCHG instruction
-        elif opcode == 0xEB:  # XCHG
-            # Exchange H and L with D and E
-            h_val = self.registers['H']
-            l_val = self.registers['L']
-            self.registers['H'] = self.registers['D']
-            self.registers['L'] = self.registers['E']
-            self.registers['D'] = h_val
-            self.registers['E'] = l_val
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # MVI instructions (immediate to register)
-        elif opcode in [0x06, 0x0E, 0x16, 0x1E, 0x26, 0x2E, 0x36, 0x3E]:
-            reg = "BCDEHLMA"[(opcode >> 3) & 0x07]
-            value = self.memory[self.registers['PC'] + 1]
-            
-            if reg == 'M':
-                self.memory[get_hl_address()] = value
-            else:
-                self.registers[reg] = value
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-        
-        # LXI instructions (immediate to register pair)
-        elif opcode in [0x01, 0x11, 0x21, 0x31]:
-            low = self.memory[self.registers['PC'] + 1]
-            high = self.memory[self.registers['PC'] + 2]
-            
-            if opcode == 0x01:  # LXI B
-                self.registers['B'] = high
-                self.registers['C'] = low
-            elif opcode == 0x11:  # LXI D
-                self.registers['D'] = high
-                self.registers['E'] = low
-            elif opcode == 0x21:  # LXI H
-                self.registers['H'] = high
-                self.registers['L'] = low
-            else:  # LXI SP
-                self.registers['SP'] = (high << 8) | low
-            self.registers['PC'] = (self.registers['PC'] + 3) & 0xFFFF
-        
-        # Direct Addressing Instructions
-        elif opcode == 0x32:  # STA addr
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            addr = (addr_high << 8) | addr_low
-            self.memory[addr] = self.registers['A']
-            self.registers['PC'] = (self.registers['PC'] + 3) & 0xFFFF
-            
-        elif opcode == 0x3A:  # LDA addr
-            # Get the operand bytes
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            
-            # Calculate the address
-            addr = (addr_high << 8) | addr_low
-            
-            # Load from memory into accumulator
-            self.registers['A'] = self.memory[addr]
-            
-            # Increment PC by 3 (one for opcode, two for address)
-            self.registers['PC'] = (self.registers['PC'] + 3) & 0xFFFF
-            return {'success': True}
-        
-        elif opcode == 0x22:  # SHLD addr
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            addr = (addr_high << 8) | addr_low
-            self.memory[addr] = self.registers['L']
-            self.memory[addr + 1] = self.registers['H']
-            self.registers['PC'] = (self.registers['PC'] + 3) & 0xFFFF
-            
-        elif opcode == 0x2A:  # LHLD addr
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            addr = (addr_high << 8) | addr_low
-            self.registers['L'] = self.memory[addr]
-            self.registers['H'] = self.memory[addr + 1]
-            self.registers['PC'] = (self.registers['PC'] + 3) & 0xFFFF
-        
-        # STAX and LDAX instructions
-        elif opcode in [0x02, 0x12, 0x0A, 0x1A]:
-            if opcode == 0x02:  # STAX B
-                self.memory[get_bc_address()] = self.registers['A']
-            elif opcode == 0x12:  # STAX D
-                self.memory[get_de_address()] = self.registers['A']
-            elif opcode == 0x0A:  # LDAX B
-                self.registers['A'] = self.memory[get_bc_address()]
-            else:  # LDAX D
-                self.registers['A'] = self.memory[get_de_address()]
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # ADD instructions
-        elif 0x80 <= opcode <= 0x87:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] + value
-            self.registers['A'] = result & 0xFF
-            update_flags_arithmetic(result, result > 0xFF)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # ADC instructions
-        elif 0x88 <= opcode <= 0x8F:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] + value + (1 if self.flags['CY'] else 0)
-            self.registers['A'] = result & 0xFF
-            update_flags_arithmetic(result, result > 0xFF)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # SUB instructions
-        elif 0x90 <= opcode <= 0x97:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] - value
-            self.registers['A'] = result & 0xFF
-            update_flags_arithmetic(result, result < 0)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # SBB instructions
-        elif 0x98 <= opcode <= 0x9F:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] - value - (1 if self.flags['CY'] else 0)
-            self.registers['A'] = result & 0xFF
-            update_flags_arithmetic(result, result < 0)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # ANA instructions
-        elif 0xA0 <= opcode <= 0xA7:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] & value
-            self.registers['A'] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-
-        # ANI instruction
-        elif opcode == 0xE6:
-            value = self.memory[self.registers['PC'] + 1]
-            result = self.registers['A'] & value
-            self.registers['A'] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-        
-        # XRA instructions
-        elif 0xA8 <= opcode <= 0xAF:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] ^ value
-            self.registers['A'] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # ORA instructions
-        elif 0xB0 <= opcode <= 0xB7:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] | value
-            self.registers['A'] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-
-        # ORI instruction
-        elif opcode == 0xF6:
-            value = self.memory[self.registers['PC'] + 1]
-            result = self.registers['A'] | value
-            self.registers['A'] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-
-        # XRI instruction
-        elif opcode == 0xEE:
-            value = self.memory[self.registers['PC'] + 1]
-            result = self.registers['A'] ^ value
-            self.registers['A'] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-        
-        # CMP instructions
-        elif 0xB8 <= opcode <= 0xBF:
-            reg = "BCDEHLMA"[opcode & 0x07]
-            if reg == 'M':
-                value = self.memory[get_hl_address()]
-            else:
-                value = self.registers[reg]
-            
-            result = self.registers['A'] - value
-            update_flags_arithmetic(result, result < 0)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # INX instructions
-        elif opcode in [0x03, 0x13, 0x23, 0x33]:
-            if opcode == 0x03:  # INX B
-                bc = get_bc_address() + 1
-                self.registers['B'] = (bc >> 8) & 0xFF
-                self.registers['C'] = bc & 0xFF
-            elif opcode == 0x13:  # INX D
-                de = get_de_address() + 1
-                self.registers['D'] = (de >> 8) & 0xFF
-                self.registers['E'] = de & 0xFF
-            elif opcode == 0x23:  # INX H
-                hl = get_hl_address() + 1
-                self.registers['H'] = (hl >> 8) & 0xFF
-                self.registers['L'] = hl & 0xFF
-            else:  # INX SP
-                self.registers['SP'] = (self.registers['SP'] + 1) & 0xFFFF
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # DCR instructions
-        elif 0x05 <= opcode <= 0x3D and opcode % 8 == 5:
-            reg = "BCDEHLMA"[(opcode >> 3) & 0x07]
-            if reg == 'M':
-                addr = get_hl_address()
-                value = self.memory[addr]
-                result = (value - 1) & 0xFF
-                self.memory[addr] = result
-            else:
-                result = (self.registers[reg] - 1) & 0xFF
-                self.registers[reg] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # INR instructions
-        elif 0x04 <= opcode <= 0x3C and opcode % 8 == 4:
-            reg = "BCDEHLMA"[(opcode >> 3) & 0x07]
-            if reg == 'M':
-                addr = get_hl_address()
-                value = self.memory[addr]
-                result = (value + 1) & 0xFF
-                self.memory[addr] = result
-            else:
-                result = (self.registers[reg] + 1) & 0xFF
-                self.registers[reg] = result
-            update_flags_arithmetic(result)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # DCX instructions
-        elif opcode in [0x0B, 0x1B, 0x2B, 0x3B]:
-            if opcode == 0x0B:  # DCX B
-                bc = get_bc_address() - 1
-                self.registers['B'] = (bc >> 8) & 0xFF
-                self.registers['C'] = bc & 0xFF
-            elif opcode == 0x1B:  # DCX D
-                de = get_de_address() - 1
-                self.registers['D'] = (de >> 8) & 0xFF
-                self.registers['E'] = de & 0xFF
-            elif opcode == 0x2B:  # DCX H
-                hl = get_hl_address() - 1
-                self.registers['H'] = (hl >> 8) & 0xFF
-                self.registers['L'] = hl & 0xFF
-            else:  # DCX SP
-                self.registers['SP'] = (self.registers['SP'] - 1) & 0xFFFF
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # DAD instructions
-        elif opcode in [0x09, 0x19, 0x29, 0x39]:
-            if opcode == 0x09:  # DAD B
-                hl = get_hl_address()
-                bc = get_bc_address()
-                result = hl + bc
-                self.registers['H'] = (result >> 8) & 0xFF
-                self.registers['L'] = result & 0xFF
-                self.flags['CY'] = result > 0xFFFF
-            elif opcode == 0x19:  # DAD D
-                hl = get_hl_address()
-                de = get_de_address()
-                result = hl + de
-                self.registers['H'] = (result >> 8) & 0xFF
-                self.registers['L'] = result & 0xFF
-                self.flags['CY'] = result > 0xFFFF
-            elif opcode == 0x29:  # DAD H
-                hl = get_hl_address()
-                result = hl + hl
-                self.registers['H'] = (result >> 8) & 0xFF
-                self.registers['L'] = result & 0xFF
-                self.flags['CY'] = result > 0xFFFF
-            else:  # DAD SP
-                hl = get_hl_address()
-                result = hl + self.registers['SP']
-                self.registers['H'] = (result >> 8) & 0xFF
-                self.registers['L'] = result & 0xFF
-                self.flags['CY'] = result > 0xFFFF
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # PUSH instructions
-        elif opcode in [0xC5, 0xD5, 0xE5, 0xF5]:
-            if opcode == 0xC5:  # PUSH B
-                push((self.registers['B'] << 8) | self.registers['C'])
-            elif opcode == 0xD5:  # PUSH D
-                push((self.registers['D'] << 8) | self.registers['E'])
-            elif opcode == 0xE5:  # PUSH H
-                push((self.registers['H'] << 8) | self.registers['L'])
-            else:  # PUSH PSW
-                psw = (self.registers['A'] << 8) | (
-                    (1 if self.flags['S'] else 0) << 7 |
-                    (1 if self.flags['Z'] else 0) << 6 |
-                    (1 if self.flags['AC'] else 0) << 4 |
-                    (1 if self.flags['P'] else 0) << 2 |
-                    (1 if self.flags['CY'] else 0)
-                )
-                push(psw)
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # POP instructions
-        elif opcode in [0xC1, 0xD1, 0xE1, 0xF1]:
-            value = pop()
-            if opcode == 0xC1:  # POP B
-                self.registers['B'] = (value >> 8) & 0xFF
-                self.registers['C'] = value & 0xFF
-            elif opcode == 0xD1:  # POP D
-                self.registers['D'] = (value >> 8) & 0xFF
-                self.registers['E'] = value & 0xFF
-            elif opcode == 0xE1:  # POP H
-                self.registers['H'] = (value >> 8) & 0xFF
-                self.registers['L'] = value & 0xFF
-            else:  # POP PSW
-                self.registers['A'] = (value >> 8) & 0xFF
-                self.flags['S'] = (value & 0x80) != 0
-                self.flags['Z'] = (value & 0x40) != 0
-                self.flags['AC'] = (value & 0x10) != 0
-                self.flags['P'] = (value & 0x04) != 0
-                self.flags['CY'] = (value & 0x01) != 0
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # JMP instructions
-        elif opcode == 0xC3:  # JMP addr
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            self.registers['PC'] = (addr_high << 8) | addr_low
-            return {'success': True}  # Return immediately to prevent PC modification
-        
-        # Conditional Jump instructions
-        elif opcode in [0xC2, 0xCA, 0xD2, 0xDA, 0xE2, 0xEA, 0xF2, 0xFA]:
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            addr = (addr_high << 8) | addr_low
-            
-            if opcode == 0xC2:  # JNZ addr
-                if not self.flags['Z']:
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xCA:  # JZ addr
-                if self.flags['Z']:
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xD2:  # JNC addr
-                if not self.flags['CY']:
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xDA:  # JC addr
-                if self.flags['CY']:
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xE2:  # JPO addr
-                if not self.flags['P']:
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xEA:  # JPE addr
-                if self.flags['P']:
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xF2:  # JP addr
-                if not self.flags['S']:
-                    self.registers['PC'] = addr
-                    return
-            else:  # JM addr
-                if self.flags['S']:
-                    self.registers['PC'] = addr
-                    return
-            
-            self.registers['PC'] = (self.registers['PC'] + 3) & 0xFFFF
-        
-        # CALL instructions
-        elif opcode == 0xCD:  # CALL addr
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            addr = (addr_high << 8) | addr_low
-            push(self.registers['PC'] + 3)
-            self.registers['PC'] = addr
-        
-        # Conditional CALL instructions
-        elif opcode in [0xC4, 0xCC, 0xD4, 0xDC, 0xE4, 0xEC, 0xF4, 0xFC]:
-            addr_low = self.memory[self.registers['PC'] + 1]
-            addr_high = self.memory[self.registers['PC'] + 2]
-            addr = (addr_high << 8) | addr_low
-            
-            if opcode == 0xC4:  # CNZ addr
-                if not self.flags['Z']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xCC:  # CZ addr
-                if self.flags['Z']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xD4:  # CNC addr
-                if not self.flags['CY']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xDC:  # CC addr
-                if self.flags['CY']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xE4:  # CPO addr
-                if not self.flags['P']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xEC:  # CPE addr
-                if self.flags['P']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            elif opcode == 0xF4:  # CP addr
-                if not self.flags['S']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            else:  # CM addr
-                if self.flags['S']:
-                    push(self.registers['PC'] + 3)
-                    self.registers['PC'] = addr
-                    return
-            
-            self.registers['PC'] = (self.registers['PC'] + 3) & 0xFFFF
-        
-        # RET instructions
-        elif opcode == 0xC9:  # RET
-            self.registers['PC'] = pop()
-        
-        # Conditional RET instructions
-        elif opcode in [0xC0, 0xC8, 0xD0, 0xD8, 0xE0, 0xE8, 0xF0, 0xF8]:
-            if opcode == 0xC0:  # RNZ
-                if not self.flags['Z']:
-                    self.registers['PC'] = pop()
-                    return
-            elif opcode == 0xC8:  # RZ
-                if self.flags['Z']:
-                    self.registers['PC'] = pop()
-                    return
-            elif opcode == 0xD0:  # RNC
-                if not self.flags['CY']:
-                    self.registers['PC'] = pop()
-                    return
-            elif opcode == 0xD8:  # RC
-                if self.flags['CY']:
-                    self.registers['PC'] = pop()
-                    return
-            elif opcode == 0xE0:  # RPO
-                if not self.flags['P']:
-                    self.registers['PC'] = pop()
-                    return
-            elif opcode == 0xE8:  # RPE
-                if self.flags['P']:
-                    self.registers['PC'] = pop()
-                    return
-            elif opcode == 0xF0:  # RP
-                if not self.flags['S']:
-                    self.registers['PC'] = pop()
-                    return
-            else:  # RM
-                if self.flags['S']:
-                    self.registers['PC'] = pop()
-                    return
-            
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # RST instructions
-        elif 0xC7 <= opcode <= 0xFF and opcode % 8 == 7:
-            push(self.registers['PC'] + 1)
-            self.registers['PC'] = opcode & 0x38
-        
-        # I/O Instructions
-        elif opcode == 0xDB:  # IN port
-            port = self.memory[self.registers['PC'] + 1]
-            # In a real 8085, this would read from the specified I/O port
-            # For simulation, we'll just set a default value
-            self.registers['A'] = 0xFF  # Default value for simulation
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-            
-        elif opcode == 0xD3:  # OUT port
-            port = self.memory[self.registers['PC'] + 1]
-            # In a real 8085, this would write to the specified I/O port
-            # For simulation, we'll just acknowledge the operation
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-        
-        # Interrupt Instructions
-        elif opcode == 0xF3:  # DI (Disable Interrupts)
-            # In a real 8085, this would disable interrupts
-            # For simulation, we'll just acknowledge the operation
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-            
-        elif opcode == 0xFB:  # EI (Enable Interrupts)
-            # In a real 8085, this would enable interrupts
-            # For simulation, we'll just acknowledge the operation
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-            
-        elif opcode == 0xF0:  # SIM (Set Interrupt Mask)
-            # In a real 8085, this would set the interrupt mask
-            # For simulation, we'll just acknowledge the operation
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-            
-        elif opcode == 0x20:  # RIM (Read Interrupt Mask)
-            # In a real 8085, this would read the interrupt mask
-            # For simulation, we'll just set a default value
-            self.registers['A'] = 0x00  # Default value for simulation
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # Special Instructions
-        elif opcode == 0x2F:  # CMA (Complement Accumulator)
-            self.registers['A'] = (~self.registers['A']) & 0xFF
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-            
-        elif opcode == 0xC6:  # ADI (Add Immediate)
-            value = self.memory[self.registers['PC'] + 1]
-            result = self.registers['A'] + value
-            self.registers['A'] = result & 0xFF
-            update_flags_arithmetic(result, result > 0xFF)
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-            
-        elif opcode == 0xCE:  # ACI (Add Immediate with Carry)
-            value = self.memory[self.registers['PC'] + 1]
-            result = self.registers['A'] + value + (1 if self.flags['CY'] else 0)
-            self.registers['A'] = result & 0xFF
-            update_flags_arithmetic(result, result > 0xFF)
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-            
-        elif opcode == 0xD6:  # SUI (Subtract Immediate)
-            value = self.memory[self.registers['PC'] + 1]
-            result = self.registers['A'] - value
-            self.registers['A'] = result & 0xFF
-            update_flags_arithmetic(result, result < 0)
-            self.registers['PC'] = (self.registers['PC'] + 2) & 0xFFFF
-            
-        elif opcode == 0x3F:  # CMC (Complement Carry)
-            self.flags['CY'] = not self.flags['CY']
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-            
-        elif opcode == 0x37:  # STC (Set Carry)
-            self.flags['CY'] = True
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-        
-        # HLT instruction
-        elif opcode == 0x76:  # HLT
-            self.is_running = False
-            self.registers['PC'] = (self.registers['PC'] + 1) & 0xFFFF
-            return {'success': True, 'halt': True}
-        
-        else:
-            # Unknown opcode - implement more instructions here
-            pass
-        
-        # Return success
-        return {'success': True}
+# Most instruction records one traced run returns (a streamed run sends
+# its records as it goes and may return more), and the number of
+# instructions a streamed run executes between messages
+TRACE_LIMIT = int(os.environ.get('FG8085_TRACE_LIMIT', 10_000))
+STREAM_TRACE_LIMIT = int(os.environ.get('FG8085_STREAM_TRACE_LIMIT', 1_000_000))
+STREAM_SLICE_INSTRUCTIONS = 20_000
+# Most jobs one /api/batch request may hold, and the wall-clock budget
+# shared by all of them
+MAX_BATCH_JOBS = int(os.environ.get('FG8085_MAX_BATCH_JOBS', 500))
+MAX_BATCH_SECONDS = float(os.environ.get('FG8085_MAX_BATCH_SECONDS', 10.0))
+# Background jobs (/api/jobs): their execution budget, the number of jobs
+# run at once, how many unfinished jobs one session may have, and how many
+# seconds a finished job's result is kept
+MAX_JOB_INSTRUCTIONS = int(os.environ.get('FG8085_MAX_JOB_INSTRUCTIONS', 100_000_000))
+MAX_JOB_SECONDS = float(os.environ.get('FG8085_MAX_JOB_SECONDS', 60.0))
+JOB_WORKERS = int(os.environ.get('FG8085_JOB_WORKERS', 2))
+MAX_JOBS_PER_SESSION = int(os.environ.get('FG8085_MAX_JOBS_PER_SESSION', 1))
+JOB_RESULT_TTL = float(os.environ.get('FG8085_JOB_RESULT_TTL', 600))
+# Most named snapshots (checkpoints) one session may keep
+MAX_CHECKPOINTS = int(os.environ.get('FG8085_MAX_CHECKPOINTS', 16))
+
+# Assembled programs kept by /api/assemble, by hash of their source
+ASSEMBLY_CACHE_SIZE = int(os.environ.get('FG8085_ASSEMBLY_CACHE_SIZE', 1024))
+
+# Approximate resident size of one session (64 KB memory, page versions,
+# registers) used to turn FG8085_SESSION_MEMORY_MB into a session count
+SESSION_MEMORY_ESTIMATE = 72 * 1024
+# Minimum number of seconds between idle-session sweeps
+SESSION_SWEEP_INTERVAL = 30
 
-    def run_until_halt(self):
-        """Execute instructions until HLT is encountered"""
-        self.is_running = True
-        while self.is_running:
-            self.execute_instruction()
-        return self.get_state()
+# Create the shared assembly cache
+assembly_cache = AssemblyCache(ASSEMBLY_CACHE_SIZE)
+
+# Mnemonic and length of every opcode, embedded in the main page so the
+# client decodes instructions and binary traces with the server's table
+INSTRUCTION_SET = [{'mnemonic': info.mnemonic, 'length': info.length} for info in DECODE_TABLE]
 
 # Remove the global microprocessor instance
 # Instead, we'll create a microprocessor manager to store instances per session
 
+class StaleSessionError(Exception):
+    """Raised when a session was saved by another worker since it was loaded"""
+
+
+class SQLiteSessionStore:
+    """Session state store shared by all workers through one SQLite file
+
+    Stores CPU snapshots keyed by session id. A store only has to provide
+    version(), load(), save() and delete(); save() takes the version the
+    caller loaded and raises StaleSessionError if someone saved since.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS sessions ('
+                       'id TEXT PRIMARY KEY, version INTEGER NOT NULL, '
+                       'updated REAL NOT NULL, snapshot BLOB NOT NULL)')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+        return db
+
+    def version(self, session_id):
+        """Return the stored version of a session, 0 if it has none"""
+        row = self._connect().execute(
+            'SELECT version FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, session_id):
+        """Return (snapshot, version), or (None, 0) for an unknown session"""
+        row = self._connect().execute(
+            'SELECT snapshot, version FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def save(self, session_id, snapshot, version):
+        """Store a snapshot over `version` and return the new version"""
+        with self._connect() as db:
+            if version:
+                saved = db.execute(
+                    'UPDATE sessions SET snapshot = ?, version = ?, updated = ? '
+                    'WHERE id = ? AND version = ?',
+                    (snapshot, version + 1, time.time(), session_id, version)).rowcount
+            else:
+                saved = db.execute(
+                    'INSERT OR IGNORE INTO sessions (id, version, updated, snapshot) '
+                    'VALUES (?, 1, ?, ?)',
+                    (session_id, time.time(), snapshot)).rowcount
+        if not saved:
+            raise StaleSessionError(session_id)
+        return version + 1
+
+    def delete(self, session_id):
+        with self._connect() as db:
+            db.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+
+
+# Helper function to create the session store named by FG8085_SESSION_STORE.
+# Unset or "memory" keeps sessions in this process only; "sqlite:<path>"
+# shares them between every worker that points at the same file.
+def create_session_store(spec):
+    if not spec or spec == 'memory':
+        return None
+    kind, _, location = spec.partition(':')
+    if kind == 'sqlite' and location:
+        return SQLiteSessionStore(location)
+    raise ValueError(f'Unknown session store: {spec}')
+
+
 class MicroprocessorManager:
-    def __init__(self):
-        self.instances = {}
-    
+    """Per-session CPU instances, optionally backed by a shared session store
+
+    Without a store instances only live in this process. With one, each
+    worker keeps a decoded copy and reloads it when the stored version moved
+    on; save_instance() writes it back with an optimistic version check.
+
+    Instances are kept in least-recently-used order. Sessions idle for
+    longer than `ttl` seconds, and the oldest sessions beyond `max_sessions`
+    or the `memory_budget` (bytes), are evicted. With a `spill_dir`, evicted
+    sessions are written there as snapshots and restored on their next
+    request; with a shared store the store already holds them.
+
+    get_instance() leases the session to the caller until
+    release_instance(); leased sessions are never evicted, so a CPU that a
+    request or a streamed run is still changing is not dropped or spilled
+    half-updated. The limits may be exceeded while every session is leased.
+    """
+
+    def __init__(self, store=None, max_sessions=None, ttl=None,
+                 memory_budget=None, spill_dir=None):
+        self.instances = OrderedDict()
+        self.versions = {}
+        self.last_used = {}
+        self.leases = {}
+        self.store = store
+        self.max_sessions = max_sessions
+        if memory_budget is not None:
+            by_memory = max(1, memory_budget // SESSION_MEMORY_ESTIMATE)
+            self.max_sessions = min(max_sessions or by_memory, by_memory)
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.counters = {'created': 0, 'evicted': 0, 'expired': 0,
+                         'spilled': 0, 'restored': 0}
+        self._lock = threading.RLock()
+        self._next_sweep = 0.0
+
     def get_instance(self, session_id):
-        if session_id not in self.instances:
-            self.instances[session_id] = Microprocessor8085()
-        return self.instances[session_id]
-    
+        """Return the session's CPU, leased until release_instance() is called"""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._expire_idle(now)
+            microprocessor = self._get_instance(session_id)
+            self.instances.move_to_end(session_id)
+            self.last_used[session_id] = now
+            self.leases[session_id] = self.leases.get(session_id, 0) + 1
+            self._evict_over_limit()
+            return microprocessor
+
+    def release_instance(self, session_id):
+        """Give back one lease taken by get_instance()"""
+        with self._lock:
+            count = self.leases.get(session_id, 0) - 1
+            if count > 0:
+                self.leases[session_id] = count
+            else:
+                self.leases.pop(session_id, None)
+
+    def _get_instance(self, session_id):
+        store = self.store
+        if store is None:
+            microprocessor = self.instances.get(session_id)
+            if microprocessor is None:
+                microprocessor = self._restore(session_id)
+                if microprocessor is None:
+                    microprocessor = Microprocessor8085()
+                    self.counters['created'] += 1
+                self.instances[session_id] = microprocessor
+            return microprocessor
+
+        if session_id in self.instances and store.version(session_id) == self.versions[session_id]:
+            return self.instances[session_id]
+        snapshot, version = store.load(session_id)
+        if snapshot is None:
+            microprocessor = Microprocessor8085()
+            self.counters['created'] += 1
+        else:
+            microprocessor = Microprocessor8085.from_snapshot(snapshot)
+        self.instances[session_id] = microprocessor
+        self.versions[session_id] = version
+        return microprocessor
+
+    def save_instance(self, session_id):
+        """Write a session back to the store; raises StaleSessionError on a conflict"""
+        with self._lock:
+            if self.store is None or session_id not in self.instances:
+                return
+            try:
+                self.versions[session_id] = self.store.save(
+                    session_id, self.instances[session_id].to_snapshot(),
+                    self.versions[session_id])
+            except StaleSessionError:
+                # Drop our copy so the next request reloads the winner's state
+                self._drop(session_id)
+                raise
+
     def remove_instance(self, session_id):
-        if session_id in self.instances:
-            del self.instances[session_id]
+        with self._lock:
+            self._drop(session_id)
+            if self.store is not None:
+                self.store.delete(session_id)
+            path = self._spill_path(session_id)
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        """Return the live session count and the lifetime eviction counters"""
+        with self._lock:
+            stats = {'live': len(self.instances), 'leased': len(self.leases)}
+            stats.update(self.counters)
+            return stats
+
+    def _drop(self, session_id):
+        self.instances.pop(session_id, None)
+        self.versions.pop(session_id, None)
+        self.last_used.pop(session_id, None)
+
+    def _evict(self, session_id):
+        microprocessor = self.instances[session_id]
+        if self.store is None and self._spill_path(session_id):
+            with open(self._spill_path(session_id), 'wb') as spill:
+                spill.write(microprocessor.to_snapshot())
+            self.counters['spilled'] += 1
+        self._drop(session_id)
+
+    def _expire_idle(self, now):
+        """Evict sessions idle for longer than the TTL (oldest come first)"""
+        self._next_sweep = now + SESSION_SWEEP_INTERVAL
+        if not self.ttl:
+            return
+        for session_id in list(self.instances):
+            if now - self.last_used[session_id] < self.ttl:
+                break
+            if session_id in self.leases:
+                continue
+            self._evict(session_id)
+            self.counters['expired'] += 1
+
+    def _evict_over_limit(self):
+        if not self.max_sessions:
+            return
+        while len(self.instances) > self.max_sessions:
+            session_id = next((session_id for session_id in self.instances
+                               if session_id not in self.leases), None)
+            if session_id is None:
+                return
+            self._evict(session_id)
+            self.counters['evicted'] += 1
+
+    def _spill_path(self, session_id):
+        if not self.spill_dir:
+            return None
+        try:
+            name = uuid.UUID(session_id).hex
+        except ValueError:
+            return None
+        return os.path.join(self.spill_dir, name + '.snap')
+
+    def _restore(self, session_id):
+        """Load and remove a spilled session, or return None if there is none"""
+        path = self._spill_path(session_id)
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'rb') as spill:
+            snapshot = spill.read()
+        os.remove(path)
+        self.counters['restored'] += 1
+        return Microprocessor8085.from_snapshot(snapshot)
 
 # Create a global instance of the manager
-processor_manager = MicroprocessorManager()
+processor_manager = MicroprocessorManager(
+    create_session_store(os.environ.get('FG8085_SESSION_STORE')),
+    max_sessions=int(os.environ.get('FG8085_MAX_SESSIONS', 1000)),
+    ttl=float(os.environ.get('FG8085_SESSION_TTL', 4 * 3600)),
+    memory_budget=(int(os.environ['FG8085_SESSION_MEMORY_MB']) << 20
+                   if os.environ.get('FG8085_SESSION_MEMORY_MB') else None),
+    spill_dir=os.environ.get('FG8085_SESSION_SPILL_DIR'))
+
+def _run_snapshot(snapshot, budget, trace_options=None):
+    """Worker process entry point: run a CPU snapshot and return (snapshot, outcome)"""
+    microprocessor = Microprocessor8085.from_snapshot(snapshot)
+    if trace_options is None:
+        outcome = microprocessor.run(*budget)
+    else:
+        recorder = get_trace_recorder(microprocessor, trace_options)
+        outcome = run_with_history(microprocessor, budget, recorder)
+    return microprocessor.to_snapshot(), outcome
+
+
+class ExecutionService:
+    """Runs programs in a pool of worker processes
+
+    CPUs travel to and from the workers as snapshots, so a long run only
+    occupies a worker process and runs spread over all cores. With no
+    workers configured everything runs inline on the calling thread.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Created on first use so each server worker process gets its own pool
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def run(self, microprocessor, budget, trace_options=None):
+        """Run `microprocessor` within `budget`, tracing it if trace_options is given
+
+        Returns the same outcome as run(), or run_with_history() when
+        tracing; the microprocessor is updated in place.
+        """
+        if not self.workers:
+            if trace_options is None:
+                return microprocessor.run(*budget)
+            recorder = get_trace_recorder(microprocessor, trace_options)
+            return run_with_history(microprocessor, budget, recorder)
+        future = self.pool.submit(_run_snapshot, microprocessor.to_snapshot(), budget, trace_options)
+        snapshot, outcome = future.result()
+        microprocessor.restore_snapshot(snapshot)
+        return outcome
+
+    def map(self, fn, *iterables):
+        """Like map(), in the worker processes when there are any"""
+        if not self.workers:
+            return list(map(fn, *iterables))
+        return list(self.pool.map(fn, *iterables))
+
+# Create the execution service; FG8085_EXECUTOR_WORKERS=0 (the default) runs inline
+execution_service = ExecutionService(int(os.environ.get('FG8085_EXECUTOR_WORKERS', 0)))
+
+class JobLimitError(Exception):
+    """Raised when a session already has its maximum number of unfinished jobs"""
+
+
+class Job:
+    """One background run of a copy of a session's CPU"""
+
+    def __init__(self, session_id, microprocessor, budget):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.snapshot = microprocessor.to_snapshot()
+        # The session's memory version when the job was submitted
+        self.base_memory_version = (microprocessor.mem_epoch, microprocessor.mem_version)
+        self.budget = budget
+        self.state = 'queued'
+        self.executed = 0
+        self.cycles = 0
+        self.pc = None
+        self.outcome = None
+        self.finished_at = None
+        self.cancel_requested = threading.Event()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'state': self.state,
+            'executed': self.executed,
+            'cycles': self.cycles,
+            'pc': self.pc,
+        }
+
+
+class JobManager:
+    """Runs jobs on a small thread pool, at most `per_session` unfinished per session
+
+    A job runs on its own copy of the session's CPU in slices, updating its
+    progress after each one and stopping early once cancelled. Its final
+    CPU snapshot is kept until the session loads it back, or until
+    `result_ttl` seconds after it finished. Jobs live in this process, so
+    with several server processes a client must poll the one it submitted to.
+    """
+
+    # Job states; the last three are final
+    STATES = ('queued', 'running', 'finished', 'cancelled', 'failed')
+
+    def __init__(self, workers, per_session, result_ttl):
+        self.workers = workers
+        self.per_session = per_session
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, microprocessor, budget):
+        with self._lock:
+            self._expire_finished(time.monotonic())
+            active = sum(1 for job in self.jobs.values()
+                         if job.session_id == session_id and job.finished_at is None)
+            if active >= self.per_session:
+                raise JobLimitError(f'At most {self.per_session} unfinished jobs per session')
+            job = Job(session_id, microprocessor, budget)
+            self.jobs[job.id] = job
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='fg8085-job')
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, session_id, job_id):
+        """Return the session's job with this id, or None"""
+        job = self.jobs.get(job_id)
+        if job is None or job.session_id != session_id:
+            return None
+        return job
+
+    def cancel(self, job):
+        job.cancel_requested.set()
+
+    def remove(self, job):
+        with self._lock:
+            self.jobs.pop(job.id, None)
+
+    def _run(self, job):
+        if job.cancel_requested.is_set():
+            self._finish(job, 'cancelled')
+            return
+        job.state = 'running'
+        try:
+            microprocessor = Microprocessor8085.from_snapshot(job.snapshot)
+            state = 'finished'
+            for outcome in run_in_slices(microprocessor, job.budget, None, STREAM_SLICE_INSTRUCTIONS):
+                job.executed = outcome['executed']
+                job.cycles = outcome['cycles']
+                job.pc = outcome['pc']
+                if job.cancel_requested.is_set():
+                    state = 'cancelled'
+                    break
+            job.outcome = outcome
+            job.snapshot = microprocessor.to_snapshot()
+            self._finish(job, state)
+        except Exception as e:
+            job.outcome = {'status': 'error', 'error': str(e)}
+            self._finish(job, 'failed')
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished_at = time.monotonic()
+
+    def _expire_finished(self, now):
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl:
+                del self.jobs[job_id]
+
+# Create the background job manager
+job_manager = JobManager(JOB_WORKERS, MAX_JOBS_PER_SESSION, JOB_RESULT_TTL)
 
 # Helper function to get or create session ID
 def get_session_id():
@@ -922,16 +491,570 @@ def get_session_id():
         session['session_id'] = str(uuid.uuid4())
     return session['session_id']
 
-# Helper function to get the microprocessor instance for current session
+# Helper function to get the microprocessor instance for current session.
+# The session stays leased (safe from eviction) until the request ends.
 def get_microprocessor():
     session_id = get_session_id()
-    return processor_manager.get_instance(session_id)
+    g.cpu_session_id = session_id
+    microprocessor = processor_manager.get_instance(session_id)
+    g.setdefault('cpu_leases', []).append(session_id)
+    return microprocessor
+
+# Save the session's CPU back to the shared store once a request is done.
+# A conflicting save from another worker wins; this request is rejected
+# with 409 so the client can retry against the newer state.
+@app.after_request
+def save_microprocessor(response):
+    session_id = g.pop('cpu_session_id', None)
+    if session_id is None:
+        return response
+    try:
+        processor_manager.save_instance(session_id)
+    except StaleSessionError:
+        response = jsonify({
+            'success': False,
+            'error': 'The simulator state was changed by another request, please retry'
+        })
+        response.status_code = 409
+    return response
+
+# Release the request's session leases, also when the request failed
+@app.teardown_request
+def release_microprocessor(exc):
+    for session_id in g.pop('cpu_leases', ()):
+        processor_manager.release_instance(session_id)
+
+# Helper function to read the client's cached memory version.
+# Clients send "X-Memory-Version: <memory_epoch>:<memory_version>" from the
+# last state they applied, and get back only the memory written since then.
+def get_client_memory_version():
+    header = request.headers.get('X-Memory-Version')
+    if not header:
+        return None
+    epoch, _, version = header.partition(':')
+    try:
+        return epoch, int(version)
+    except ValueError:
+        return None
+
+# Helper function to validate a memory window ("start"/"length" may be
+# ints or strings such as "0x2000"); windows are clipped at FFFFH
+def parse_memory_window(start, length):
+    start = int(start, 0) if isinstance(start, str) else int(start)
+    length = int(length, 0) if isinstance(length, str) else int(length)
+    if not 0 <= start <= 0xFFFF or length < 0:
+        raise ValueError('Invalid memory window')
+    return start, min(length, 0x10000 - start)
+
+# Helper function to build the state response for the current client.
+# With a (start, length) window only that slice of memory is returned as
+# 'window' instead of a full snapshot or delta.
+def get_client_state(microprocessor, window=None):
+    if window is None:
+        return microprocessor.get_state(since=get_client_memory_version())
+    start, length = window
+    state = {
+        'registers': microprocessor.registers.to_dict(),
+        'flags': microprocessor.flags.to_dict(),
+        'pc': microprocessor.registers.PC,
+        'cycles': microprocessor.cycles,
+        'window': {
+            'start': start,
+            'data': list(microprocessor.read_memory(start, length))
+        }
+    }
+    ports = microprocessor.port_state()
+    if ports:
+        state['ports'] = ports
+    if microprocessor.interrupts.active():
+        state['interrupts'] = microprocessor.interrupts.to_dict()
+    return state
+
+# Helper function to read the execution budget from a request body.
+# Clients may ask for less than the server limits, never more.
+def get_run_budget(data, max_run_instructions=MAX_RUN_INSTRUCTIONS, max_run_seconds=MAX_RUN_SECONDS):
+    max_instructions = max_run_instructions
+    time_limit = max_run_seconds
+    if data:
+        if data.get('max_instructions') is not None:
+            max_instructions = max(1, min(int(data['max_instructions']), max_run_instructions))
+        if data.get('time_limit') is not None:
+            requested = float(data['time_limit'])
+            if 0 < requested < time_limit:
+                time_limit = requested
+    return max_instructions, time_limit
+
+class TraceRecorder:
+    """run() trace callback that keeps every `sample`-th instruction, up to `limit` records
+
+    Records are dicts with the address, opcode, mnemonic, operand and
+    machine code of each traced instruction.
+    """
+    # Response keys for the records in a JSON response and a stream message
+    history_key = 'instruction_history'
+    stream_key = 'records'
+
+    def __init__(self, microprocessor, sample=1, limit=None):
+        self.microprocessor = microprocessor
+        self.sample = sample
+        self.limit = limit
+        self.records = self.new_records()
+        self.count = 0
+        self.seen = 0
+        self.truncated = False
+
+    def __call__(self, address, opcode):
+        seen = self.seen
+        self.seen = seen + 1
+        if seen % self.sample:
+            return
+        if self.limit is not None and self.count >= self.limit:
+            self.truncated = True
+            return
+        self.count += 1
+        self.record(address, opcode)
+
+    def new_records(self):
+        return []
+
+    def record(self, address, opcode):
+        memory = self.microprocessor.memory
+        mnemonic, operand = get_instruction_info(opcode, memory, address)
+        self.records.append({
+            'address': address,
+            'opcode': opcode,
+            'mnemonic': mnemonic,
+            'operand': operand,
+            'machine_code': format_machine_code(opcode, memory, address)
+        })
+
+    def capacity(self):
+        """Number of instructions that can still be traced, or None if unlimited"""
+        if self.limit is None:
+            return None
+        return max(0, (self.limit - self.count) * self.sample + (-self.seen) % self.sample)
+
+    def take(self):
+        """Return and forget the records collected so far"""
+        records, self.records = self.records, self.new_records()
+        if self.limit is not None:
+            self.limit -= self.count
+        self.count = 0
+        return records
+
+
+class BinaryTraceRecorder(TraceRecorder):
+    """TraceRecorder producing fixed-width TRACE_RECORD records, base64 encoded
+
+    Each record holds the instruction's address, opcode and the two bytes
+    after it, and the registers (B C D E H L F A, SP) before it executed.
+    Clients resolve mnemonics and operand lengths from the opcode.
+    """
+    history_key = 'instruction_trace'
+    stream_key = 'records_binary'
+
+    def new_records(self):
+        return bytearray()
+
+    def record(self, address, opcode):
+        cpu = self.microprocessor
+        memory = cpu.memory
+        self.records += TRACE_RECORD.pack(
+            address, opcode, memory[(address + 1) & 0xFFFF], memory[(address + 2) & 0xFFFF],
+            bytes(cpu.registers.gpr), cpu.registers.SP)
+
+    def take(self):
+        return base64.b64encode(super().take()).decode('ascii')
+
+class Profiler:
+    """run() trace callback that totals executions and T-states per address and per opcode
+
+    An instruction's T-states are known once the next one starts (taken
+    branches add theirs while executing), so each call accounts for the
+    previous instruction and finish() for the last one.
+    """
+
+    def __init__(self, microprocessor):
+        self.microprocessor = microprocessor
+        self.by_address = {}
+        self.by_opcode = {}
+        self.last = None
+        self.last_cycles = 0
+
+    def __call__(self, address, opcode):
+        cycles = self.microprocessor.cycles
+        if self.last is not None:
+            self._account(cycles - self.last_cycles)
+        self.last = (address, opcode)
+        self.last_cycles = cycles
+
+    def _account(self, spent):
+        address, opcode = self.last
+        entry = self.by_address.get(address)
+        if entry is None:
+            self.by_address[address] = [opcode, 1, spent]
+        else:
+            entry[0] = opcode
+            entry[1] += 1
+            entry[2] += spent
+        entry = self.by_opcode.get(opcode)
+        if entry is None:
+            self.by_opcode[opcode] = [1, spent]
+        else:
+            entry[0] += 1
+            entry[1] += spent
+
+    def finish(self):
+        """Account for the last instruction of the run"""
+        if self.last is not None:
+            self._account(self.microprocessor.cycles - self.last_cycles)
+            self.last = None
+
+    def report(self, limit=None):
+        """Return the profile with the hottest addresses and opcodes (by T-states) first"""
+        addresses = sorted(self.by_address.items(), key=lambda item: -item[1][2])
+        opcodes = sorted(self.by_opcode.items(), key=lambda item: -item[1][1])
+        total_cycles = sum(entry[1] for entry in self.by_opcode.values())
+        return {
+            'instructions': sum(entry[0] for entry in self.by_opcode.values()),
+            'cycles': total_cycles,
+            'seconds': total_cycles / CLOCK_HZ,
+            'clock_hz': CLOCK_HZ,
+            'addresses': [
+                {'address': address, 'opcode': opcode,
+                 'mnemonic': DECODE_TABLE[opcode].mnemonic,
+                 'count': count, 'cycles': cycles}
+                for address, (opcode, count, cycles) in addresses[:limit]
+            ],
+            'opcodes': [
+                {'opcode': opcode, 'mnemonic': DECODE_TABLE[opcode].mnemonic,
+                 'count': count, 'cycles': cycles}
+                for opcode, (count, cycles) in opcodes[:limit]
+            ],
+        }
+
+# Helper function to read the trace options from a request body: record
+# every "trace_sample"-th instruction and at most "trace_limit" records,
+# as JSON objects or, with "trace_format": "binary", as TRACE_RECORDs.
+# Execution goes on untraced (and faster) once the limit is reached.
+def get_trace_recorder(microprocessor, data, max_limit=TRACE_LIMIT):
+    sample, limit, trace_format = parse_trace_options(data, max_limit)
+    if trace_format == 'binary':
+        return BinaryTraceRecorder(microprocessor, sample, limit)
+    return TraceRecorder(microprocessor, sample, limit)
+
+# Helper function to validate the trace options get_trace_recorder() reads;
+# returns (sample, limit, format) and raises ValueError or TypeError
+def parse_trace_options(data, max_limit=TRACE_LIMIT):
+    sample = max(1, int(data.get('trace_sample', 1)))
+    limit = max_limit
+    if data.get('trace_limit') is not None:
+        limit = max(0, min(int(data['trace_limit']), max_limit))
+    trace_format = data.get('trace_format', 'json')
+    if trace_format not in ('json', 'binary'):
+        raise ValueError(f'Unknown trace format: {trace_format}')
+    return sample, limit, trace_format
+
+# Helper function to run the current program in slices of at most
+# `slice_instructions`, yielding the outcome so far after each one. The
+# recorder, if any, traces instructions until it is full.
+def run_in_slices(microprocessor, budget, recorder=None, slice_instructions=None):
+    max_instructions, time_limit = budget
+    deadline = time.monotonic() + time_limit if time_limit else None
+    executed = 0
+    cycles = 0
+    while True:
+        size = max_instructions - executed
+        if slice_instructions:
+            size = min(size, slice_instructions)
+        trace = None
+        if recorder is not None and recorder.capacity() != 0:
+            trace = recorder
+            if recorder.capacity() is not None:
+                size = min(size, recorder.capacity())
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+        outcome = microprocessor.run(size, remaining, trace=trace)
+        if recorder is not None and trace is None and outcome['executed']:
+            # The recorder is full; these instructions went untraced
+            recorder.truncated = True
+        executed += outcome['executed']
+        cycles += outcome['cycles']
+        outcome['executed'] = executed
+        outcome['cycles'] = cycles
+        yield outcome
+        if (outcome['status'] != 'paused' or executed >= max_instructions
+                or (deadline is not None and time.monotonic() >= deadline)):
+            return
+
+# Helper function to run the current program with an instruction history
+def run_with_history(microprocessor, budget, recorder):
+    for outcome in run_in_slices(microprocessor, budget, recorder):
+        pass
+    outcome[recorder.history_key] = recorder.take()
+    outcome['trace_truncated'] = recorder.truncated
+    return outcome
+
+# Helper function to pick the streaming format a run request asked for:
+# "ndjson", "sse", or None for a single JSON response
+def get_stream_format(data):
+    stream = data.get('stream')
+    if stream is None:
+        accept = request.accept_mimetypes
+        if accept.best == 'application/x-ndjson':
+            stream = 'ndjson'
+        elif accept.best == 'text/event-stream':
+            stream = 'sse'
+    if stream not in (None, False, 'ndjson', 'sse'):
+        raise ValueError(f'Unknown stream format: {stream}')
+    return stream or None
+
+# Helper function to stream a run as NDJSON lines or server-sent events.
+# Each slice sends a "trace" message with its records and a "progress"
+# message; the last message is the "result" with the final state.
+def stream_run(microprocessor, budget, recorder, stream_format):
+    session_id = g.get('cpu_session_id')
+
+    if stream_format == 'sse':
+        def encode(kind, payload):
+            return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+        mimetype = 'text/event-stream'
+    else:
+        def encode(kind, payload):
+            payload['type'] = kind
+            return json.dumps(payload) + '\n'
+        mimetype = 'application/x-ndjson'
+
+    def generate():
+        outcome = None
+        for outcome in run_in_slices(microprocessor, budget, recorder, STREAM_SLICE_INSTRUCTIONS):
+            if recorder is not None and recorder.count:
+                yield encode('trace', {recorder.stream_key: recorder.take()})
+            yield encode('progress', {'executed': outcome['executed'], 'pc': outcome['pc']})
+        outcome['success'] = True
+        outcome['state'] = get_client_state(microprocessor)
+        if recorder is not None:
+            outcome['trace_truncated'] = recorder.truncated
+        # The response was sent before the program ran, so save it here
+        if session_id is not None:
+            try:
+                processor_manager.save_instance(session_id)
+            except StaleSessionError:
+                outcome = {
+                    'success': False,
+                    'error': 'The simulator state was changed by another request, please retry'
+                }
+        yield encode('result', outcome)
+
+    # The run outlives the request, so its leases are held until the
+    # response is closed, whether the stream finished or the client left
+    leases = g.pop('cpu_leases', [])
+    def release():
+        for session_id in leases:
+            processor_manager.release_instance(session_id)
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release)
+    return response
+
+# Helper function to read program bytes given either as a list of numbers
+# or as a string of hex bytes like /api/load takes ("3E 05 76")
+def parse_program_bytes(program):
+    if isinstance(program, str):
+        try:
+            return bytes.fromhex(program)
+        except ValueError:
+            # Tokens such as "5" or "0x3E" that fromhex does not take
+            program = [int(x, 16) for x in program.split()]
+    try:
+        return bytes(program)
+    except ValueError:
+        raise ValueError('Byte values must be 0-255') from None
+
+# Helper function to decode one /api/load image. `encoding` is 'hex'
+# (hex bytes as parse_program_bytes takes them), 'base64' or 'ihex' (Intel
+# HEX text); a list of numbers is read as bytes under 'hex' and 'base64'.
+# Returns ((start, bytes), ...) segments and the image's own start
+# address, which only Intel HEX can carry.
+def decode_program_image(program, encoding, start_address):
+    if encoding == 'ihex':
+        if not isinstance(program, str):
+            raise ValueError('Intel HEX must be given as a string')
+        return parse_intel_hex(program)
+    if encoding == 'base64' and isinstance(program, str):
+        program = base64.b64decode(program, validate=True)
+    elif encoding not in ('hex', 'base64'):
+        raise ValueError(f'Unknown encoding: {encoding}')
+    return ((start_address, parse_program_bytes(program)),), None
+
+# Helper function to read scripted I/O ports from a JSON body: "ports" is a
+# list of {"port", "input", "default"} with the input bytes given like
+# /api/load takes them. Returns {port: ScriptedPort}.
+def parse_port_settings(data):
+    ports = {}
+    for entry in data.get('ports') or ():
+        port = entry.get('port')
+        port = int(port, 0) if isinstance(port, str) else int(port)
+        default = entry.get('default', 0xFF)
+        default = int(default, 0) if isinstance(default, str) else int(default)
+        if not 0 <= port <= 0xFF or not 0 <= default <= 0xFF:
+            raise ValueError('Port numbers and default input must be 0-255')
+        ports[port] = ScriptedPort(parse_program_bytes(entry.get('input', ())), default)
+    return ports
+
+# Helper function to replace a microprocessor's scripted ports
+def set_scripted_ports(microprocessor, ports):
+    for port in microprocessor.scripted_ports():
+        microprocessor.attach_port(port, None)
+    for port, device in ports.items():
+        microprocessor.attach_port(port, device)
+
+# Helper function to read interrupt events from a JSON body: "interrupts" is
+# a list of {"line", "at" or "after", "every", "action", "vector"} where
+# "at" is a T-state count, "after" is T-states from `now`, "every" repeats
+# the event, "action" is "raise" (default) or "lower" and "vector" is the
+# RST number answered to INTR
+def parse_interrupt_events(data, now):
+    events = []
+    for entry in data.get('interrupts') or ():
+        if 'at' in entry:
+            cycle = int(entry['at'])
+        else:
+            cycle = now + int(entry.get('after', 0))
+        events.append(InterruptEvent(cycle, str(entry.get('line', '')).upper(),
+                                     entry.get('action', 'raise'), int(entry.get('every', 0)),
+                                     int(entry.get('vector', 0))))
+    return events
+
+# Helper function to check the shape of one /api/batch job: the job and
+# every entry of its object lists must be JSON objects, and "registers" and
+# "flags" objects too, with known names and register values in range (the
+# register file would otherwise mask them). Raises ValueError naming the
+# offending field.
+def check_batch_job(job):
+    if not isinstance(job, dict):
+        raise ValueError('Each job must be an object')
+    for key in ('memory', 'read', 'ports', 'interrupts'):
+        entries = job.get(key) or []
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+            raise ValueError(f'"{key}" must be a list of objects')
+    for key in ('registers', 'flags'):
+        if not isinstance(job.get(key) or {}, dict):
+            raise ValueError(f'"{key}" must be an object')
+    for name, value in (job.get('registers') or {}).items():
+        if name not in RegisterFile.NAMES:
+            raise ValueError(f'Unknown register {name!r}, expected one of {", ".join(RegisterFile.NAMES)}')
+        try:
+            number = int(value, 0) if isinstance(value, str) else int(value)
+        except (TypeError, ValueError):
+            number = None
+        limit = 0xFFFF if name in ('PC', 'SP') else 0xFF
+        if number is None or not 0 <= number <= limit:
+            raise ValueError(f'Register {name} must be 0-{limit:X}H, got {value!r}')
+    for name in job.get('flags') or {}:
+        if name not in FLAG_BITS:
+            raise ValueError(f'Unknown flag {name!r}, expected one of {", ".join(FLAG_BITS)}')
+
+# Helper function to run one /api/batch job on a fresh microprocessor.
+# A job holds "program" and "start_address", optional initial "registers",
+# "flags", "memory" ([{"start", "data"}]), scripted "ports" (see
+# parse_port_settings) and "interrupts" (see parse_interrupt_events), an
+# instruction budget like the run endpoints, and the memory ranges to
+# "read" back afterwards.
+def run_batch_job(job, time_limit):
+    microprocessor = Microprocessor8085()
+    set_scripted_ports(microprocessor, parse_port_settings(job))
+    for event in parse_interrupt_events(job, 0):
+        microprocessor.interrupts.schedule(event)
+    segments = []
+    for block in job.get('memory') or ():
+        start, _ = parse_memory_window(block.get('start', 0), 0)
+        segments.append((start, parse_program_bytes(block.get('data', ()))))
+    
+    start_address, _ = parse_memory_window(job.get('start_address', 0), 0)
+    segments.append((start_address, parse_program_bytes(job.get('program', ()))))
+    microprocessor.load_segments(segments, start_address)
+    
+    for name, value in (job.get('registers') or {}).items():
+        microprocessor.registers[name] = int(value, 0) if isinstance(value, str) else int(value)
+    for name, value in (job.get('flags') or {}).items():
+        microprocessor.flags[name] = bool(value)
+    
+    max_instructions, job_time_limit = get_run_budget(job)
+    outcome = microprocessor.run(max_instructions, min(job_time_limit, time_limit))
+    outcome['success'] = True
+    outcome['registers'] = microprocessor.registers.to_dict()
+    outcome['flags'] = microprocessor.flags.to_dict()
+    outcome['ports'] = microprocessor.port_state()
+    outcome['interrupts'] = microprocessor.interrupts.to_dict()
+    outcome['memory'] = []
+    for window in job.get('read') or ():
+        start, length = parse_memory_window(window.get('start', 0), window.get('length', 0))
+        outcome['memory'].append({
+            'start': start,
+            'data': list(microprocessor.read_memory(start, length))
+        })
+    return outcome
+
+# Helper function to run one batch job before a time.time() deadline, reporting errors in its result
+def run_batch_entry(job, deadline):
+    remaining = deadline - time.time()
+    try:
+        check_batch_job(job)
+        if remaining <= 0:
+            raise TimeoutError('Batch time limit reached before this job ran')
+        result = run_batch_job(job, remaining)
+    except (AttributeError, KeyError, TypeError, ValueError, TimeoutError) as e:
+        result = {'success': False, 'error': str(e)}
+    if isinstance(job, dict) and 'id' in job:
+        result['id'] = job['id']
+    return result
+
+# Helper function to read debugger settings from a JSON body: "breakpoints"
+# (addresses), "watchpoints" ([{"start", "length", "access"}] with access
+# "read", "write" or "access") and "register_watches" ([{"register", "op",
+# "value"}]), returned as set_debug() arguments
+def parse_debug_settings(data):
+    breakpoints = [parse_memory_window(address, 0)[0] for address in data.get('breakpoints') or ()]
+    memory_watches = []
+    for watch in data.get('watchpoints') or ():
+        start, length = parse_memory_window(watch.get('start', 0), watch.get('length', 1))
+        access = WATCH_ACCESS.get(watch.get('access', 'write'))
+        if not length or access is None:
+            raise ValueError('Invalid watchpoint')
+        memory_watches.append((start, start + length - 1, access))
+    register_watches = []
+    for watch in data.get('register_watches') or ():
+        value = watch.get('value', 0)
+        value = int(value, 0) if isinstance(value, str) else int(value)
+        register_watches.append((str(watch.get('register', '')).upper(), watch.get('op', '=='), value))
+    return breakpoints, memory_watches, register_watches
+
+# Helper function to describe the debugger settings in parse_debug_settings() form
+def describe_debug_settings(microprocessor):
+    access_names = {bits: name for name, bits in WATCH_ACCESS.items()}
+    return {
+        'breakpoints': list(microprocessor.breakpoints),
+        'watchpoints': [{'start': watch.start, 'length': watch.end - watch.start + 1,
+                         'access': access_names[watch.access]}
+                        for watch in microprocessor.memory_watches],
+        'register_watches': [watch._asdict() for watch in microprocessor.register_watches]
+    }
+
+# Helper function to read an optional "window" object from a JSON body
+def get_request_window(data):
+    window = data.get('window')
+    if window is None:
+        return None
+    return parse_memory_window(window.get('start', 0), window.get('length', 0))
 
 @app.route('/')
 def index():
     # Ensure session is initialized when user first visits
     get_session_id()
-    return render_template('index.html')
+    return render_template('index.html', instruction_set=INSTRUCTION_SET)
 
 @app.route('/help')
 def help():
@@ -949,22 +1072,92 @@ def donate():
 def reset():
     microprocessor = get_microprocessor()
     microprocessor.reset()
-    return jsonify(microprocessor.get_state())
+    return jsonify(get_client_state(microprocessor))
 
 @app.route('/api/load', methods=['POST'])
 def load_program():
+    """Load a program image into memory and point PC at it.
+
+    A JSON body gives "program" at "start_address" (default 0), or a list
+    of {"start", "data"} "segments", decoded by "encoding": 'hex' (default),
+    'base64' or 'ihex' (Intel HEX, "program" only). An
+    application/octet-stream body is loaded as raw binary at the
+    start_address query parameter. "pc" sets PC, which otherwise goes to an
+    Intel HEX start record or the first segment. Every segment is checked
+    before memory is touched.
+    """
     microprocessor = get_microprocessor()
-    data = request.get_json()
-    program = [int(x, 16) for x in data['program'].split()]
-    start_address = int(data.get('start_address', 0))  # Default to 0 if not provided
-    microprocessor.load_program(program, start_address)
-    return jsonify(microprocessor.get_state())
+    try:
+        if request.mimetype == 'application/octet-stream':
+            data = request.args
+            start_address, _ = parse_memory_window(data.get('start_address', 0), 0)
+            segments, start = ((start_address, request.get_data()),), None
+        else:
+            data = request.get_json(silent=True) or {}
+            encoding = data.get('encoding', 'hex')
+            if 'segments' in data:
+                segments, start = [], None
+                for segment in data['segments']:
+                    address, _ = parse_memory_window(segment.get('start', 0), 0)
+                    segments.extend(decode_program_image(segment.get('data', ()), encoding, address)[0])
+            elif 'program' in data:
+                start_address, _ = parse_memory_window(data.get('start_address', 0), 0)
+                segments, start = decode_program_image(data['program'], encoding, start_address)
+            else:
+                raise ValueError('Expected "program" or "segments"')
+        pc = data.get('pc')
+        if pc is not None:
+            pc = int(pc, 0) if isinstance(pc, str) else int(pc)
+        elif start is not None:
+            pc = start
+        elif segments:
+            pc = segments[0][0]
+        microprocessor.load_segments(segments, pc)
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(get_client_state(microprocessor))
+
+@app.route('/api/assemble', methods=['POST'])
+def assemble_program():
+    """Assemble 8085 source into bytes with a per-line address map.
+
+    Results are cached by a hash of the source, so repeat assemblies are a
+    lookup. With "load": true the bytes are also written to the session's
+    memory and PC is set to the first assembled address.
+    """
+    data = request.get_json(silent=True) or {}
+    source = data.get('source')
+    if not isinstance(source, str):
+        return jsonify({'success': False, 'error': 'Expected a "source" string'}), 400
+    try:
+        key, assembly = assembly_cache.get(source)
+    except AssemblyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'errors': [{'line': line, 'message': message} for line, message in e.errors]
+        }), 400
+    
+    result = {
+        'success': True,
+        'hash': key,
+        'start': assembly.start,
+        'segments': [{'start': start, 'data': list(code)} for start, code in assembly.segments],
+        'lines': [{'line': line, 'address': address, 'size': size}
+                  for line, address, size in assembly.lines],
+        'symbols': assembly.symbols
+    }
+    if data.get('load'):
+        microprocessor = get_microprocessor()
+        microprocessor.load_segments(assembly.segments, assembly.start)
+        result['state'] = get_client_state(microprocessor)
+    return jsonify(result)
 
 @app.route('/api/step', methods=['POST'])
 def step():
     microprocessor = get_microprocessor()
-    microprocessor.execute_instruction()
-    return jsonify(microprocessor.get_state())
+    microprocessor.execute_instruction(journal=True)
+    return jsonify(get_client_state(microprocessor))
 
 @app.route('/api/goto', methods=['POST'])
 def goto():
@@ -975,21 +1168,15 @@ def goto():
     # Ensure address is an integer
     try:
         address = int(address)
-    except (TypeError, ValueError):
+        window = get_request_window(data)
+    except (TypeError, ValueError, AttributeError):
         return jsonify({'error': 'Invalid address format'}), 400
     
     success = microprocessor.goto_address(address)
     if not success:
         return jsonify({'error': 'Invalid address'}), 400
     
-    # Get the current state
-    state = microprocessor.get_state()
-    
-    # Ensure memory is properly initialized
-    if not state.get('memory'):
-        state['memory'] = [0x00] * 65536
-    
-    return jsonify(state)
+    return jsonify(get_client_state(microprocessor, window))
 
 @app.route('/api/write', methods=['POST'])
 def write():
@@ -1002,44 +1189,62 @@ def write():
     try:
         address = int(address)
         value = int(value)
-    except (TypeError, ValueError):
+        window = get_request_window(data)
+    except (TypeError, ValueError, AttributeError):
         return jsonify({'error': 'Invalid address or value format'}), 400
     
     success = microprocessor.write_to_memory(address, value)
     if not success:
         return jsonify({'error': 'Invalid address or value'}), 400
     
-    # Get the current state
-    state = microprocessor.get_state()
-    
-    # Ensure memory is properly initialized
-    if not state.get('memory'):
-        state['memory'] = [0x00] * 65536
-    
-    return jsonify(state)
+    return jsonify(get_client_state(microprocessor, window))
 
 @app.route('/api/execute', methods=['POST'])
 def execute():
     microprocessor = get_microprocessor()
     try:
-        microprocessor.execute_instruction()
+        microprocessor.execute_instruction(journal=True)
     except Exception as e:
         return jsonify({'error': f'Error executing instruction: {str(e)}'}), 500
     
-    # Get the current state
-    state = microprocessor.get_state()
-    
-    # Ensure memory is properly initialized
-    if not state.get('memory'):
-        state['memory'] = [0x00] * 65536
+    return jsonify(get_client_state(microprocessor))
+
+@app.route('/api/step_back', methods=['POST'])
+def step_back():
+    """Undo the last "count" (default 1) stepped instructions.
+
+    Only single steps (/api/step, /api/execute, /execute_instruction) are
+    journaled; loading, writing memory, running, executing an instruction
+    list or restoring a snapshot starts a new journal.
+    """
+    microprocessor = get_microprocessor()
+    data = request.get_json(silent=True) or {}
+    try:
+        count = int(data.get('count', 1))
+        window = get_request_window(data)
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'success': False, 'error': 'Invalid count'}), 400
+    if count < 1:
+        return jsonify({'success': False, 'error': 'Invalid count'}), 400
     
-    return jsonify(state)
+    undone = microprocessor.step_back(count)
+    return jsonify({
+        'success': True,
+        'undone': undone,
+        'undo_available': len(microprocessor.undo),
+        'state': get_client_state(microprocessor, window)
+    })
 
 @app.route('/api/run', methods=['POST'])
 def run():
     microprocessor = get_microprocessor()
     try:
-        state = microprocessor.run_until_halt()
+        max_instructions, time_limit = get_run_budget(request.get_json(silent=True))
+        state = microprocessor.run_until_halt(
+            since=get_client_memory_version(),
+            max_instructions=max_instructions,
+            time_limit=time_limit
+        )
         return jsonify(state)
     except Exception as e:
         return jsonify({'error': f'Error running program: {str(e)}'}), 500
@@ -1080,7 +1285,7 @@ def execute_instruction():
         original_pc = pc
         
         # Execute the instruction
-        result = microprocessor.execute_instruction()
+        result = microprocessor.execute_instruction(journal=True)
         
         # Check if the PC was updated
         new_pc = microprocessor.registers['PC']
@@ -1097,7 +1302,7 @@ def execute_instruction():
             })
         
         # Get the updated state
-        state = microprocessor.get_state()
+        state = get_client_state(microprocessor)
         
         # Add instruction to history
         instruction_history = [{
@@ -1128,27 +1333,20 @@ def execute_instruction():
 def run_program():
     microprocessor = get_microprocessor()
     try:
-        # Run the program until HLT is encountered
-        while True:
-            # Execute the current instruction
-            result = microprocessor.execute_instruction()
-            
-            # Check if HLT was encountered
-            if result.get('halt'):
-                break
-                
-            # Check for errors
-            if not result.get('success'):
-                return jsonify({
-                    'success': False,
-                    'error': result.get('error', 'Unknown error occurred')
-                })
+        # Run the program until HLT is encountered or the budget runs out
+        outcome = execution_service.run(microprocessor, get_run_budget(request.get_json(silent=True)))
         
-        # Return the final state
-        return jsonify({
-            'success': True,
-            'state': microprocessor.get_state()
-        })
+        # Check for errors
+        if outcome['status'] == 'error':
+            return jsonify({
+                'success': False,
+                'error': outcome.get('error', 'Unknown error occurred')
+            })
+        
+        # Return the final state; a 'paused' status can be resumed with /api/continue
+        outcome['success'] = True
+        outcome['state'] = get_client_state(microprocessor)
+        return jsonify(outcome)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -1160,64 +1358,295 @@ def get_memory():
     """Get the current memory state."""
     microprocessor = get_microprocessor()
     try:
-        # Return the current memory state
-        return jsonify({
-            'memory': microprocessor.memory,
-            'registers': microprocessor.registers,
-            'flags': microprocessor.flags
-        })
+        # Return the memory written since the client's last known version
+        data = microprocessor.memory_state(get_client_memory_version())
+        data['registers'] = microprocessor.registers.to_dict()
+        data['flags'] = microprocessor.flags.to_dict()
+        return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/memory', methods=['GET'])
+def read_memory():
+    """Read a window of memory.
+
+    Query parameters: start (default 0), length (default 64) and encoding:
+    'json' (list of ints, default), 'base64' or 'binary' (raw bytes).
+    """
+    microprocessor = get_microprocessor()
+    try:
+        start, length = parse_memory_window(
+            request.args.get('start', '0'), request.args.get('length', '64'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid start address or length'}), 400
+    
+    encoding = request.args.get('encoding', 'json')
+    data = microprocessor.read_memory(start, length)
+    
+    if encoding == 'binary':
+        return Response(data, mimetype='application/octet-stream', headers={
+            'X-Memory-Start': str(start),
+            'X-PC': str(microprocessor.registers.PC)
+        })
+    if encoding == 'base64':
+        data = base64.b64encode(data).decode('ascii')
+    elif encoding == 'json':
+        data = list(data)
+    else:
+        return jsonify({'error': f'Unknown encoding: {encoding}'}), 400
+    
+    return jsonify({
+        'start': start,
+        'length': length,
+        'encoding': encoding,
+        'data': data,
+        'pc': microprocessor.registers.PC
+    })
+
+# Helper function to describe one named snapshot
+def describe_checkpoint(name, checkpoint):
+    return {
+        'name': name,
+        'pc': checkpoint.pc,
+        'cycles': checkpoint.cycles,
+        'run_status': checkpoint.run_status,
+        'pages': sum(page is not ZERO_PAGE for page in checkpoint.pages)
+    }
+
+@app.route('/api/snapshots', methods=['GET'])
+def list_snapshots():
+    """List the session's named snapshots and the distinct memory pages they hold."""
+    microprocessor = get_microprocessor()
+    return jsonify({
+        'success': True,
+        'snapshots': [describe_checkpoint(name, checkpoint)
+                      for name, checkpoint in microprocessor.checkpoints.items()],
+        'distinct_pages': len(microprocessor.page_pool)
+    })
+
+@app.route('/api/snapshots', methods=['POST'])
+def save_snapshot():
+    """Save registers, flags, memory and cycle count as a named snapshot."""
+    microprocessor = get_microprocessor()
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    if not isinstance(name, str) or not 0 < len(name.encode('utf-8')) <= MAX_CHECKPOINT_NAME:
+        return jsonify({
+            'success': False,
+            'error': f'Expected a snapshot "name" of 1 to {MAX_CHECKPOINT_NAME} bytes'
+        }), 400
+    if name not in microprocessor.checkpoints and len(microprocessor.checkpoints) >= MAX_CHECKPOINTS:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_CHECKPOINTS} snapshots per session'
+        }), 400
+    checkpoint = microprocessor.save_checkpoint(name)
+    return jsonify({'success': True, 'snapshot': describe_checkpoint(name, checkpoint)})
+
+@app.route('/api/snapshots/<name>/restore', methods=['POST'])
+def restore_snapshot(name):
+    """Return the simulator to a named snapshot, rewriting only the memory pages that differ."""
+    microprocessor = get_microprocessor()
+    try:
+        restored_pages = microprocessor.restore_checkpoint(name)
+    except KeyError:
+        return jsonify({'success': False, 'error': f'Unknown snapshot: {name}'}), 404
+    state = get_client_state(microprocessor)
+    state['success'] = True
+    state['restored_pages'] = restored_pages
+    return jsonify(state)
+
+@app.route('/api/snapshots/<name>', methods=['DELETE'])
+def delete_snapshot(name):
+    microprocessor = get_microprocessor()
+    try:
+        microprocessor.delete_checkpoint(name)
+    except KeyError:
+        return jsonify({'success': False, 'error': f'Unknown snapshot: {name}'}), 404
+    return jsonify({'success': True})
+
+@app.route('/api/breakpoints', methods=['GET'])
+def get_breakpoints():
+    """List the session's breakpoints, memory watchpoints and register watches."""
+    microprocessor = get_microprocessor()
+    settings = describe_debug_settings(microprocessor)
+    settings['success'] = True
+    return jsonify(settings)
+
+@app.route('/api/breakpoints', methods=['POST'])
+def set_breakpoints():
+    """Replace the breakpoints and watchpoints that stop run requests.
+
+    Runs stop before executing a breakpoint address, after an instruction
+    reads or writes a watched memory range, or after an instruction makes a
+    register watch true, and come back with status "breakpoint" and a "hit".
+    """
+    microprocessor = get_microprocessor()
+    try:
+        microprocessor.set_debug(*parse_debug_settings(request.get_json(silent=True) or {}))
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    settings = describe_debug_settings(microprocessor)
+    settings['success'] = True
+    return jsonify(settings)
+
+@app.route('/api/breakpoints', methods=['DELETE'])
+def clear_breakpoints():
+    microprocessor = get_microprocessor()
+    microprocessor.set_debug()
+    return jsonify({'success': True})
+
+@app.route('/api/ports', methods=['GET'])
+def get_ports():
+    """List the session's scripted I/O ports with their pending input and captured output."""
+    microprocessor = get_microprocessor()
+    return jsonify({'success': True, 'ports': microprocessor.port_state()})
+
+@app.route('/api/ports', methods=['POST'])
+def set_ports():
+    """Replace the session's scripted I/O ports.
+
+    IN from a scripted port reads its next input byte (then "default", FFH
+    unless given) and OUT appends to its captured output; unmapped ports
+    read FFH and ignore writes.
+    """
+    microprocessor = get_microprocessor()
+    try:
+        ports = parse_port_settings(request.get_json(silent=True) or {})
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    set_scripted_ports(microprocessor, ports)
+    return jsonify({'success': True, 'ports': microprocessor.port_state()})
+
+@app.route('/api/ports', methods=['DELETE'])
+def clear_ports():
+    microprocessor = get_microprocessor()
+    set_scripted_ports(microprocessor, {})
+    return jsonify({'success': True})
+
+@app.route('/api/interrupts', methods=['GET'])
+def get_interrupts():
+    """Show the interrupt enable state, masks, pending lines and scheduled events."""
+    microprocessor = get_microprocessor()
+    return jsonify(dict(microprocessor.interrupts.to_dict(), success=True))
+
+@app.route('/api/interrupts', methods=['POST'])
+def schedule_interrupts():
+    """Schedule interrupt line events (see parse_interrupt_events).
+
+    Lines are TRAP, RST7.5, RST6.5, RST5.5 and INTR. An event with
+    "after": 0 raises its line before the next instruction.
+    """
+    microprocessor = get_microprocessor()
+    try:
+        events = [InterruptController.check_event(event) for event in
+                  parse_interrupt_events(request.get_json(silent=True) or {}, microprocessor.cycles)]
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    for event in events:
+        microprocessor.interrupts.schedule(event)
+    return jsonify(dict(microprocessor.interrupts.to_dict(), success=True))
+
+@app.route('/api/interrupts', methods=['DELETE'])
+def clear_interrupts():
+    microprocessor = get_microprocessor()
+    microprocessor.interrupts.clear()
+    return jsonify({'success': True})
+
+@app.route('/api/sessions/stats', methods=['GET'])
+def session_stats():
+    """Report live sessions and how many were created, evicted, expired, spilled and restored."""
+    return jsonify(processor_manager.stats())
+
 @app.route('/run_from_address', methods=['POST'])
 def run_from_address():
     microprocessor = get_microprocessor()
+    data = request.get_json(silent=True) or {}
+    try:
+        budget = get_run_budget(data)
+        stream_format = get_stream_format(data)
+        parse_trace_options(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     try:
-        data = request.get_json()
         start_address = data.get('address', 0)
         
         # Set the program counter to start address
         microprocessor.registers['PC'] = start_address
         
-        # Execute instructions until HLT is encountered
-        instruction_history = []
-        halted = False
-        
-        while not halted and microprocessor.registers['PC'] < 0xFFFF:
-            # Get the current PC
-            current_address = microprocessor.registers['PC']
-            
-            # Get the current opcode
-            opcode = microprocessor.memory[current_address]
-            
-            # Get instruction info for history before execution
-            mnemonic, operand = get_instruction_info(opcode, microprocessor.memory, current_address)
-            
-            # Execute the instruction and get the result
-            result = microprocessor.execute_instruction()
-            
-            # Add to instruction history
-            instruction_history.append({
-                'address': current_address,
-                'opcode': opcode,
-                'mnemonic': mnemonic,
-                'operand': operand,
-                'machine_code': format_machine_code(opcode, microprocessor.memory, current_address)
-            })
-            
-            # Check if HLT was encountered
-            if opcode == 0x76 or result.get('halt'):
-                halted = True
-                break
+        # Execute instructions until HLT is encountered or the budget runs out
+        if stream_format:
+            recorder = get_trace_recorder(microprocessor, data, STREAM_TRACE_LIMIT)
+            return stream_run(microprocessor, budget, recorder, stream_format)
+        outcome = execution_service.run(microprocessor, budget, data)
         
         # Get the final state
-        state = microprocessor.get_state()
+        outcome['success'] = True
+        outcome['state'] = get_client_state(microprocessor)
+        return jsonify(outcome)
         
+    except Exception as e:
         return jsonify({
-            'success': True,
-            'state': state,
-            'instruction_history': instruction_history
-        })
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/continue', methods=['POST'])
+def continue_run():
+    """Resume a paused run from the current PC with a fresh execution budget."""
+    microprocessor = get_microprocessor()
+    data = request.get_json(silent=True) or {}
+    trace = data.get('trace', True)
+    try:
+        budget = get_run_budget(data)
+        stream_format = get_stream_format(data)
+        if trace:
+            parse_trace_options(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    try:
+        if stream_format:
+            recorder = get_trace_recorder(microprocessor, data, STREAM_TRACE_LIMIT) if trace else None
+            return stream_run(microprocessor, budget, recorder, stream_format)
+        
+        outcome = execution_service.run(microprocessor, budget, data if trace else None)
+        
+        outcome['success'] = True
+        outcome['state'] = get_client_state(microprocessor)
+        return jsonify(outcome)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/profile', methods=['POST'])
+def profile():
+    """Run from "address" (or the current PC) and report executions and T-states per address and opcode."""
+    microprocessor = get_microprocessor()
+    data = request.get_json(silent=True) or {}
+    try:
+        budget = get_run_budget(data)
+        limit = data.get('limit')
+        if limit is not None:
+            limit = int(limit)
+            if limit < 0:
+                raise ValueError(limit)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid limit or run budget'}), 400
+    try:
+        if data.get('address') is not None:
+            microprocessor.registers['PC'] = data['address']
+        
+        profiler = Profiler(microprocessor)
+        outcome = microprocessor.run(*budget, trace=profiler)
+        profiler.finish()
+        
+        outcome['success'] = True
+        outcome['profile'] = profiler.report(limit)
+        outcome['state'] = get_client_state(microprocessor)
+        return jsonify(outcome)
         
     except Exception as e:
         return jsonify({
@@ -1225,6 +1654,109 @@ def run_from_address():
             'error': str(e)
         }), 500
 
+@app.route('/api/batch', methods=['POST'])
+def run_batch():
+    """Run many independent programs, each on a fresh microprocessor, in one request.
+
+    Does not touch the session's simulator. Results come back in job order;
+    a job's "id", if given, is echoed back.
+    """
+    data = request.get_json(silent=True) or {}
+    jobs = data.get('jobs')
+    if not isinstance(jobs, list):
+        return jsonify({'success': False, 'error': 'Expected a "jobs" list'}), 400
+    if len(jobs) > MAX_BATCH_JOBS:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_BATCH_JOBS} jobs per batch'
+        }), 400
+    
+    # Wall-clock deadline, since jobs may run in other processes
+    deadline = time.time() + MAX_BATCH_SECONDS
+    results = execution_service.map(run_batch_entry, jobs, [deadline] * len(jobs))
+    
+    return jsonify({'success': True, 'results': results})
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Start a background run of the session's program and return its job id.
+
+    Takes the same "address" and budget fields as /run_from_address, with
+    the larger job limits. The session itself is left untouched until the
+    job's result is loaded.
+    """
+    microprocessor = get_microprocessor()
+    data = request.get_json(silent=True) or {}
+    try:
+        budget = get_run_budget(data, MAX_JOB_INSTRUCTIONS, MAX_JOB_SECONDS)
+        address = data.get('address')
+        if address is not None:
+            address, _ = parse_memory_window(address, 0)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid address or run budget'}), 400
+    try:
+        if address is not None:
+            microprocessor = Microprocessor8085.from_snapshot(microprocessor.to_snapshot())
+            microprocessor.registers['PC'] = address
+        job = job_manager.submit(g.cpu_session_id, microprocessor, budget)
+        return jsonify({'success': True, 'job': job.to_dict()}), 202
+    except JobLimitError as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Helper function to look up one of the current session's jobs
+def get_session_job(job_id):
+    return job_manager.get(get_session_id(), job_id)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Poll a job's state and progress (instructions executed, cycles, PC)."""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Ask a job to stop; it does so at the end of its current slice."""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    job_manager.cancel(job)
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/result', methods=['POST'])
+def job_result(job_id):
+    """Load a finished or cancelled job's final state into the session and return it."""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if job.finished_at is None:
+        return jsonify({'success': False, 'error': 'Job has not finished', 'job': job.to_dict()}), 409
+    job_manager.remove(job)
+    if job.state == 'failed':
+        return jsonify({'success': False, 'error': job.outcome.get('error'), 'job': job.to_dict()})
+    if job.outcome is None:
+        # Cancelled before it started
+        return jsonify({'success': False, 'error': 'Job was cancelled before it ran', 'job': job.to_dict()})
+    
+    microprocessor = get_microprocessor()
+    moved_on = (microprocessor.mem_epoch, microprocessor.mem_version) != job.base_memory_version
+    microprocessor.restore_snapshot(job.snapshot)
+    if moved_on:
+        # The session changed while the job ran, so the client's memory
+        # version no longer describes this memory; start a new epoch
+        microprocessor.mem_epoch = uuid.uuid4().hex[:12]
+    outcome = dict(job.outcome)
+    outcome['success'] = True
+    outcome['job'] = job.to_dict()
+    outcome['state'] = get_client_state(microprocessor)
+    return jsonify(outcome)
+
 @app.route('/execute_instructions', methods=['POST'])
 def execute_instructions():
     microprocessor = get_microprocessor()
@@ -1250,17 +1782,14 @@ def execute_instructions():
             # Execute the instruction
             result = microprocessor.execute_instruction()
             
-            # Get updated state
-            state = microprocessor.get_state()
-            
             # Add to instruction history
             instruction_history.append({
                 'address': address,
                 'opcode': opcode,
                 'mnemonic': mnemonic,
                 'operand': operand,
-                'registers': state['registers'],
-                'flags': state['flags']
+                'registers': microprocessor.registers.to_dict(),
+                'flags': microprocessor.flags.to_dict()
             })
             
             # Check if HLT was encountered
@@ -1269,7 +1798,7 @@ def execute_instructions():
         
         return jsonify({
             'success': True,
-            'state': microprocessor.get_state(),
+            'state': get_client_state(microprocessor),
             'instruction_history': instruction_history
         })
         
@@ -1281,270 +1810,23 @@ def execute_instructions():
 
 def get_instruction_info(opcode, memory, pc):
     """Get mnemonic and operand for an instruction based on opcode."""
-    # Instruction set mapping
-    instruction_set = {
-        # Data Transfer Group
-        0x40: ('MOV B,B', ''),
-        0x41: ('MOV B,C', ''),
-        0x42: ('MOV B,D', ''),
-        0x43: ('MOV B,E', ''),
-        0x44: ('MOV B,H', ''),
-        0x45: ('MOV B,L', ''),
-        0x46: ('MOV B,M', ''),
-        0x47: ('MOV B,A', ''),
-        0x48: ('MOV C,B', ''),
-        0x49: ('MOV C,C', ''),
-        0x4A: ('MOV C,D', ''),
-        0x4B: ('MOV C,E', ''),
-        0x4C: ('MOV C,H', ''),
-        0x4D: ('MOV C,L', ''),
-        0x4E: ('MOV C,M', ''),
-        0x4F: ('MOV C,A', ''),
-        0x50: ('MOV D,B', ''),
-        0x51: ('MOV D,C', ''),
-        0x52: ('MOV D,D', ''),
-        0x53: ('MOV D,E', ''),
-        0x54: ('MOV D,H', ''),
-        0x55: ('MOV D,L', ''),
-        0x56: ('MOV D,M', ''),
-        0x57: ('MOV D,A', ''),
-        0x58: ('MOV E,B', ''),
-        0x59: ('MOV E,C', ''),
-        0x5A: ('MOV E,D', ''),
-        0x5B: ('MOV E,E', ''),
-        0x5C: ('MOV E,H', ''),
-        0x5D: ('MOV E,L', ''),
-        0x5E: ('MOV E,M', ''),
-        0x5F: ('MOV E,A', ''),
-        0x60: ('MOV H,B', ''),
-        0x61: ('MOV H,C', ''),
-        0x62: ('MOV H,D', ''),
-        0x63: ('MOV H,E', ''),
-        0x64: ('MOV H,H', ''),
-        0x65: ('MOV H,L', ''),
-        0x66: ('MOV H,M', ''),
-        0x67: ('MOV H,A', ''),
-        0x68: ('MOV L,B', ''),
-        0x69: ('MOV L,C', ''),
-        0x6A: ('MOV L,D', ''),
-        0x6B: ('MOV L,E', ''),
-        0x6C: ('MOV L,H', ''),
-        0x6D: ('MOV L,L', ''),
-        0x6E: ('MOV L,M', ''),
-        0x6F: ('MOV L,A', ''),
-        0x70: ('MOV M,B', ''),
-        0x71: ('MOV M,C', ''),
-        0x72: ('MOV M,D', ''),
-        0x73: ('MOV M,E', ''),
-        0x74: ('MOV M,H', ''),
-        0x75: ('MOV M,L', ''),
-        0x77: ('MOV M,A', ''),
-        0x78: ('MOV A,B', ''),
-        0x79: ('MOV A,C', ''),
-        0x7A: ('MOV A,D', ''),
-        0x7B: ('MOV A,E', ''),
-        0x7C: ('MOV A,H', ''),
-        0x7D: ('MOV A,L', ''),
-        0x7E: ('MOV A,M', ''),
-        0x7F: ('MOV A,A', ''),
-        
-        # Immediate Data Transfer
-        0x06: ('MVI B', ''),
-        0x0E: ('MVI C', ''),
-        0x16: ('MVI D', ''),
-        0x1E: ('MVI E', ''),
-        0x26: ('MVI H', ''),
-        0x2E: ('MVI L', ''),
-        0x36: ('MVI M', ''),
-        0x3E: ('MVI A', ''),
-        
-        # Register Pair Instructions
-        0x01: ('LXI B', ''),
-        0x11: ('LXI D', ''),
-        0x21: ('LXI H', ''),
-        0x31: ('LXI SP', ''),
-        0x03: ('INX B', ''),
-        0x13: ('INX D', ''),
-        0x23: ('INX H', ''),
-        0x33: ('INX SP', ''),
-        0x0B: ('DCX B', ''),
-        0x1B: ('DCX D', ''),
-        0x2B: ('DCX H', ''),
-        0x3B: ('DCX SP', ''),
-        
-        # Direct Addressing Instructions
-        0x32: ('STA', ''),
-        0x3A: ('LDA', ''),
-        0x22: ('SHLD', ''),
-        0x2A: ('LHLD', ''),
-        
-        # Indirect Addressing Instructions
-        0x02: ('STAX B', ''),
-        0x12: ('STAX D', ''),
-        0x0A: ('LDAX B', ''),
-        0x1A: ('LDAX D', ''),
-        
-        # Arithmetic Group
-        0x80: ('ADD B', ''),
-        0x81: ('ADD C', ''),
-        0x82: ('ADD D', ''),
-        0x83: ('ADD E', ''),
-        0x84: ('ADD H', ''),
-        0x85: ('ADD L', ''),
-        0x86: ('ADD M', ''),
-        0x87: ('ADD A', ''),
-        0xC6: ('ADI', ''),
-        
-        0x88: ('ADC B', ''),
-        0x89: ('ADC C', ''),
-        0x8A: ('ADC D', ''),
-        0x8B: ('ADC E', ''),
-        0x8C: ('ADC H', ''),
-        0x8D: ('ADC L', ''),
-        0x8E: ('ADC M', ''),
-        0x8F: ('ADC A', ''),
-        0xCE: ('ACI', ''),
-        
-        0x90: ('SUB B', ''),
-        0x91: ('SUB C', ''),
-        0x92: ('SUB D', ''),
-        0x93: ('SUB E', ''),
-        0x94: ('SUB H', ''),
-        0x95: ('SUB L', ''),
-        0x96: ('SUB M', ''),
-        0x97: ('SUB A', ''),
-        0xD6: ('SUI', ''),
-        
-        # Branch Group
-        0xC3: ('JMP', ''),
-        0xC2: ('JNZ', ''),
-        0xCA: ('JZ', ''),
-        0xD2: ('JNC', ''),
-        0xDA: ('JC', ''),
-        0xE2: ('JPO', ''),
-        0xEA: ('JPE', ''),
-        0xF2: ('JP', ''),
-        0xFA: ('JM', ''),
-        
-        # Call and Return Group
-        0xCD: ('CALL', ''),
-        0xC4: ('CNZ', ''),
-        0xCC: ('CZ', ''),
-        0xD4: ('CNC', ''),
-        0xDC: ('CC', ''),
-        0xE4: ('CPO', ''),
-        0xEC: ('CPE', ''),
-        0xF4: ('CP', ''),
-        0xFC: ('CM', ''),
-        
-        0xC9: ('RET', ''),
-        0xC0: ('RNZ', ''),
-        0xC8: ('RZ', ''),
-        0xD0: ('RNC', ''),
-        0xD8: ('RC', ''),
-        0xE0: ('RPO', ''),
-        0xE8: ('RPE', ''),
-        0xF0: ('RP', ''),
-        0xF8: ('RM', ''),
-        
-        # Stack Operations
-        0xC5: ('PUSH B', ''),
-        0xD5: ('PUSH D', ''),
-        0xE5: ('PUSH H', ''),
-        0xF5: ('PUSH PSW', ''),
-        0xC1: ('POP B', ''),
-        0xD1: ('POP D', ''),
-        0xE1: ('POP H', ''),
-        0xF1: ('POP PSW', ''),
-        
-        # Special Instructions
-        0x00: ('NOP', ''),
-        0x76: ('HLT', ''),
-        0xF3: ('DI', ''),
-        0xFB: ('EI', ''),
-        
-        # Logical Group
-        0xA0: ('ANA B', ''),
-        0xA1: ('ANA C', ''),
-        0xA2: ('ANA D', ''),
-        0xA3: ('ANA E', ''),
-        0xA4: ('ANA H', ''),
-        0xA5: ('ANA L', ''),
-        0xA6: ('ANA M', ''),
-        0xA7: ('ANA A', ''),
-        0xE6: ('ANI', ''),
-        
-        0xB0: ('ORA B', ''),
-        0xB1: ('ORA C', ''),
-        0xB2: ('ORA D', ''),
-        0xB3: ('ORA E', ''),
-        0xB4: ('ORA H', ''),
-        0xB5: ('ORA L', ''),
-        0xB6: ('ORA M', ''),
-        0xB7: ('ORA A', ''),
-        0xF6: ('ORI', ''),
-        
-        0xA8: ('XRA B', ''),
-        0xA9: ('XRA C', ''),
-        0xAA: ('XRA D', ''),
-        0xAB: ('XRA E', ''),
-        0xAC: ('XRA H', ''),
-        0xAD: ('XRA L', ''),
-        0xAE: ('XRA M', ''),
-        0xAF: ('XRA A', ''),
-        0xEE: ('XRI', ''),
-        
-        0xB8: ('CMP B', ''),
-        0xB9: ('CMP C', ''),
-        0xBA: ('CMP D', ''),
-        0xBB: ('CMP E', ''),
-        0xBC: ('CMP H', ''),
-        0xBD: ('CMP L', ''),
-        0xBE: ('CMP M', ''),
-        0xBF: ('CMP A', ''),
-        0xFE: ('CPI', ''),
-        
-        # Rotate Group
-        0x07: ('RLC', ''),
-        0x0F: ('RRC', ''),
-        0x17: ('RAL', ''),
-        0x1F: ('RAR', ''),
-        
-        # I/O Instructions
-        0xDB: ('IN', ''),
-        0xD3: ('OUT', ''),
-        0xEB: ('XCHG', '')
-    }
-    
-    # Get the instruction info
-    info = instruction_set.get(opcode, ('UNKNOWN', ''))
-    mnemonic = info[0]
-    operand = info[1]
-    
-    # Handle different instruction types
-    if opcode in [0x06, 0x0E, 0x16, 0x1E, 0x26, 0x2E, 0x36, 0x3E, 0xC6, 0xCE, 0xD6, 0xFE, 0xE6, 0xF6, 0xEE]:
+    info = DECODE_TABLE[opcode]
+    if info.length == 2:
         # Instructions with one byte operand
-        operand = f"#{memory[pc + 1]:02X}"
-    elif opcode in [0x01, 0x11, 0x21, 0x31, 0xC3, 0xC2, 0xCA, 0xD2, 0xDA, 0xE2, 0xEA, 0xF2, 0xFA, 0xCD, 0xC4, 0xCC, 0xD4, 0xDC, 0xE4, 0xEC, 0xF4, 0xFC, 0x32, 0x3A, 0x22, 0x2A]:
+        return info.mnemonic, f"#{memory[(pc + 1) & 0xFFFF]:02X}"
+    if info.length == 3:
         # Instructions with two byte operand
-        operand = f"#{memory[pc + 2]:02X}{memory[pc + 1]:02X}"
-    
-    return mnemonic, operand
+        return info.mnemonic, f"#{memory[(pc + 2) & 0xFFFF]:02X}{memory[(pc + 1) & 0xFFFF]:02X}"
+    return info.mnemonic, ''
 
 def format_machine_code(opcode, memory, pc):
     """Format machine code for display."""
-    # Build the machine code string
-    machine_code = f"{opcode:02X}"
-    
-    # Handle different instruction types
-    if opcode in [0x06, 0x0E, 0x16, 0x1E, 0x26, 0x2E, 0x36, 0x3E, 0xC6, 0xCE, 0xD6, 0xFE, 0xE6, 0xF6, 0xEE]:
-        # Instructions with one byte operand
-        machine_code += f" {memory[pc + 1]:02X}"
-    elif opcode in [0x01, 0x11, 0x21, 0x31, 0xC3, 0xC2, 0xCA, 0xD2, 0xDA, 0xE2, 0xEA, 0xF2, 0xFA, 0xCD, 0xC4, 0xCC, 0xD4, 0xDC, 0xE4, 0xEC, 0xF4, 0xFC, 0x32, 0x3A, 0x22, 0x2A]:
-        # Instructions with two byte operand
-        machine_code += f" {memory[pc + 1]:02X} {memory[pc + 2]:02X}"
-    
-    return machine_code
+    length = DECODE_TABLE[opcode].length
+    if length == 2:
+        return f"{opcode:02X} {memory[(pc + 1) & 0xFFFF]:02X}"
+    if length == 3:
+        return f"{opcode:02X} {memory[(pc + 1) & 0xFFFF]:02X} {memory[(pc + 2) & 0xFFFF]:02X}"
+    return f"{opcode:02X}"
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 10000))
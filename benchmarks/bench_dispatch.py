@@ -0,0 +1,63 @@
+"""Instructions-per-second benchmark for Microprocessor8085.
+
+Measures single-stepping through execute_instruction() and whole-program
+execution through run(), which uses the translated block cache.
+
+Run from the repository root:
+
+    python benchmarks/bench_dispatch.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpu8085 import Microprocessor8085  # noqa: E402
+from workloads import WORKLOADS, load_workload  # noqa: E402
+
+
+def step_program(workload, repeat):
+    """Single-step a workload `repeat` times and return (instructions, seconds)."""
+    executed = 0
+    elapsed = 0.0
+    for _ in range(repeat):
+        cpu = Microprocessor8085()
+        load_workload(cpu, workload)
+        start = time.perf_counter()
+        while True:
+            result = cpu.execute_instruction()
+            executed += 1
+            if result and result.get('halt'):
+                break
+        elapsed += time.perf_counter() - start
+    return executed, elapsed
+
+
+def run_program(workload, repeat):
+    """Run a workload to HLT with run() `repeat` times and return (instructions, seconds)."""
+    executed = 0
+    elapsed = 0.0
+    for _ in range(repeat):
+        cpu = Microprocessor8085()
+        load_workload(cpu, workload)
+        start = time.perf_counter()
+        outcome = cpu.run(max_instructions=10_000_000, time_limit=0)
+        elapsed += time.perf_counter() - start
+        assert outcome['status'] == 'halted', outcome
+        executed += outcome['executed']
+    return executed, elapsed
+
+
+def main():
+    repeat = int(os.environ.get('BENCH_REPEAT', 5))
+    print(f"{'program':<18}{'instructions':>14}{'step instr/s':>16}{'run instr/s':>16}")
+    for name, workload in WORKLOADS.items():
+        executed, step_elapsed = step_program(workload, repeat)
+        _, run_elapsed = run_program(workload, repeat)
+        print(f"{name:<18}{executed:>14}{executed / step_elapsed:>16,.0f}"
+              f"{executed / run_elapsed:>16,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Benchmark and regression suite for the emulator core.
+
+For every workload in workloads.py it checks the finished machine against
+the expected result, then measures instructions per second through run()
+(the block cache) and through execute_instruction(). It also measures the
+latency of the main Flask endpoints through the test client and the memory
+held per session, and compares everything against a stored baseline.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py            # compare with the baseline
+    python benchmarks/bench_suite.py --save     # record a new baseline
+
+The exit status is 1 when a workload computes the wrong result or a metric
+is more than --tolerance worse than the baseline. Timings are machine
+dependent, so record the baseline on the machine that runs the comparison.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as fg8085  # noqa: E402
+from workloads import WORKLOADS, check_workload, load_workload  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SESSION_SAMPLE = 100
+
+
+def run_instructions_per_second(workload, repeat):
+    """Best run() rate over `repeat` runs, and the problems found in the last one."""
+    best = 0.0
+    for _ in range(repeat):
+        cpu = fg8085.Microprocessor8085()
+        load_workload(cpu, workload)
+        start = time.perf_counter()
+        outcome = cpu.run(max_instructions=10_000_000, time_limit=0)
+        elapsed = time.perf_counter() - start
+        best = max(best, outcome['executed'] / elapsed)
+    problems = check_workload(cpu, workload)
+    if outcome['status'] != 'halted':
+        problems.append(f"run ended with status {outcome['status']!r}")
+    return best, problems
+
+
+def step_instructions_per_second(workload, repeat):
+    """Best execute_instruction() rate over `repeat` runs, and the problems found."""
+    best = 0.0
+    for _ in range(repeat):
+        cpu = fg8085.Microprocessor8085()
+        load_workload(cpu, workload)
+        executed = 0
+        start = time.perf_counter()
+        while True:
+            result = cpu.execute_instruction()
+            executed += 1
+            if result and result.get('halt'):
+                break
+        elapsed = time.perf_counter() - start
+        best = max(best, executed / elapsed)
+    return best, check_workload(cpu, workload)
+
+
+def median_latency(client, method, url, repeat, **kwargs):
+    """Median seconds per request, following the memory version like the web client."""
+    version = None
+    samples = []
+    for _ in range(repeat):
+        headers = {'X-Memory-Version': version} if version else {}
+        start = time.perf_counter()
+        response = client.open(url, method=method, headers=headers, **kwargs)
+        samples.append(time.perf_counter() - start)
+        body = response.get_json(silent=True) or {}
+        state = body.get('state', body)
+        if 'memory_epoch' in state:
+            version = f"{state['memory_epoch']}:{state['memory_version']}"
+    return statistics.median(samples)
+
+
+def endpoint_latencies(repeat):
+    """Median latency of the main endpoints, in milliseconds."""
+    client = fg8085.app.test_client()
+    program = ' '.join(f'{byte:02X}' for byte in WORKLOADS['delay_loop'].program)
+    client.post('/api/load', json={'program': program})
+    results = {
+        'reset': median_latency(client, 'POST', '/api/reset', repeat),
+        'load': median_latency(client, 'POST', '/api/load', repeat,
+                               json={'program': program}),
+        'step': median_latency(client, 'POST', '/api/step', repeat),
+        'memory_window': median_latency(client, 'GET', '/api/memory?start=0&length=256', repeat),
+        'run_from_address': median_latency(client, 'POST', '/run_from_address', max(1, repeat // 10),
+                                           json={'address': 0, 'trace_format': 'binary'}),
+    }
+    return {name: seconds * 1000 for name, seconds in results.items()}
+
+
+def memory_per_session():
+    """Bytes held per session after running a program, and the snapshot size."""
+    manager = fg8085.MicroprocessorManager()
+    workload = WORKLOADS['bubble_sort']
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for index in range(SESSION_SAMPLE):
+        cpu = manager.get_instance(f'bench-{index}')
+        load_workload(cpu, workload)
+        cpu.run(max_instructions=10_000_000, time_limit=0)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / SESSION_SAMPLE, len(cpu.to_snapshot())
+
+
+def collect(repeat):
+    """Run the whole suite and return (metrics, problems)."""
+    metrics = {}
+    problems = []
+    for name, workload in WORKLOADS.items():
+        rate, found = run_instructions_per_second(workload, repeat)
+        metrics[f'run.{name}.instr_per_s'] = rate
+        problems += [f'{name} (run): {problem}' for problem in found]
+        rate, found = step_instructions_per_second(workload, repeat)
+        metrics[f'step.{name}.instr_per_s'] = rate
+        problems += [f'{name} (step): {problem}' for problem in found]
+    for name, ms in endpoint_latencies(repeat * 20).items():
+        metrics[f'endpoint.{name}.ms'] = ms
+    session_bytes, snapshot_bytes = memory_per_session()
+    metrics['session.bytes'] = session_bytes
+    metrics['session.snapshot_bytes'] = snapshot_bytes
+    return metrics, problems
+
+
+def compare(metrics, baseline, tolerance):
+    """Return the metrics more than `tolerance` worse than the baseline."""
+    regressions = []
+    for name, value in metrics.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        # Rates should not drop; latencies and sizes should not grow
+        if name.endswith('instr_per_s'):
+            change = (reference - value) / reference
+        else:
+            change = (value - reference) / reference
+        if change > tolerance:
+            regressions.append(f'{name}: {value:,.3f} vs baseline {reference:,.3f} ({change:.0%} worse)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file (default: %(default)s)')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown before a metric counts as a regression (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=int(os.environ.get('BENCH_REPEAT', 5)),
+                        help='runs per workload; the best is kept (default: %(default)s)')
+    args = parser.parse_args()
+
+    metrics, problems = collect(args.repeat)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"{'metric':<40}{'value':>16}{'baseline':>16}")
+    for name, value in metrics.items():
+        reference = baseline.get(name)
+        reference = f'{reference:>16,.3f}' if reference is not None else f"{'-':>16}"
+        print(f'{name:<40}{value:>16,.3f}{reference}')
+
+    for problem in problems:
+        print(f'WRONG RESULT {problem}')
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline written to {args.baseline}')
+        return 1 if problems else 0
+
+    regressions = compare(metrics, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if problems or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Canonical 8085 workloads shared by the benchmarks.
+
+Every program is loaded at 0000H and ends with HLT. `data` is written to
+memory before the run, and `expect` describes the finished machine:
+register values by name and memory contents by start address.
+"""
+from collections import namedtuple
+
+Workload = namedtuple('Workload', 'program data expect')
+
+BUBBLE_SORT_SIZE = 32
+
+WORKLOADS = {
+    # MVI B,40H / L1: MVI C,FFH / L2: DCR C / JNZ L2 / DCR B / JNZ L1 / HLT
+    'delay_loop': Workload(
+        program=[
+            0x06, 0x40,
+            0x0E, 0xFF,
+            0x0D,
+            0xC2, 0x04, 0x00,
+            0x05,
+            0xC2, 0x02, 0x00,
+            0x76,
+        ],
+        data={},
+        expect={'registers': {'B': 0x00, 'C': 0x00, 'PC': 0x000C}},
+    ),
+    # LXI H,2000H / LXI D,3000H / MVI C,FFH
+    # L: MOV A,M / STAX D / INX H / INX D / DCR C / JNZ L / HLT
+    'block_copy': Workload(
+        program=[
+            0x21, 0x00, 0x20,
+            0x11, 0x00, 0x30,
+            0x0E, 0xFF,
+            0x7E,
+            0x12,
+            0x23,
+            0x13,
+            0x0D,
+            0xC2, 0x08, 0x00,
+            0x76,
+        ],
+        data={0x2000: bytes(range(0xFF))},
+        expect={'registers': {'H': 0x20, 'L': 0xFF, 'D': 0x30, 'E': 0xFF},
+                'memory': {0x3000: bytes(range(0xFF))}},
+    ),
+    # MVI A,00H / MVI B,03H / MVI C,FFH / L: ADD B / DCR C / JNZ L / HLT
+    'multiply_by_add': Workload(
+        program=[
+            0x3E, 0x00,
+            0x06, 0x03,
+            0x0E, 0xFF,
+            0x80,
+            0x0D,
+            0xC2, 0x06, 0x00,
+            0x76,
+        ],
+        data={},
+        expect={'registers': {'A': (3 * 0xFF) & 0xFF}},
+    ),
+    # Adds the 8-digit BCD number at 2100H into the one at 2000H, 64 times
+    # MVI B,40H / R: LXI H,2000H / LXI D,2100H / MVI C,04H / ORA A
+    # L: LDAX D / ADC M / DAA / MOV M,A / INX H / INX D / DCR C / JNZ L
+    # DCR B / JNZ R / HLT
+    'bcd_add': Workload(
+        program=[
+            0x06, 0x40,
+            0x21, 0x00, 0x20,
+            0x11, 0x00, 0x21,
+            0x0E, 0x04,
+            0xB7,
+            0x1A,
+            0x8E,
+            0x27,
+            0x77,
+            0x23,
+            0x13,
+            0x0D,
+            0xC2, 0x0B, 0x00,
+            0x05,
+            0xC2, 0x02, 0x00,
+            0x76,
+        ],
+        # 00123456 + 64 x 00987654 = 63333312, least significant byte first
+        data={0x2000: bytes([0x56, 0x34, 0x12, 0x00]),
+              0x2100: bytes([0x54, 0x76, 0x98, 0x00])},
+        expect={'memory': {0x2000: bytes([0x12, 0x33, 0x33, 0x63])}},
+    ),
+    # Sorts the bytes at 2000H into ascending order
+    # MVI B,n-1 / P: LXI H,2000H / MVI C,n-1
+    # L: MOV A,M / INX H / CMP M / JC N / JZ N
+    # MOV D,M / MOV M,A / DCX H / MOV M,D / INX H
+    # N: DCR C / JNZ L / DCR B / JNZ P / HLT
+    'bubble_sort': Workload(
+        program=[
+            0x06, BUBBLE_SORT_SIZE - 1,
+            0x21, 0x00, 0x20,
+            0x0E, BUBBLE_SORT_SIZE - 1,
+            0x7E,
+            0x23,
+            0xBE,
+            0xDA, 0x15, 0x00,
+            0xCA, 0x15, 0x00,
+            0x56,
+            0x77,
+            0x2B,
+            0x72,
+            0x23,
+            0x0D,
+            0xC2, 0x07, 0x00,
+            0x05,
+            0xC2, 0x02, 0x00,
+            0x76,
+        ],
+        data={0x2000: bytes(range(BUBBLE_SORT_SIZE, 0, -1))},
+        expect={'memory': {0x2000: bytes(range(1, BUBBLE_SORT_SIZE + 1))}},
+    ),
+    # Sums 100 + 99 + ... + 1 by recursing 100 deep, 200 times over
+    # LXI SP,F000H / MVI E,C8H / R: MVI B,64H / MVI A,00H / CALL S
+    # DCR E / JNZ R / HLT / NOP / NOP
+    # S: ADD B / DCR B / RZ / CALL S / RET
+    'call_recursion': Workload(
+        program=[
+            0x31, 0x00, 0xF0,
+            0x1E, 0xC8,
+            0x06, 0x64,
+            0x3E, 0x00,
+            0xCD, 0x13, 0x00,
+            0x1D,
+            0xC2, 0x05, 0x00,
+            0x76,
+            0x00, 0x00,
+            0x80,
+            0x05,
+            0xC8,
+            0xCD, 0x13, 0x00,
+            0xC9,
+        ],
+        data={},
+        expect={'registers': {'A': sum(range(101)) & 0xFF, 'SP': 0xF000}},
+    ),
+}
+
+
+def load_workload(cpu, workload):
+    """Load a workload's program and data into a fresh Microprocessor8085."""
+    for address, data in workload.data.items():
+        cpu.memory[address:address + len(data)] = data
+        cpu.mark_dirty(address, len(data))
+    cpu.load_program(workload.program, 0)
+
+
+def check_workload(cpu, workload):
+    """Return a list of differences between a finished run and `expect`."""
+    problems = []
+    registers = cpu.registers.to_dict()
+    for name, value in workload.expect.get('registers', {}).items():
+        if registers[name] != value:
+            problems.append(f'{name} = {registers[name]:#x}, expected {value:#x}')
+    for address, data in workload.expect.get('memory', {}).items():
+        actual = cpu.read_memory(address, len(data))
+        if actual != data:
+            problems.append(f'memory at {address:04X}H = {actual.hex()}, expected {data.hex()}')
+    return problems
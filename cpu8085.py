@@ -0,0 +1,2747 @@
+"""Intel 8085 CPU core: registers, decoder, executor and assembler.
+
+Nothing here depends on Flask, so the command-line runner (run8085.py)
+and benchmark scripts can import the CPU without the web stack.
+"""
+from array import array
+from collections import OrderedDict, deque, namedtuple
+import hashlib
+import heapq
+import operator
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+# Default execution budget for run(). A run that exhausts it comes back
+# as 'paused' and can be resumed by calling run() again.
+MAX_RUN_INSTRUCTIONS = int(os.environ.get('FG8085_MAX_RUN_INSTRUCTIONS', 1_000_000))
+MAX_RUN_SECONDS = float(os.environ.get('FG8085_MAX_RUN_SECONDS', 2.0))
+# Number of instructions executed between wall-clock deadline checks
+DEADLINE_CHECK_INTERVAL = 4096
+# Clock rate used to turn T-states into simulated time (8085 at 3 MHz)
+CLOCK_HZ = int(os.environ.get('FG8085_CLOCK_HZ', 3_000_000))
+# Journaled instructions step_back() can undo; each journal entry is at
+# most UNDO_RECORD plus two UNDO_WRITE records (27 bytes) of payload
+UNDO_DEPTH = int(os.environ.get('FG8085_UNDO_DEPTH', 512))
+# Most OUT bytes one ScriptedPort keeps; later ones are only counted
+MAX_PORT_OUTPUT = int(os.environ.get('FG8085_MAX_PORT_OUTPUT', 65536))
+
+# ---------------------------------------------------------------------------
+# CPU state
+#
+# The eight 8-bit registers live in one list in opcode encoding order
+# (B, C, D, E, H, L, F, A). Slot 6 is "M" in instruction encodings, so the
+# packed flag byte F sits there. Flags are stored as the 8085 PSW byte and
+# exposed as booleans through FlagsView.
+# ---------------------------------------------------------------------------
+
+REG_NAMES = "BCDEHLMA"
+
+# Indices into RegisterFile.gpr
+_B, _C, _D, _E, _H, _L, _F, _A = range(8)
+_GPR_INDEX = {'B': _B, 'C': _C, 'D': _D, 'E': _E, 'H': _H, 'L': _L, 'A': _A}
+
+# Flag bits in the PSW byte
+FLAG_S = 0x80
+FLAG_Z = 0x40
+FLAG_AC = 0x10
+FLAG_P = 0x04
+FLAG_CY = 0x01
+FLAG_BITS = {'S': FLAG_S, 'Z': FLAG_Z, 'AC': FLAG_AC, 'P': FLAG_P, 'CY': FLAG_CY}
+FLAG_MASK = FLAG_S | FLAG_Z | FLAG_AC | FLAG_P | FLAG_CY
+
+# Memory is tracked for state deltas in 256-byte pages
+PAGE_SHIFT = 8
+PAGE_SIZE = 1 << PAGE_SHIFT
+PAGE_COUNT = 65536 >> PAGE_SHIFT
+
+# Values of Microprocessor8085.run_status, in snapshot encoding order
+RUN_STATUSES = ('idle', 'halted', 'paused', 'error', 'breakpoint')
+
+# A named checkpoint: machine state plus one immutable bytes object per
+# memory page. Unchanged pages are shared with the checkpoint or live
+# state they were captured from, so checkpoints cost only what differs.
+Checkpoint = namedtuple('Checkpoint', 'gpr pc sp run_status cycles pages')
+ZERO_PAGE = bytes(PAGE_SIZE)
+POWER_ON_PAGES = (ZERO_PAGE,) * PAGE_COUNT
+# Longest checkpoint name
+MAX_CHECKPOINT_NAME = 64
+
+# Debugger: memory watch access bits and register watch comparisons
+WATCH_READ = 1
+WATCH_WRITE = 2
+WATCH_ACCESS = {'read': WATCH_READ, 'write': WATCH_WRITE, 'access': WATCH_READ | WATCH_WRITE}
+REGISTER_WATCH_OPS = ('==', '!=', '<', '<=', '>', '>=')
+# Register watches: (register name, comparison, value)
+RegisterWatch = namedtuple('RegisterWatch', 'register op value')
+# Memory watches: first and last address, WATCH_* bits
+MemoryWatch = namedtuple('MemoryWatch', 'start end access')
+_REGISTER_COMPARISONS = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt,
+    '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+# CPU snapshot format: a fixed little-endian header (magic, format version,
+# B C D E H L F A, PC, SP, run status, memory epoch, memory version, cycle
+# counter) followed by zlib-compressed memory, page versions (uint32 each),
+# the named checkpoints, the debugger settings, the scripted I/O ports and
+# the interrupt controller.
+# Checkpoints are stored as page and checkpoint counts (uint16 each), the
+# distinct checkpoint pages, then per checkpoint a CHECKPOINT_HEADER, its
+# name and one uint16 page index per memory page. Debugger settings are
+# DEBUG_COUNTS, the breakpoint addresses (uint16 each), then one
+# MEMORY_WATCH and REGISTER_WATCH each. Ports are a uint16 count, then per
+# port a PORT_HEADER followed by its pending input and captured output.
+# The interrupt controller is an INTERRUPT_STATE and one INTERRUPT_EVENT
+# per scheduled event.
+SNAPSHOT_MAGIC = b'F85S'
+SNAPSHOT_FORMAT = 6
+SNAPSHOT_HEADER = struct.Struct('<4sB8sHHB12sIQ')
+# Headers by format version; format 1 had no cycle counter, formats 1-2 no
+# checkpoints, formats 1-3 no debugger settings, formats 1-4 no ports and
+# formats 1-5 no interrupt controller
+SNAPSHOT_HEADERS = {1: struct.Struct('<4sB8sHHB12sI'), 2: SNAPSHOT_HEADER,
+                    3: SNAPSHOT_HEADER, 4: SNAPSHOT_HEADER, 5: SNAPSHOT_HEADER,
+                    6: SNAPSHOT_HEADER}
+SNAPSHOT_COUNTS = struct.Struct('<HH')
+# Checkpoint name length, B C D E H L F A, PC, SP, run status, cycle counter
+CHECKPOINT_HEADER = struct.Struct('<B8sHHBQ')
+# Breakpoint, memory watch and register watch counts
+DEBUG_COUNTS = struct.Struct('<HHH')
+# First and last watched address, WATCH_READ | WATCH_WRITE bits
+MEMORY_WATCH = struct.Struct('<HHB')
+# Register name, index into REGISTER_WATCH_OPS, value
+REGISTER_WATCH = struct.Struct('<2sBH')
+PORT_COUNT = struct.Struct('<H')
+# Port number, default input byte, pending input length, output length,
+# dropped output count
+PORT_HEADER = struct.Struct('<BBIII')
+# Flags (bit 0 enabled, 1 enable pending, 2 SOD, 3 trap_enabled recorded,
+# 4 trap_enabled), masks, pending line bits, INTR vector, event count
+INTERRUPT_STATE = struct.Struct('<BBBBI')
+# Cycle, index into INTERRUPT_LINES, 0 to raise or 1 to lower, period, vector
+INTERRUPT_EVENT = struct.Struct('<QBBQB')
+
+# Binary execution trace record (16 bytes, little-endian): address, opcode,
+# the two bytes after the opcode, B C D E H L F A and SP before the
+# instruction executed, and a reserved zero byte
+TRACE_RECORD = struct.Struct('<HBBB8sHx')
+
+
+class RegisterFile:
+    """Slotted 8085 register file with dict-style access by register name"""
+    __slots__ = ('gpr', 'PC', 'SP')
+
+    NAMES = ('A', 'B', 'C', 'D', 'E', 'H', 'L', 'PC', 'SP')
+
+    def __init__(self):
+        self.gpr = [0x00] * 8
+        self.PC = 0x0000  # Program Counter
+        self.SP = 0xFFFF  # Stack Pointer
+
+    def __getitem__(self, name):
+        index = _GPR_INDEX.get(name)
+        if index is None:
+            if name in ('PC', 'SP'):
+                return getattr(self, name)
+            raise KeyError(name)
+        return self.gpr[index]
+
+    def __setitem__(self, name, value):
+        index = _GPR_INDEX.get(name)
+        if index is None:
+            if name not in ('PC', 'SP'):
+                raise KeyError(name)
+            setattr(self, name, value & 0xFFFF)
+        else:
+            self.gpr[index] = value & 0xFF
+
+    def __contains__(self, name):
+        return name in self.NAMES
+
+    def to_dict(self):
+        gpr = self.gpr
+        return {
+            'A': gpr[_A], 'B': gpr[_B], 'C': gpr[_C], 'D': gpr[_D],
+            'E': gpr[_E], 'H': gpr[_H], 'L': gpr[_L],
+            'PC': self.PC, 'SP': self.SP,
+        }
+
+
+class FlagsView:
+    """Boolean view of the flag bits packed in a RegisterFile's F register"""
+    __slots__ = ('_registers',)
+
+    NAMES = ('S', 'Z', 'AC', 'P', 'CY')
+
+    def __init__(self, registers):
+        self._registers = registers
+
+    def __getitem__(self, name):
+        return (self._registers.gpr[_F] & FLAG_BITS[name]) != 0
+
+    def __setitem__(self, name, value):
+        bit = FLAG_BITS[name]
+        gpr = self._registers.gpr
+        gpr[_F] = (gpr[_F] | bit) if value else (gpr[_F] & ~bit)
+
+    def __contains__(self, name):
+        return name in FLAG_BITS
+
+    @property
+    def psw(self):
+        return self._registers.gpr[_F]
+
+    def to_dict(self):
+        f = self._registers.gpr[_F]
+        return {name: (f & FLAG_BITS[name]) != 0 for name in self.NAMES}
+
+
+# --- Decode table ----------------------------------------------------------
+#
+# One immutable OpcodeInfo per opcode, built once at import and shared by the
+# executor, the disassembler and trace generation. `operand` is '' (none),
+# 'd8' (immediate byte), 'd16' (immediate word) or 'a16' (address); `length`
+# is in bytes; `cycles` is the T-state count, and `cycles_taken` the count
+# when a conditional jump, call or return is taken.
+
+OpcodeInfo = namedtuple('OpcodeInfo', 'mnemonic length operand cycles cycles_taken')
+
+_OPERAND_LENGTHS = {'': 1, 'd8': 2, 'd16': 3, 'a16': 3}
+
+
+def _build_decode_table():
+    """Build the 256-entry opcode -> OpcodeInfo table"""
+    table = [None] * 256
+
+    def define(opcode, mnemonic, cycles, operand='', cycles_taken=None):
+        table[opcode] = OpcodeInfo(mnemonic, _OPERAND_LENGTHS[operand], operand,
+                                   cycles, cycles if cycles_taken is None else cycles_taken)
+
+    for opcode in range(0x40, 0x80):
+        dst, src = REG_NAMES[(opcode >> 3) & 0x07], REG_NAMES[opcode & 0x07]
+        define(opcode, f'MOV {dst},{src}', 7 if 'M' in (dst, src) else 4)
+    define(0x76, 'HLT', 5)
+
+    for index, reg in enumerate(REG_NAMES):
+        memory = reg == 'M'
+        define(0x06 | (index << 3), f'MVI {reg}', 10 if memory else 7, 'd8')
+        define(0x04 | (index << 3), f'INR {reg}', 10 if memory else 4)
+        define(0x05 | (index << 3), f'DCR {reg}', 10 if memory else 4)
+
+    for index, pair in enumerate(('B', 'D', 'H', 'SP')):
+        define(0x01 | (index << 4), f'LXI {pair}', 10, 'd16')
+        define(0x03 | (index << 4), f'INX {pair}', 6)
+        define(0x0B | (index << 4), f'DCX {pair}', 6)
+        define(0x09 | (index << 4), f'DAD {pair}', 10)
+
+    for index, pair in enumerate(('B', 'D', 'H', 'PSW')):
+        define(0xC5 | (index << 4), f'PUSH {pair}', 12)
+        define(0xC1 | (index << 4), f'POP {pair}', 10)
+
+    define(0x02, 'STAX B', 7)
+    define(0x12, 'STAX D', 7)
+    define(0x0A, 'LDAX B', 7)
+    define(0x1A, 'LDAX D', 7)
+
+    immediates = ('ADI', 'ACI', 'SUI', 'SBI', 'ANI', 'XRI', 'ORI', 'CPI')
+    for index, op in enumerate(('ADD', 'ADC', 'SUB', 'SBB', 'ANA', 'XRA', 'ORA', 'CMP')):
+        for reg, name in enumerate(REG_NAMES):
+            define(0x80 | (index << 3) | reg, f'{op} {name}', 7 if name == 'M' else 4)
+        define(0xC6 | (index << 3), immediates[index], 7, 'd8')
+
+    define(0xC3, 'JMP', 10, 'a16')
+    define(0xCD, 'CALL', 18, 'a16')
+    define(0xC9, 'RET', 10)
+    for index, condition in enumerate(('NZ', 'Z', 'NC', 'C', 'PO', 'PE', 'P', 'M')):
+        define(0xC2 | (index << 3), 'J' + condition, 7, 'a16', cycles_taken=10)
+        define(0xC4 | (index << 3), 'C' + condition, 9, 'a16', cycles_taken=18)
+        define(0xC0 | (index << 3), 'R' + condition, 6, cycles_taken=12)
+        define(0xC7 | (index << 3), f'RST {index}', 12)
+
+    for opcode, mnemonic, cycles, operand in (
+        (0x00, 'NOP', 4, ''), (0x07, 'RLC', 4, ''), (0x0F, 'RRC', 4, ''),
+        (0x17, 'RAL', 4, ''), (0x1F, 'RAR', 4, ''), (0x20, 'RIM', 4, ''),
+        (0x22, 'SHLD', 16, 'a16'), (0x27, 'DAA', 4, ''), (0x2A, 'LHLD', 16, 'a16'),
+        (0x2F, 'CMA', 4, ''), (0x30, 'SIM', 4, ''), (0x32, 'STA', 13, 'a16'),
+        (0x37, 'STC', 4, ''), (0x3A, 'LDA', 13, 'a16'), (0x3F, 'CMC', 4, ''),
+        (0xD3, 'OUT', 10, 'd8'), (0xDB, 'IN', 10, 'd8'), (0xE3, 'XTHL', 16, ''),
+        (0xE9, 'PCHL', 6, ''), (0xEB, 'XCHG', 4, ''), (0xF3, 'DI', 4, ''),
+        (0xF9, 'SPHL', 6, ''), (0xFB, 'EI', 4, ''),
+    ):
+        define(opcode, mnemonic, cycles, operand)
+
+    # Undocumented opcodes are not executed (see _op_unknown)
+    for opcode in range(256):
+        if table[opcode] is None:
+            define(opcode, 'UNKNOWN', 4)
+
+    return tuple(table)
+
+
+DECODE_TABLE = _build_decode_table()
+# T-states by opcode (the not-taken count for conditional instructions)
+_CYCLES = bytes(info.cycles for info in DECODE_TABLE)
+
+
+def _taken_cycles(opcode):
+    """Extra T-states a conditional instruction takes when its condition holds"""
+    info = DECODE_TABLE[opcode]
+    return info.cycles_taken - info.cycles
+
+
+# ---------------------------------------------------------------------------
+# Opcode dispatch engine
+#
+# Every opcode maps to a handler ``handler(cpu)`` in a 256-entry table that is
+# built once at import time. Handlers return None for a normal step or a
+# result dict (e.g. HLT) that execute_instruction passes straight back.
+# ---------------------------------------------------------------------------
+
+def _build_flag_tables():
+    """Precompute the flag bytes for every 8-bit and 9-bit ALU result"""
+    szp = bytearray(256)
+    for value in range(256):
+        bits = value & FLAG_S
+        if value == 0:
+            bits |= FLAG_Z
+        if bin(value).count('1') % 2 == 0:
+            bits |= FLAG_P
+        szp[value] = bits
+    # 9-bit results of ADD/SUB (masked with 0x1FF): bit 8 is carry or borrow
+    szpc = bytes(szp[value & 0xFF] | (FLAG_CY if value & 0x100 else 0)
+                 for value in range(512))
+    # INR/DCR: AC is a carry out of bit 3, or no borrow into it
+    inr = bytes(szp[value] | (FLAG_AC if value & 0x0F == 0x00 else 0)
+                for value in range(256))
+    dcr = bytes(szp[value] | (FLAG_AC if value & 0x0F != 0x0F else 0)
+                for value in range(256))
+    return bytes(szp), szpc, inr, dcr
+
+
+# S, Z and P bits by 8-bit result; the same plus CY by 9-bit result; and the
+# S, Z, P and AC bits produced by INR and DCR, by result
+_SZP, _SZPC, _INR_FLAGS, _DCR_FLAGS = _build_flag_tables()
+
+
+def _store(cpu, addr, value):
+    """Write a byte to memory and stamp its page with the current memory version"""
+    cpu.memory[addr] = value
+    page = addr >> PAGE_SHIFT
+    cpu.page_versions[page] = cpu.mem_version
+    if cpu.code_pages[page]:
+        cpu.invalidate_code(addr, addr + 1)
+
+
+def _push(cpu, value):
+    r = cpu.registers
+    sp = (r.SP - 1) & 0xFFFF
+    _store(cpu, sp, (value >> 8) & 0xFF)
+    sp = (sp - 1) & 0xFFFF
+    _store(cpu, sp, value & 0xFF)
+    r.SP = sp
+
+
+def _pop(cpu):
+    r = cpu.registers
+    mem = cpu.memory
+    sp = r.SP
+    value = mem[sp] | (mem[(sp + 1) & 0xFFFF] << 8)
+    r.SP = (sp + 2) & 0xFFFF
+    return value
+
+
+def _read_addr(cpu):
+    """Read the little-endian 16-bit operand following the opcode"""
+    pc = cpu.registers.PC
+    mem = cpu.memory
+    return mem[(pc + 1) & 0xFFFF] | (mem[(pc + 2) & 0xFFFF] << 8)
+
+
+def _read_imm(cpu):
+    return cpu.memory[(cpu.registers.PC + 1) & 0xFFFF]
+
+
+# --- Handler factories for opcode families ---------------------------------
+
+def _make_mov(dst, src):
+    if src == _F:  # MOV r,M
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            g[dst] = cpu.memory[(g[_H] << 8) | g[_L]]
+            r.PC = (r.PC + 1) & 0xFFFF
+    elif dst == _F:  # MOV M,r
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            _store(cpu, (g[_H] << 8) | g[_L], g[src])
+            r.PC = (r.PC + 1) & 0xFFFF
+    else:
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            g[dst] = g[src]
+            r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+def _make_mvi(reg):
+    if reg == _F:  # MVI M
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            _store(cpu, (g[_H] << 8) | g[_L], _read_imm(cpu))
+            r.PC = (r.PC + 2) & 0xFFFF
+    else:
+        def handler(cpu):
+            r = cpu.registers
+            r.gpr[reg] = _read_imm(cpu)
+            r.PC = (r.PC + 2) & 0xFFFF
+    return handler
+
+
+def _make_lxi(pair):
+    if pair is None:  # LXI SP
+        def handler(cpu):
+            r = cpu.registers
+            r.SP = _read_addr(cpu)
+            r.PC = (r.PC + 3) & 0xFFFF
+    else:
+        high, low = pair
+
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            value = _read_addr(cpu)
+            g[high] = value >> 8
+            g[low] = value & 0xFF
+            r.PC = (r.PC + 3) & 0xFFFF
+    return handler
+
+
+def _make_inx_dcx(pair, delta):
+    if pair is None:  # INX/DCX SP
+        def handler(cpu):
+            r = cpu.registers
+            r.SP = (r.SP + delta) & 0xFFFF
+            r.PC = (r.PC + 1) & 0xFFFF
+    else:
+        high, low = pair
+
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            value = (((g[high] << 8) | g[low]) + delta) & 0xFFFF
+            g[high] = value >> 8
+            g[low] = value & 0xFF
+            r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+def _make_dad(pair):
+    high, low = pair if pair is not None else (None, None)
+
+    def handler(cpu):
+        r = cpu.registers
+        g = r.gpr
+        if high is None:
+            operand = r.SP
+        else:
+            operand = (g[high] << 8) | g[low]
+        result = ((g[_H] << 8) | g[_L]) + operand
+        g[_H] = (result >> 8) & 0xFF
+        g[_L] = result & 0xFF
+        g[_F] = (g[_F] | FLAG_CY) if result > 0xFFFF else (g[_F] & ~FLAG_CY)
+        r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+def _make_inr_dcr(reg, delta):
+    # INR and DCR leave CY alone
+    table = _INR_FLAGS if delta > 0 else _DCR_FLAGS
+    if reg == _F:  # INR/DCR M
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            addr = (g[_H] << 8) | g[_L]
+            result = (cpu.memory[addr] + delta) & 0xFF
+            _store(cpu, addr, result)
+            g[_F] = (g[_F] & FLAG_CY) | table[result]
+            r.PC = (r.PC + 1) & 0xFFFF
+    else:
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            result = (g[reg] + delta) & 0xFF
+            g[reg] = result
+            g[_F] = (g[_F] & FLAG_CY) | table[result]
+            r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+def _make_stax_ldax(pair, store):
+    high, low = pair
+
+    def handler(cpu):
+        r = cpu.registers
+        g = r.gpr
+        addr = (g[high] << 8) | g[low]
+        if store:
+            _store(cpu, addr, g[_A])
+        else:
+            g[_A] = cpu.memory[addr]
+        r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+# --- ALU -------------------------------------------------------------------
+#
+# Every 8-bit arithmetic and logical operation is fn(a, value, f) ->
+# (result, flags) where `f` is the current flag byte and `flags` the new one.
+# S/Z/P (and CY) come from the lookup tables; AC is bit 4 of a ^ value ^ result,
+# i.e. the carry into bit 4 (inverted for subtraction, where 8085 AC means
+# "no borrow").
+
+def _alu_add(a, value, f):
+    result = a + value
+    return result & 0xFF, _SZPC[result] | ((a ^ value ^ result) & FLAG_AC)
+
+
+def _alu_adc(a, value, f):
+    result = a + value + (f & FLAG_CY)
+    return result & 0xFF, _SZPC[result] | ((a ^ value ^ result) & FLAG_AC)
+
+
+def _alu_sub(a, value, f):
+    result = a - value
+    return result & 0xFF, _SZPC[result & 0x1FF] | (~(a ^ value ^ result) & FLAG_AC)
+
+
+def _alu_sbb(a, value, f):
+    result = a - value - (f & FLAG_CY)
+    return result & 0xFF, _SZPC[result & 0x1FF] | (~(a ^ value ^ result) & FLAG_AC)
+
+
+def _alu_ana(a, value, f):
+    # On the 8085 ANA and ANI always set AC and clear CY
+    result = a & value
+    return result, _SZP[result] | FLAG_AC
+
+
+def _alu_xra(a, value, f):
+    result = a ^ value
+    return result, _SZP[result]
+
+
+def _alu_ora(a, value, f):
+    result = a | value
+    return result, _SZP[result]
+
+
+# Operation by name, and whether the result is stored back into the
+# accumulator (False for CMP/CPI)
+_ALU_OPS = {
+    'ADD': (_alu_add, True),
+    'ADC': (_alu_adc, True),
+    'SUB': (_alu_sub, True),
+    'SBB': (_alu_sbb, True),
+    'ANA': (_alu_ana, True),
+    'XRA': (_alu_xra, True),
+    'ORA': (_alu_ora, True),
+    'CMP': (_alu_sub, False),
+}
+
+
+def _make_alu(op, source):
+    """Build an ALU handler; `source` is a gpr index, _F for M, or None for immediate"""
+    fn, writes = _ALU_OPS[op]
+
+    if source is None:
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            result, g[_F] = fn(g[_A], cpu.memory[(r.PC + 1) & 0xFFFF], g[_F])
+            if writes:
+                g[_A] = result
+            r.PC = (r.PC + 2) & 0xFFFF
+    elif source == _F:
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            result, g[_F] = fn(g[_A], cpu.memory[(g[_H] << 8) | g[_L]], g[_F])
+            if writes:
+                g[_A] = result
+            r.PC = (r.PC + 1) & 0xFFFF
+    else:
+        def handler(cpu):
+            r = cpu.registers
+            g = r.gpr
+            result, g[_F] = fn(g[_A], g[source], g[_F])
+            if writes:
+                g[_A] = result
+            r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+# Condition codes in opcode order (bits 3-5): NZ, Z, NC, C, PO, PE, P, M
+_CONDITIONS = (
+    (FLAG_Z, False), (FLAG_Z, True), (FLAG_CY, False), (FLAG_CY, True),
+    (FLAG_P, False), (FLAG_P, True), (FLAG_S, False), (FLAG_S, True),
+)
+
+
+# Conditional handlers add `taken_cycles` to cpu.cycles when the condition
+# holds; the not-taken count is added for every opcode by the caller.
+
+def _make_jump(condition, taken_cycles=0):
+    if condition is None:
+        def handler(cpu):
+            cpu.registers.PC = _read_addr(cpu)
+        return handler
+
+    bit, expected = condition
+
+    def handler(cpu):
+        r = cpu.registers
+        if ((r.gpr[_F] & bit) != 0) == expected:
+            r.PC = _read_addr(cpu)
+            cpu.cycles += taken_cycles
+        else:
+            r.PC = (r.PC + 3) & 0xFFFF
+    return handler
+
+
+def _make_call(condition, taken_cycles=0):
+    bit, expected = condition if condition else (None, None)
+
+    def handler(cpu):
+        r = cpu.registers
+        if bit is None or ((r.gpr[_F] & bit) != 0) == expected:
+            addr = _read_addr(cpu)
+            _push(cpu, (r.PC + 3) & 0xFFFF)
+            r.PC = addr
+            cpu.cycles += taken_cycles
+        else:
+            r.PC = (r.PC + 3) & 0xFFFF
+    return handler
+
+
+def _make_ret(condition, taken_cycles=0):
+    bit, expected = condition if condition else (None, None)
+
+    def handler(cpu):
+        r = cpu.registers
+        if bit is None or ((r.gpr[_F] & bit) != 0) == expected:
+            r.PC = _pop(cpu)
+            cpu.cycles += taken_cycles
+        else:
+            r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+def _make_rst(vector):
+    def handler(cpu):
+        r = cpu.registers
+        _push(cpu, (r.PC + 1) & 0xFFFF)
+        r.PC = vector
+    return handler
+
+
+def _make_push(pair):
+    # PUSH PSW pushes A and F, which are adjacent in gpr just like B/C etc.
+    high, low = pair
+
+    def handler(cpu):
+        r = cpu.registers
+        g = r.gpr
+        _push(cpu, (g[high] << 8) | g[low])
+        r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+def _make_pop(pair):
+    high, low = pair
+    low_mask = FLAG_MASK if low == _F else 0xFF
+
+    def handler(cpu):
+        r = cpu.registers
+        g = r.gpr
+        value = _pop(cpu)
+        g[high] = (value >> 8) & 0xFF
+        g[low] = value & low_mask
+        r.PC = (r.PC + 1) & 0xFFFF
+    return handler
+
+
+# --- Single-opcode handlers ------------------------------------------------
+
+def _op_nop(cpu):
+    r = cpu.registers
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+# The 8085's undocumented opcodes are not emulated. One counts as executed
+# (4 T-states) but changes nothing and leaves PC on the opcode: step and
+# execute_instruction() return this error, and run() stops with status
+# 'error' at that address.
+def _op_unknown(cpu):
+    pc = cpu.registers.PC
+    return {
+        'success': False,
+        'error': f'Unknown opcode {cpu.memory[pc]:02X}H at {pc:04X}H'
+    }
+
+
+def _op_hlt(cpu):
+    cpu.is_running = False
+    return {'success': True, 'halt': True}
+
+
+# Rotates change only CY, as on the 8085; S, Z, AC and P are kept
+def _op_rlc(cpu):
+    r = cpu.registers
+    g = r.gpr
+    a = g[_A]
+    msb = a >> 7
+    a = ((a << 1) | msb) & 0xFF
+    g[_A] = a
+    g[_F] = (g[_F] & ~FLAG_CY) | msb
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_rrc(cpu):
+    r = cpu.registers
+    g = r.gpr
+    a = g[_A]
+    lsb = a & 0x01
+    a = (a >> 1) | (lsb << 7)
+    g[_A] = a
+    g[_F] = (g[_F] & ~FLAG_CY) | lsb
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_ral(cpu):
+    r = cpu.registers
+    g = r.gpr
+    a = g[_A]
+    msb = a >> 7
+    a = ((a << 1) | (g[_F] & FLAG_CY)) & 0xFF
+    g[_A] = a
+    g[_F] = (g[_F] & ~FLAG_CY) | msb
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_rar(cpu):
+    r = cpu.registers
+    g = r.gpr
+    a = g[_A]
+    lsb = a & 0x01
+    a = (a >> 1) | ((g[_F] & FLAG_CY) << 7)
+    g[_A] = a
+    g[_F] = (g[_F] & ~FLAG_CY) | lsb
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_daa(cpu):
+    r = cpu.registers
+    g = r.gpr
+    a = g[_A]
+    f = g[_F]
+    # Adjust for decimal arithmetic
+    if ((a & 0x0F) > 9) or (f & FLAG_AC):
+        a += 0x06
+        f |= FLAG_AC
+    else:
+        f &= ~FLAG_AC
+    # Compare the full sum: adjusting FAH-FFH carries out of the low byte
+    if a > 0x9F or (f & FLAG_CY):
+        a += 0x60
+        f |= FLAG_CY
+    else:
+        f &= ~FLAG_CY
+    g[_A] = a & 0xFF
+    g[_F] = (f & (FLAG_AC | FLAG_CY)) | _SZP[a & 0xFF]
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_cma(cpu):
+    r = cpu.registers
+    r.gpr[_A] ^= 0xFF
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_stc(cpu):
+    r = cpu.registers
+    r.gpr[_F] |= FLAG_CY
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_cmc(cpu):
+    r = cpu.registers
+    r.gpr[_F] ^= FLAG_CY
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_sta(cpu):
+    r = cpu.registers
+    _store(cpu, _read_addr(cpu), r.gpr[_A])
+    r.PC = (r.PC + 3) & 0xFFFF
+
+
+def _op_lda(cpu):
+    r = cpu.registers
+    r.gpr[_A] = cpu.memory[_read_addr(cpu)]
+    r.PC = (r.PC + 3) & 0xFFFF
+
+
+def _op_shld(cpu):
+    r = cpu.registers
+    g = r.gpr
+    addr = _read_addr(cpu)
+    _store(cpu, addr, g[_L])
+    _store(cpu, (addr + 1) & 0xFFFF, g[_H])
+    r.PC = (r.PC + 3) & 0xFFFF
+
+
+def _op_lhld(cpu):
+    r = cpu.registers
+    g = r.gpr
+    addr = _read_addr(cpu)
+    g[_L] = cpu.memory[addr]
+    g[_H] = cpu.memory[(addr + 1) & 0xFFFF]
+    r.PC = (r.PC + 3) & 0xFFFF
+
+
+def _op_xchg(cpu):
+    r = cpu.registers
+    g = r.gpr
+    g[_H], g[_D] = g[_D], g[_H]
+    g[_L], g[_E] = g[_E], g[_L]
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_xthl(cpu):
+    r = cpu.registers
+    g = r.gpr
+    mem = cpu.memory
+    sp = r.SP
+    sp1 = (sp + 1) & 0xFFFF
+    low, high = mem[sp], mem[sp1]
+    _store(cpu, sp, g[_L])
+    _store(cpu, sp1, g[_H])
+    g[_L], g[_H] = low, high
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_sphl(cpu):
+    r = cpu.registers
+    g = r.gpr
+    r.SP = (g[_H] << 8) | g[_L]
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_pchl(cpu):
+    r = cpu.registers
+    g = r.gpr
+    r.PC = (g[_H] << 8) | g[_L]
+
+
+def _op_in(cpu):
+    # Unmapped ports read as FFH
+    r = cpu.registers
+    port = cpu.memory[(r.PC + 1) & 0xFFFF]
+    device = cpu.ports[port]
+    r.gpr[_A] = 0xFF if device is None else device.read(port) & 0xFF
+    r.PC = (r.PC + 2) & 0xFFFF
+
+
+def _op_out(cpu):
+    # Writes to unmapped ports are ignored
+    r = cpu.registers
+    port = cpu.memory[(r.PC + 1) & 0xFFFF]
+    device = cpu.ports[port]
+    if device is not None:
+        device.write(port, r.gpr[_A])
+    r.PC = (r.PC + 2) & 0xFFFF
+
+
+def _op_ei(cpu):
+    cpu.interrupts.enable()
+    r = cpu.registers
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_di(cpu):
+    cpu.interrupts.disable()
+    r = cpu.registers
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_sim(cpu):
+    r = cpu.registers
+    cpu.interrupts.sim(r.gpr[_A])
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+def _op_rim(cpu):
+    r = cpu.registers
+    r.gpr[_A] = cpu.interrupts.rim()
+    r.PC = (r.PC + 1) & 0xFFFF
+
+
+_PAIRS = ((_B, _C), (_D, _E), (_H, _L), None)
+
+
+def _build_dispatch_table():
+    """Build the 256-entry opcode -> handler table"""
+    table = [_op_unknown] * 256
+
+    for opcode in range(0x40, 0x80):
+        table[opcode] = _make_mov((opcode >> 3) & 0x07, opcode & 0x07)
+    table[0x76] = _op_hlt
+
+    for index in range(8):
+        table[0x06 | (index << 3)] = _make_mvi(index)
+        table[0x04 | (index << 3)] = _make_inr_dcr(index, 1)
+        table[0x05 | (index << 3)] = _make_inr_dcr(index, -1)
+
+    for index, pair in enumerate(_PAIRS):
+        table[0x01 | (index << 4)] = _make_lxi(pair)
+        table[0x03 | (index << 4)] = _make_inx_dcx(pair, 1)
+        table[0x0B | (index << 4)] = _make_inx_dcx(pair, -1)
+        table[0x09 | (index << 4)] = _make_dad(pair)
+
+    for index, pair in enumerate(((_B, _C), (_D, _E), (_H, _L), (_A, _F))):
+        table[0xC5 | (index << 4)] = _make_push(pair)
+        table[0xC1 | (index << 4)] = _make_pop(pair)
+
+    table[0x02] = _make_stax_ldax((_B, _C), True)
+    table[0x12] = _make_stax_ldax((_D, _E), True)
+    table[0x0A] = _make_stax_ldax((_B, _C), False)
+    table[0x1A] = _make_stax_ldax((_D, _E), False)
+
+    for index, op in enumerate(('ADD', 'ADC', 'SUB', 'SBB', 'ANA', 'XRA', 'ORA', 'CMP')):
+        for reg in range(8):
+            table[0x80 | (index << 3) | reg] = _make_alu(op, reg)
+        table[0xC6 | (index << 3)] = _make_alu(op, None)
+
+    table[0xC3] = _make_jump(None)
+    table[0xCD] = _make_call(None)
+    table[0xC9] = _make_ret(None)
+    for index, condition in enumerate(_CONDITIONS):
+        for opcode, factory in ((0xC2, _make_jump), (0xC4, _make_call), (0xC0, _make_ret)):
+            opcode |= index << 3
+            table[opcode] = factory(condition, _taken_cycles(opcode))
+        table[0xC7 | (index << 3)] = _make_rst(index << 3)
+
+    for opcode, handler in (
+        (0x00, _op_nop), (0x07, _op_rlc), (0x0F, _op_rrc), (0x17, _op_ral),
+        (0x1F, _op_rar), (0x20, _op_rim), (0x22, _op_shld), (0x27, _op_daa),
+        (0x2A, _op_lhld), (0x2F, _op_cma), (0x30, _op_sim), (0x32, _op_sta),
+        (0x37, _op_stc), (0x3A, _op_lda), (0x3F, _op_cmc), (0xD3, _op_out),
+        (0xDB, _op_in), (0xE3, _op_xthl), (0xE9, _op_pchl), (0xEB, _op_xchg),
+        (0xF3, _op_di), (0xF9, _op_sphl), (0xFB, _op_ei),
+    ):
+        table[opcode] = handler
+
+    return tuple(table)
+
+
+_DISPATCH = _build_dispatch_table()
+
+
+# --- Memory access tables and undo journal ---------------------------------
+#
+# _WRITE_TARGETS and _READ_TARGETS give, per opcode, a function returning the
+# data addresses the instruction is about to write or read (conditional
+# calls and returns included whether or not they are taken). They let the
+# undo journal and the debugger's memory watches see accesses before they
+# happen, so neither the handlers nor _store pay anything for them.
+#
+# execute_instruction(journal=True) records how to undo each instruction:
+# the registers, PC, SP and cycle count before it ran (UNDO_RECORD) and the
+# old value of every byte it is about to write (UNDO_WRITE each). Only UI
+# single-steps ask for this, so scripted stepping pays nothing for it.
+
+UNDO_RECORD = struct.Struct('<8sHHQ')
+UNDO_WRITE = struct.Struct('<HB')
+
+
+def _at_hl(cpu):
+    gpr = cpu.registers.gpr
+    return ((gpr[_H] << 8) | gpr[_L],)
+
+
+def _at_bc(cpu):
+    gpr = cpu.registers.gpr
+    return ((gpr[_B] << 8) | gpr[_C],)
+
+
+def _at_de(cpu):
+    gpr = cpu.registers.gpr
+    return ((gpr[_D] << 8) | gpr[_E],)
+
+
+def _at_a16(cpu):
+    memory = cpu.memory
+    pc = cpu.registers.PC
+    return ((memory[(pc + 2) & 0xFFFF] << 8) | memory[(pc + 1) & 0xFFFF],)
+
+
+def _word_at_a16(cpu):
+    address = _at_a16(cpu)[0]
+    return (address, (address + 1) & 0xFFFF)
+
+
+def _below_sp(cpu):
+    sp = cpu.registers.SP
+    return ((sp - 1) & 0xFFFF, (sp - 2) & 0xFFFF)
+
+
+def _word_at_sp(cpu):
+    sp = cpu.registers.SP
+    return (sp, (sp + 1) & 0xFFFF)
+
+
+def _build_write_targets():
+    """Map each memory-writing opcode to a function giving the addresses it may write"""
+    table = [None] * 256
+    for opcode in range(0x70, 0x78):
+        table[opcode] = _at_hl  # MOV M,r
+    table[0x76] = None  # HLT
+    for opcode in (0x34, 0x35, 0x36):
+        table[opcode] = _at_hl  # INR M, DCR M, MVI M
+    table[0x02] = _at_bc  # STAX B
+    table[0x12] = _at_de  # STAX D
+    table[0x32] = _at_a16  # STA
+    table[0x22] = _word_at_a16  # SHLD
+    table[0xE3] = _word_at_sp  # XTHL
+    # PUSH, CALL, conditional calls and RST push a return address or pair
+    for opcode in (0xC5, 0xD5, 0xE5, 0xF5, 0xCD):
+        table[opcode] = _below_sp
+    for index in range(8):
+        table[0xC4 | (index << 3)] = _below_sp
+        table[0xC7 | (index << 3)] = _below_sp
+    return tuple(table)
+
+
+_WRITE_TARGETS = _build_write_targets()
+
+
+def _build_read_targets():
+    """Map each memory-reading opcode to a function giving the addresses it may read"""
+    table = [None] * 256
+    for index in range(8):
+        table[0x46 | (index << 3)] = _at_hl  # MOV r,M
+        table[0x86 | (index << 3)] = _at_hl  # ADD M ... CMP M
+        table[0xC0 | (index << 3)] = _word_at_sp  # Rcc
+    table[0x76] = None  # HLT
+    table[0x34] = table[0x35] = _at_hl  # INR M, DCR M
+    table[0x0A] = _at_bc  # LDAX B
+    table[0x1A] = _at_de  # LDAX D
+    table[0x3A] = _at_a16  # LDA
+    table[0x2A] = _word_at_a16  # LHLD
+    for opcode in (0xC1, 0xD1, 0xE1, 0xF1, 0xC9, 0xE3):
+        table[opcode] = _word_at_sp  # POP, RET, XTHL
+    return tuple(table)
+
+
+_READ_TARGETS = _build_read_targets()
+
+
+def _watched_access(cpu, opcode, watch_map):
+    """Return ('read' | 'write', address) if the instruction about to run touches a watched byte"""
+    reads = _READ_TARGETS[opcode]
+    writes = _WRITE_TARGETS[opcode]
+    if reads is None and writes is None:
+        return None
+    if opcode & 0xC7 in (0xC0, 0xC4):
+        # Conditional return or call: only touches the stack when taken
+        bit, expected = _CONDITIONS[(opcode >> 3) & 7]
+        if ((cpu.registers.gpr[_F] & bit) != 0) != expected:
+            return None
+    if writes is not None:
+        for address in writes(cpu):
+            if watch_map[address] & WATCH_WRITE:
+                return 'write', address
+    if reads is not None:
+        for address in reads(cpu):
+            if watch_map[address] & WATCH_READ:
+                return 'read', address
+    return None
+
+
+
+# --- Basic-block translation -----------------------------------------------
+#
+# run() executes straight-line code as cached blocks instead of decoding one
+# opcode at a time. A block is translated from its start address into
+# zero-argument closures pre-bound to the CPU's registers, memory and the
+# instruction's operand bytes; it stops before the first instruction that
+# writes memory or transfers control other than a jump, and that
+# instruction is then executed by the normal dispatch table. Because blocks
+# never write memory, a block cannot modify itself while it runs; writes to
+# translated bytes (see _store and mark_dirty) drop the blocks covering them.
+
+MAX_BLOCK_INSTRUCTIONS = 64
+# The cache is flushed when it holds this many blocks
+MAX_CACHED_BLOCKS = 4096
+
+
+def _translate_generic(handler):
+    # Any handler that neither writes memory nor branches works unchanged
+    # once PC points at its instruction
+    def factory(cpu, pc):
+        registers = cpu.registers
+
+        def op():
+            registers.PC = pc
+            handler(cpu)
+        return op
+    return factory
+
+
+def _translate_mov(dst, src):
+    def factory(cpu, pc):
+        g = cpu.registers.gpr
+        if src == _F:
+            memory = cpu.memory
+
+            def op():
+                g[dst] = memory[(g[_H] << 8) | g[_L]]
+        else:
+            def op():
+                g[dst] = g[src]
+        return op
+    return factory
+
+
+def _translate_mvi(reg):
+    def factory(cpu, pc):
+        g = cpu.registers.gpr
+        value = cpu.memory[(pc + 1) & 0xFFFF]
+
+        def op():
+            g[reg] = value
+        return op
+    return factory
+
+
+def _translate_inr_dcr(reg, delta):
+    table = _INR_FLAGS if delta > 0 else _DCR_FLAGS
+
+    def factory(cpu, pc):
+        g = cpu.registers.gpr
+
+        def op():
+            result = (g[reg] + delta) & 0xFF
+            g[reg] = result
+            g[_F] = (g[_F] & FLAG_CY) | table[result]
+        return op
+    return factory
+
+
+def _translate_inx_dcx(pair, delta):
+    high, low = pair
+
+    def factory(cpu, pc):
+        g = cpu.registers.gpr
+
+        def op():
+            value = (((g[high] << 8) | g[low]) + delta) & 0xFFFF
+            g[high] = value >> 8
+            g[low] = value & 0xFF
+        return op
+    return factory
+
+
+def _translate_alu(op_name, source):
+    fn, writes = _ALU_OPS[op_name]
+
+    def factory(cpu, pc):
+        g = cpu.registers.gpr
+        if source is None:
+            value = cpu.memory[(pc + 1) & 0xFFFF]
+            if writes:
+                def op():
+                    g[_A], g[_F] = fn(g[_A], value, g[_F])
+            else:
+                def op():
+                    g[_F] = fn(g[_A], value, g[_F])[1]
+        elif source == _F:
+            memory = cpu.memory
+            if writes:
+                def op():
+                    g[_A], g[_F] = fn(g[_A], memory[(g[_H] << 8) | g[_L]], g[_F])
+            else:
+                def op():
+                    g[_F] = fn(g[_A], memory[(g[_H] << 8) | g[_L]], g[_F])[1]
+        else:
+            if writes:
+                def op():
+                    g[_A], g[_F] = fn(g[_A], g[source], g[_F])
+            else:
+                def op():
+                    g[_F] = fn(g[_A], g[source], g[_F])[1]
+        return op
+    return factory
+
+
+def _translate_jump(condition, taken_cycles=0):
+    # Jumps end a block; the closure sets PC itself
+    def factory(cpu, pc):
+        registers = cpu.registers
+        memory = cpu.memory
+        target = memory[(pc + 1) & 0xFFFF] | (memory[(pc + 2) & 0xFFFF] << 8)
+        if condition is None:
+            def op():
+                registers.PC = target
+            return op
+
+        g = registers.gpr
+        bit, expected = condition
+        fallthrough = (pc + 3) & 0xFFFF
+
+        def op():
+            if ((g[_F] & bit) != 0) == expected:
+                registers.PC = target
+                cpu.cycles += taken_cycles
+            else:
+                registers.PC = fallthrough
+        return op
+    return factory
+
+
+def _build_translation_table():
+    """Build the opcode -> translator table (None = executed by dispatch)"""
+    table = [None] * 256
+
+    for opcode in range(0x40, 0x80):
+        dst, src = (opcode >> 3) & 0x07, opcode & 0x07
+        if dst != _F:
+            table[opcode] = _translate_mov(dst, src)
+
+    for index in range(8):
+        if index != _F:
+            table[0x06 | (index << 3)] = _translate_mvi(index)
+            table[0x04 | (index << 3)] = _translate_inr_dcr(index, 1)
+            table[0x05 | (index << 3)] = _translate_inr_dcr(index, -1)
+
+    for index, pair in enumerate(_PAIRS):
+        # LXI and DAD
+        for opcode in (0x01 | (index << 4), 0x09 | (index << 4)):
+            table[opcode] = _translate_generic(_DISPATCH[opcode])
+        if pair is None:  # INX/DCX SP
+            for opcode in (0x33, 0x3B):
+                table[opcode] = _translate_generic(_DISPATCH[opcode])
+        else:
+            table[0x03 | (index << 4)] = _translate_inx_dcx(pair, 1)
+            table[0x0B | (index << 4)] = _translate_inx_dcx(pair, -1)
+
+    for index, op in enumerate(('ADD', 'ADC', 'SUB', 'SBB', 'ANA', 'XRA', 'ORA', 'CMP')):
+        for reg in range(8):
+            table[0x80 | (index << 3) | reg] = _translate_alu(op, reg)
+        table[0xC6 | (index << 3)] = _translate_alu(op, None)
+
+    table[0xC3] = _translate_jump(None)
+    for index, condition in enumerate(_CONDITIONS):
+        opcode = 0xC2 | (index << 3)
+        table[opcode] = _translate_jump(condition, _taken_cycles(opcode))
+
+    # NOP, rotates, DAA, CMA, STC, CMC, LDA, LDAX, LHLD, XCHG, SPHL
+    for opcode in (0x00, 0x07, 0x0F, 0x17, 0x1F, 0x27, 0x2F, 0x37, 0x3F,
+                   0x3A, 0x0A, 0x1A, 0x2A, 0xEB, 0xF9):
+        table[opcode] = _translate_generic(_DISPATCH[opcode])
+
+    return tuple(table)
+
+
+_TRANSLATORS = _build_translation_table()
+# Opcodes whose translation sets PC and therefore ends a block
+_BLOCK_EXITS = frozenset([0xC3] + [0xC2 | (index << 3) for index in range(8)])
+
+
+# --- I/O ports -------------------------------------------------------------
+#
+# IN and OUT go through Microprocessor8085.ports, a 256-entry list holding
+# the device attached to each port or None. A device is any object with
+# read(port) -> byte and write(port, value). Unmapped ports cost IN and OUT
+# one None check and behave as before. ScriptedPort is the built-in device
+# and the only kind kept in snapshots; step_back() does not undo device
+# side effects.
+
+class ScriptedPort:
+    """Port device that feeds IN from scripted input and captures OUT
+
+    Reads take the next input byte, or `default` once the input runs out.
+    Writes are appended to `output` until it holds MAX_PORT_OUTPUT bytes;
+    later ones only increase `dropped`.
+    """
+    __slots__ = ('input', 'output', 'default', 'dropped')
+
+    def __init__(self, input=(), default=0xFF):
+        self.input = deque(input)
+        self.output = bytearray()
+        self.default = default
+        self.dropped = 0
+
+    def read(self, port):
+        return self.input.popleft() if self.input else self.default
+
+    def write(self, port, value):
+        if len(self.output) < MAX_PORT_OUTPUT:
+            self.output.append(value)
+        else:
+            self.dropped += 1
+
+
+# --- Interrupts ------------------------------------------------------------
+#
+# InterruptController models the 8085 interrupt inputs: TRAP (non-maskable),
+# the RST 7.5, 6.5 and 5.5 restart lines (maskable through SIM) and INTR
+# (answered with an RST n). Lines are raised directly or by events
+# scheduled for a cycle count, kept in a heap, so the run loops only
+# compare cpu.cycles with `next_event`: the cycle at which the controller
+# must be consulted at the next instruction boundary, 0 when an interrupt
+# can be taken at once, or None when nothing can happen. Interrupt and
+# event state is saved in snapshots but not in checkpoints, and step_back()
+# does not undo it.
+
+# Lines in priority order, and their bits in InterruptController.lines
+INTERRUPT_LINES = ('TRAP', 'RST7.5', 'RST6.5', 'RST5.5', 'INTR')
+INTERRUPT_BITS = {'TRAP': 0x10, 'RST7.5': 0x08, 'RST6.5': 0x04, 'RST5.5': 0x02, 'INTR': 0x01}
+INTERRUPT_VECTORS = {'TRAP': 0x24, 'RST7.5': 0x3C, 'RST6.5': 0x34, 'RST5.5': 0x2C}
+# SIM/RIM mask bit of each maskable restart line
+INTERRUPT_MASKS = {'RST7.5': 0x04, 'RST6.5': 0x02, 'RST5.5': 0x01}
+# T-states taken to push PC and jump to the vector
+INTERRUPT_CYCLES = 12
+# Most events a halted CPU fires while waiting for an interrupt
+MAX_IDLE_EVENTS = 65536
+# A scheduled change to a line: raise it (INTR with RST `vector`) or lower
+# it at `cycle`, then again every `period` T-states if period is nonzero
+InterruptEvent = namedtuple('InterruptEvent', 'cycle line action period vector')
+
+
+class InterruptController:
+    """Interrupt enable, masks, pending lines and the scheduled line events
+
+    TRAP, RST 7.5 and INTR are edge-triggered and stay pending until taken
+    (RST 7.5 also until SIM resets it). RST 6.5 and 5.5 are level-triggered:
+    pending while raised, until lowered or taken.
+    """
+    __slots__ = ('enabled', 'enable_pending', 'masks', 'lines', 'intr_vector', 'trap_enabled',
+                 'sod', 'events', 'event_count', 'next_event')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Power-on state: disabled, all restart lines masked, nothing pending or scheduled"""
+        self.enabled = False
+        # EI takes effect after the instruction that follows it
+        self.enable_pending = False
+        self.masks = 0x07
+        self.lines = 0
+        self.intr_vector = 0
+        # Interrupt enable before the last TRAP, reported by the next RIM
+        self.trap_enabled = None
+        # Serial output latch set by SIM
+        self.sod = 0
+        # Heap of (cycle, order, InterruptEvent); order keeps ties first-in first-out
+        self.events = []
+        self.event_count = 0
+        self.next_event = None
+
+    def active(self):
+        """True unless the controller is in its power-on state"""
+        return bool(self.enabled or self.enable_pending or self.masks != 0x07 or self.lines
+                    or self.events or self.sod)
+
+    @staticmethod
+    def check_event(event):
+        """Return `event` as an InterruptEvent, raising ValueError if it is invalid"""
+        event = InterruptEvent(*event)
+        if event.line not in INTERRUPT_BITS or event.action not in ('raise', 'lower'):
+            raise ValueError(f'Invalid interrupt event: {event.line} {event.action}')
+        if not 0 <= event.cycle < 1 << 64 or not 0 <= event.period < 1 << 64 or not 0 <= event.vector <= 7:
+            raise ValueError('Interrupt event cycle, period and vector must be in range')
+        return event
+
+    def schedule(self, event):
+        """Add an InterruptEvent to the schedule"""
+        event = self.check_event(event)
+        heapq.heappush(self.events, (event.cycle, self.event_count, event))
+        self.event_count += 1
+        self._refresh()
+
+    def clear(self):
+        """Drop every scheduled event and pending line, keeping the enable state and masks"""
+        self.events = []
+        self.lines = 0
+        self._refresh()
+
+    def raise_line(self, line, vector=0):
+        """Raise an interrupt line now; `vector` is the RST number answered to INTR"""
+        self.lines |= INTERRUPT_BITS[line]
+        if line == 'INTR':
+            self.intr_vector = vector
+        self._refresh()
+
+    def lower_line(self, line):
+        """Lower a level-triggered line (or withdraw a pending edge)"""
+        self.lines &= ~INTERRUPT_BITS[line]
+        self._refresh()
+
+    def enable(self):
+        self.enable_pending = True
+        self.next_event = 0
+
+    def disable(self):
+        self.enabled = False
+        self.enable_pending = False
+        self._refresh()
+
+    def sim(self, value):
+        """Apply a SIM accumulator value: masks (MSE), RST 7.5 reset (R7.5), serial output (SDE)"""
+        if value & 0x08:
+            self.masks = value & 0x07
+        if value & 0x10:
+            self.lines &= ~INTERRUPT_BITS['RST7.5']
+        if value & 0x40:
+            self.sod = value >> 7
+        self._refresh()
+
+    def rim(self):
+        """Return the RIM accumulator value: pending restart lines, interrupt enable and masks"""
+        enabled = self.enabled if self.trap_enabled is None else self.trap_enabled
+        self.trap_enabled = None
+        return (((self.lines >> 1) & 0x07) << 4) | (0x08 if enabled else 0) | self.masks
+
+    def pending(self):
+        """Return the line that would be taken now, or None"""
+        lines = self.lines
+        if lines & 0x10:
+            return 'TRAP'
+        if not self.enabled:
+            return None
+        for line in ('RST7.5', 'RST6.5', 'RST5.5'):
+            if lines & INTERRUPT_BITS[line] and not self.masks & INTERRUPT_MASKS[line]:
+                return line
+        return 'INTR' if lines & 0x01 else None
+
+    def _refresh(self):
+        if self.enable_pending or self.pending() is not None:
+            self.next_event = 0
+        else:
+            self.next_event = self.events[0][0] if self.events else None
+
+    def _fire(self, now):
+        """Apply every event scheduled at or before `now`"""
+        events = self.events
+        while events and events[0][0] <= now:
+            cycle, _, event = heapq.heappop(events)
+            if event.action == 'raise':
+                self.lines |= INTERRUPT_BITS[event.line]
+                if event.line == 'INTR':
+                    self.intr_vector = event.vector
+            else:
+                self.lines &= ~INTERRUPT_BITS[event.line]
+            if event.period:
+                heapq.heappush(events, (cycle + event.period, self.event_count,
+                                        event._replace(cycle=cycle + event.period)))
+                self.event_count += 1
+
+    def service(self, cpu):
+        """Take the highest-priority interrupt at an instruction boundary; returns its line or None
+
+        Called once cpu.cycles reaches next_event. Taking an interrupt
+        pushes PC, jumps to the line's vector and disables interrupts.
+        """
+        self._fire(cpu.cycles)
+        if self.enable_pending:
+            # Not taken until after the instruction following EI
+            self.enabled = True
+            self.enable_pending = False
+            self._refresh()
+            return None
+        line = self.pending()
+        if line is not None:
+            if line == 'TRAP':
+                self.trap_enabled = self.enabled
+            self.enabled = False
+            self.lines &= ~INTERRUPT_BITS[line]
+            registers = cpu.registers
+            _push(cpu, registers.PC)
+            registers.PC = INTERRUPT_VECTORS.get(line, self.intr_vector << 3)
+            cpu.cycles += INTERRUPT_CYCLES
+        self._refresh()
+        return line
+
+    def wait(self, cpu):
+        """Let a halted CPU idle until an interrupt can be taken; False if none ever can
+
+        Skips cpu.cycles ahead to each scheduled event in turn.
+        """
+        if self.enable_pending:
+            self.enabled = True
+            self.enable_pending = False
+        # A raise and a lower in the same cycle can repeat without ever
+        # leaving a line pending, so give up after a bounded number of events
+        for _ in range(MAX_IDLE_EVENTS):
+            if self.pending() is not None:
+                self.next_event = 0
+                return True
+            if not any(self._can_wake(event) for _, _, event in self.events):
+                break
+            cpu.cycles = max(cpu.cycles, self.events[0][0])
+            self._fire(cpu.cycles)
+        self._refresh()
+        return False
+
+    def _can_wake(self, event):
+        # Whether raising this event's line would let a halted CPU resume
+        if event.action != 'raise':
+            return False
+        if event.line == 'TRAP':
+            return True
+        return self.enabled and not self.masks & INTERRUPT_MASKS.get(event.line, 0)
+
+    def to_dict(self):
+        return {
+            'enabled': self.enabled or self.enable_pending,
+            'masks': {line: bool(self.masks & bit) for line, bit in INTERRUPT_MASKS.items()},
+            'pending': [line for line in INTERRUPT_LINES if self.lines & INTERRUPT_BITS[line]],
+            'sod': self.sod,
+            'events': [event._asdict() for _, _, event in sorted(self.events)],
+        }
+
+
+class Microprocessor8085:
+    __slots__ = ('registers', 'flags', 'memory', 'is_running', 'run_status',
+                 'page_versions', 'mem_epoch', 'mem_version',
+                 'blocks', 'page_blocks', 'code_pages', 'cycles',
+                 'checkpoints', 'checkpoint_pages', 'checkpoint_version', 'page_pool',
+                 'undo', 'breakpoints', 'break_map', 'memory_watches', 'watch_map',
+                 'register_watches', 'ports', 'interrupts')
+
+    def __init__(self):
+        self.registers = RegisterFile()
+        self.flags = FlagsView(self.registers)
+        self.memory = bytearray(65536)  # 64KB memory
+        self.is_running = False
+        # Outcome of the last run(): 'idle', 'halted', 'paused' or 'error'
+        self.run_status = 'idle'
+        # Dirty-page tracking: each page holds the memory version it was last
+        # written in (0 = never written). mem_epoch identifies this memory
+        # lineage so clients can tell when their cached copy is unusable.
+        self.page_versions = array('L', [0]) * PAGE_COUNT
+        self.mem_epoch = uuid.uuid4().hex[:12]
+        self.mem_version = 1
+        # Translated blocks by start address as (ops, end, size, cycles,
+        # code_end): `end` is the address of the instruction dispatched after
+        # the ops (None if the last op jumps), `size` the instruction count,
+        # `cycles` their T-states (not-taken counts) and code_end one past
+        # the last byte the block depends on. page_blocks lists the blocks covering each page and
+        # code_pages flags those pages for _store.
+        self.blocks = {}
+        self.page_blocks = {}
+        self.code_pages = bytearray(PAGE_COUNT)
+        # T-states executed since reset
+        self.cycles = 0
+        # Named checkpoints. Memory matched checkpoint_pages as of memory
+        # version checkpoint_version, so only pages stamped later, or that
+        # differ from checkpoint_pages, need copying to capture or restore;
+        # None when that is unknown. page_pool interns checkpoint pages by
+        # content.
+        self.checkpoints = {}
+        self.checkpoint_pages = POWER_ON_PAGES
+        self.checkpoint_version = 0
+        self.page_pool = {ZERO_PAGE: ZERO_PAGE}
+        # Undo journal of the most recent execute_instruction(journal=True)
+        # calls, newest last. Anything else that changes the machine clears it.
+        self.undo = deque(maxlen=UNDO_DEPTH)
+        # Debugger settings (see set_debug()). break_map and watch_map are
+        # per-address lookup tables, None while nothing is set, so run()
+        # only leaves its fast path when there is something to check.
+        self.breakpoints = ()
+        self.break_map = None
+        self.memory_watches = ()
+        self.watch_map = None
+        self.register_watches = ()
+        # Device attached to each I/O port, None where unmapped (see
+        # attach_port()). Reset keeps them attached.
+        self.ports = [None] * 256
+        self.interrupts = InterruptController()
+
+    def reset(self):
+        """Return to the power-on state, keeping checkpoints
+
+        Only the pages that differ from zeroed memory are cleared, and the
+        memory lineage is kept so clients only re-fetch those pages.
+        """
+        self.registers.gpr[:] = bytes(8)
+        self.registers.PC = 0x0000
+        self.registers.SP = 0xFFFF
+        self.is_running = False
+        self.run_status = 'idle'
+        self.cycles = 0
+        self.undo.clear()
+        self.interrupts.reset()
+        self._apply_pages(POWER_ON_PAGES)
+
+    def save_checkpoint(self, name):
+        """Capture the machine state as checkpoint `name`, replacing any of that name"""
+        pages = self._capture_pages()
+        checkpoint = Checkpoint(bytes(self.registers.gpr), self.registers.PC, self.registers.SP,
+                                self.run_status, self.cycles, pages)
+        self.checkpoints[name] = checkpoint
+        return checkpoint
+
+    def restore_checkpoint(self, name):
+        """Return to checkpoint `name`, copying only the pages that differ; KeyError if unknown"""
+        checkpoint = self.checkpoints[name]
+        self.undo.clear()
+        self.registers.gpr[:] = checkpoint.gpr
+        self.registers.PC = checkpoint.pc
+        self.registers.SP = checkpoint.sp
+        self.run_status = checkpoint.run_status
+        self.cycles = checkpoint.cycles
+        return self._apply_pages(checkpoint.pages)
+
+    def delete_checkpoint(self, name):
+        """Drop checkpoint `name`; KeyError if unknown"""
+        del self.checkpoints[name]
+        # Let the pool forget pages no checkpoint uses any more
+        live = {ZERO_PAGE: ZERO_PAGE}
+        for checkpoint in self.checkpoints.values():
+            for page in checkpoint.pages:
+                live[page] = page
+        if self.checkpoint_pages is not None:
+            for page in self.checkpoint_pages:
+                live[page] = page
+        self.page_pool = live
+
+    def _changed_pages(self, pages):
+        """Pages whose memory may differ from `pages`"""
+        known = self.checkpoint_pages
+        if known is None:
+            memory = self.memory
+            return [page for page in range(PAGE_COUNT)
+                    if memory[page << PAGE_SHIFT:(page + 1) << PAGE_SHIFT] != pages[page]]
+        since = self.checkpoint_version
+        return [page for page, stamp in enumerate(self.page_versions)
+                if stamp > since or known[page] is not pages[page]]
+
+    def _mark_checkpoint(self, pages):
+        # Memory now matches `pages`; later writes get a newer stamp
+        self.checkpoint_pages = pages
+        self.checkpoint_version = self.mem_version
+        self.mem_version += 1
+
+    def _capture_pages(self):
+        known = self.checkpoint_pages
+        if known is None:
+            changed = range(PAGE_COUNT)
+            pages = [ZERO_PAGE] * PAGE_COUNT
+        else:
+            since = self.checkpoint_version
+            changed = [page for page, stamp in enumerate(self.page_versions) if stamp > since]
+            pages = list(known)
+        pool = self.page_pool
+        memory = self.memory
+        for page in changed:
+            data = bytes(memory[page << PAGE_SHIFT:(page + 1) << PAGE_SHIFT])
+            pages[page] = pool.setdefault(data, data)
+        pages = tuple(pages)
+        self._mark_checkpoint(pages)
+        return pages
+
+    def _apply_pages(self, pages):
+        changed = self._changed_pages(pages)
+        memory = self.memory
+        for page in changed:
+            start = page << PAGE_SHIFT
+            memory[start:start + PAGE_SIZE] = pages[page]
+            self.mark_dirty(start, PAGE_SIZE)
+        self._mark_checkpoint(pages)
+        return len(changed)
+
+    def set_debug(self, breakpoints=(), memory_watches=(), register_watches=()):
+        """Replace the breakpoints, memory watches and register watches
+
+        Breakpoints are addresses; memory watches are MemoryWatch(start,
+        end, access bits) over start..end inclusive; register watches are
+        RegisterWatch(register, op, value) with op from REGISTER_WATCH_OPS.
+        Raises ValueError for an invalid entry.
+        """
+        breakpoints = tuple(sorted(set(breakpoints)))
+        memory_watches = tuple(MemoryWatch(*watch) for watch in memory_watches)
+        register_watches = tuple(RegisterWatch(*watch) for watch in register_watches)
+        for address in breakpoints:
+            if not 0 <= address <= 0xFFFF:
+                raise ValueError(f'Breakpoint address out of range: {address}')
+        for watch in memory_watches:
+            if not 0 <= watch.start <= watch.end <= 0xFFFF:
+                raise ValueError(f'Invalid watched range: {watch.start}-{watch.end}')
+            if not watch.access or watch.access & ~(WATCH_READ | WATCH_WRITE):
+                raise ValueError(f'Invalid watch access bits: {watch.access}')
+        for watch in register_watches:
+            if watch.register not in RegisterFile.NAMES:
+                raise ValueError(f'Unknown register: {watch.register}')
+            if watch.op not in REGISTER_WATCH_OPS:
+                raise ValueError(f'Unknown comparison: {watch.op}')
+            if not 0 <= watch.value <= 0xFFFF:
+                raise ValueError(f'Watched value out of range: {watch.value}')
+
+        break_map = None
+        if breakpoints:
+            break_map = bytearray(65536)
+            for address in breakpoints:
+                break_map[address] = 1
+        watch_map = None
+        if memory_watches:
+            watch_map = bytearray(65536)
+            for watch in memory_watches:
+                for address in range(watch.start, watch.end + 1):
+                    watch_map[address] |= watch.access
+        self.breakpoints = breakpoints
+        self.break_map = break_map
+        self.memory_watches = memory_watches
+        self.watch_map = watch_map
+        self.register_watches = register_watches
+
+    def attach_port(self, port, device):
+        """Attach `device` to I/O port `port`, or unmap the port when device is None"""
+        if not 0 <= port <= 0xFF:
+            raise ValueError(f'Port out of range: {port}')
+        self.ports[port] = device
+
+    def scripted_ports(self):
+        """Return {port: ScriptedPort} for the ports with a ScriptedPort attached"""
+        return {port: device for port, device in enumerate(self.ports)
+                if isinstance(device, ScriptedPort)}
+
+    def port_state(self):
+        """Describe the scripted ports: pending input count and captured output"""
+        return [{'port': port, 'pending_input': len(device.input),
+                 'output': list(device.output), 'dropped': device.dropped}
+                for port, device in self.scripted_ports().items()]
+
+    def mark_dirty(self, start, length):
+        """Stamp the pages covering memory[start:start + length] as written"""
+        if length <= 0:
+            return
+        self.undo.clear()
+        version = self.mem_version
+        last = min(start + length - 1, 0xFFFF) >> PAGE_SHIFT
+        for page in range(start >> PAGE_SHIFT, last + 1):
+            self.page_versions[page] = version
+        self.invalidate_code(start, start + length)
+
+    def translate_block(self, start):
+        """Translate and cache the block starting at `start`"""
+        if len(self.blocks) >= MAX_CACHED_BLOCKS:
+            self.blocks.clear()
+            self.page_blocks.clear()
+            self.code_pages[:] = bytes(PAGE_COUNT)
+        memory = self.memory
+        ops = []
+        cycles = 0
+        pc = start
+        end = pc
+        while len(ops) < MAX_BLOCK_INSTRUCTIONS:
+            opcode = memory[pc]
+            translator = _TRANSLATORS[opcode]
+            length = DECODE_TABLE[opcode].length
+            # Blocks stop short of FFFFH so the next opcode never wraps to 0000H
+            if translator is None or pc + length > 0xFFFF:
+                break
+            ops.append(translator(self, pc))
+            cycles += _CYCLES[opcode]
+            pc += length
+            end = pc
+            if opcode in _BLOCK_EXITS:
+                end = None
+                break
+        if end is None:
+            size = len(ops)
+        else:
+            # The dispatched instruction's opcode is part of the block too
+            size = len(ops) + 1
+            cycles += _CYCLES[memory[end]]
+            pc += 1
+        block = (tuple(ops), end, size, cycles, pc)
+
+        self.blocks[start] = block
+        if pc > start:
+            for page in range(start >> PAGE_SHIFT, ((pc - 1) >> PAGE_SHIFT) + 1):
+                self.page_blocks.setdefault(page, []).append(start)
+                self.code_pages[page] = 1
+        return block
+
+    def invalidate_code(self, start, end):
+        """Drop translated blocks that overlap memory[start:end]"""
+        last = min(end - 1, 0xFFFF) >> PAGE_SHIFT
+        for page in range(start >> PAGE_SHIFT, last + 1):
+            if not self.code_pages[page]:
+                continue
+            kept = []
+            for block_start in self.page_blocks[page]:
+                block = self.blocks.get(block_start)
+                if block is None:
+                    continue
+                if block_start < end and start < block[4]:
+                    del self.blocks[block_start]
+                else:
+                    kept.append(block_start)
+            if kept:
+                self.page_blocks[page] = kept
+            else:
+                del self.page_blocks[page]
+                self.code_pages[page] = 0
+
+    def load_program(self, program, start_address=0):
+        """Load a program into memory starting at the specified address"""
+        self.load_segments(((start_address, program),), start_address)
+
+    def load_segments(self, segments, pc=None):
+        """Copy (start, bytes) segments into memory and optionally set PC
+
+        Every segment is checked before any is written, so a bad image
+        leaves memory untouched; raises ImageError.
+        """
+        try:
+            segments = [(start, bytes(data)) for start, data in segments]
+        except (TypeError, ValueError):
+            raise ImageError('Segment data must be byte values 0-255') from None
+        check_segments(segments)
+        if pc is not None and not 0 <= pc <= 0xFFFF:
+            raise ImageError(f'Start address {pc:X}H is outside memory')
+        memory = self.memory
+        for start, data in segments:
+            memory[start:start + len(data)] = data
+            self.mark_dirty(start, len(data))
+        if pc is not None:
+            self.registers.PC = pc
+
+    def get_state(self, since=None):
+        """Return the current state of the microprocessor
+
+        Memory is returned as described in memory_state().
+        """
+        state = {
+            'registers': self.registers.to_dict(),
+            'flags': self.flags.to_dict(),
+            'pc': self.registers.PC,
+            'cycles': self.cycles
+        }
+        ports = self.port_state()
+        if ports:
+            state['ports'] = ports
+        if self.interrupts.active():
+            state['interrupts'] = self.interrupts.to_dict()
+        state.update(self.memory_state(since))
+        return state
+
+    def memory_state(self, since=None):
+        """Return memory as a full snapshot or as the ranges written since `since`
+
+        `since` is the (memory_epoch, memory_version) pair from a previous
+        state. When it is missing or stale, or when most pages changed, the
+        whole memory is sent as 'memory'; otherwise 'memory_delta' lists the
+        written ranges as {'start': address, 'data': [bytes]}.
+        """
+        epoch, version = self.mem_epoch, self.mem_version
+        state = {'memory_epoch': epoch, 'memory_version': version}
+        delta = None
+        if since is not None and since[0] == epoch and 0 < since[1] < version:
+            delta = self.memory_delta(since[1])
+        if delta is None:
+            state['memory'] = list(self.memory)
+        else:
+            state['memory_delta'] = delta
+        # Later writes get a newer stamp than the version the client now holds
+        self.mem_version = version + 1
+        return state
+
+    def read_memory(self, start, length):
+        """Return a copy of memory[start:start + length]"""
+        return bytes(self.memory[start:start + length])
+
+    def memory_delta(self, since_version):
+        """Return the ranges written after `since_version`, or None if a full snapshot is smaller"""
+        pages = [page for page, stamp in enumerate(self.page_versions) if stamp > since_version]
+        if len(pages) > PAGE_COUNT // 2:
+            return None
+
+        ranges = []
+        start = end = None
+        for page in pages:
+            if page != end:
+                if start is not None:
+                    ranges.append((start, end))
+                start = page
+            end = page + 1
+        if start is not None:
+            ranges.append((start, end))
+
+        return [
+            {
+                'start': first << PAGE_SHIFT,
+                'data': list(self.memory[first << PAGE_SHIFT:last << PAGE_SHIFT])
+            }
+            for first, last in ranges
+        ]
+    
+    def goto_address(self, address):
+        """Set the program counter to a specific address"""
+        if 0 <= address <= 0xFFFF:
+            self.registers.PC = address
+            return True
+        return False
+    
+    def write_to_memory(self, address, value):
+        """Write a value to a specific memory address"""
+        if 0 <= address <= 0xFFFF and 0 <= value <= 0xFF:
+            self.undo.clear()
+            _store(self, address, value)
+            return True
+        return False
+    
+    def step(self):
+        """Execute one instruction; returns None, or the result dict for HLT and errors"""
+        opcode = self.memory[self.registers.PC]
+        self.cycles += _CYCLES[opcode]
+        return _DISPATCH[opcode](self)
+
+    def execute_instruction(self, journal=False):
+        """Execute the instruction at the current program counter
+
+        The result includes the T-states the instruction took. With
+        `journal` the instruction is journaled so step_back() can undo it;
+        otherwise the journal is cleared, as for any other change.
+        """
+        registers = self.registers
+        memory = self.memory
+        opcode = memory[registers.PC]
+        if journal:
+            # Journal the instruction before it runs
+            entry = UNDO_RECORD.pack(bytes(registers.gpr), registers.PC, registers.SP, self.cycles)
+            targets = _WRITE_TARGETS[opcode]
+            if targets is not None:
+                for address in targets(self):
+                    entry += UNDO_WRITE.pack(address, memory[address])
+            self.undo.append(entry)
+        elif self.undo:
+            self.undo.clear()
+        start = self.cycles + _CYCLES[opcode]
+        self.cycles = start
+        result = _DISPATCH[opcode](self)
+        interrupts = self.interrupts
+        if interrupts.next_event is not None and (
+                self.cycles >= interrupts.next_event if result is None else result.get('halt')):
+            if journal:
+                # Taking an interrupt pushes PC; journal the stack bytes it overwrites
+                sp = registers.SP
+                self.undo[-1] += (UNDO_WRITE.pack((sp - 1) & 0xFFFF, memory[(sp - 1) & 0xFFFF])
+                                  + UNDO_WRITE.pack((sp - 2) & 0xFFFF, memory[(sp - 2) & 0xFFFF]))
+            if result is None:
+                interrupts.service(self)
+            elif self._wake_from_halt():
+                result = None
+        if result is None:
+            return {'success': True, 'cycles': _CYCLES[opcode] + self.cycles - start}
+        if result.get('success'):
+            result = dict(result, cycles=_CYCLES[opcode] + self.cycles - start)
+        return result
+
+    def step_back(self, count=1):
+        """Undo up to `count` journaled instructions, newest first; returns how many were undone"""
+        registers = self.registers
+        undone = 0
+        while undone < count and self.undo:
+            entry = self.undo.pop()
+            gpr, pc, sp, cycles = UNDO_RECORD.unpack_from(entry)
+            # Restore written bytes in reverse order of writing
+            for offset in range(len(entry) - UNDO_WRITE.size, UNDO_RECORD.size - 1, -UNDO_WRITE.size):
+                address, value = UNDO_WRITE.unpack_from(entry, offset)
+                _store(self, address, value)
+            registers.gpr[:] = gpr
+            registers.PC = pc
+            registers.SP = sp
+            self.cycles = cycles
+            undone += 1
+        return undone
+
+    def run(self, max_instructions=None, time_limit=None, trace=None):
+        """Execute from PC until HLT, an error, or the execution budget runs out
+
+        Returns {'status', 'executed', 'pc'} where status is 'halted',
+        'error' (with an 'error' message) or 'paused' when the instruction
+        budget or the wall-clock time limit ran out first. Calling run()
+        again resumes a paused program.
+
+        If given, trace(address, opcode) is called before each instruction.
+        The outcome also reports the T-states the run took as 'cycles';
+        self.cycles keeps the running total.
+        """
+        if max_instructions is None:
+            max_instructions = MAX_RUN_INSTRUCTIONS
+        if time_limit is None:
+            time_limit = MAX_RUN_SECONDS
+        deadline = time.monotonic() + time_limit if time_limit else None
+
+        dispatch = _DISPATCH
+        memory = self.memory
+        registers = self.registers
+        blocks = self.blocks
+        cycle_table = _CYCLES
+        start_cycles = self.cycles
+        # T-states of the block path; taken branches add theirs to self.cycles
+        cycles = 0
+        executed = 0
+        result = None
+        self.undo.clear()
+        if self.break_map is not None or self.watch_map is not None or self.register_watches:
+            return self._run_debug(max_instructions, deadline, trace)
+        interrupts = self.interrupts
+        next_event = interrupts.next_event
+        self.is_running = True
+        while executed < max_instructions:
+            chunk = min(max_instructions - executed, DEADLINE_CHECK_INTERVAL)
+            if trace is None:
+                # Whole translated blocks while they fit in the budget and
+                # end before the next interrupt event, then single
+                # instructions
+                count = 0
+                while count < chunk:
+                    pc = registers.PC
+                    block = blocks.get(pc)
+                    if block is None:
+                        block = self.translate_block(pc)
+                    ops, end, size, block_cycles, _ = block
+                    if count + size > chunk or (next_event is not None and
+                                                self.cycles + cycles + block_cycles >= next_event):
+                        count += 1
+                        opcode = memory[pc]
+                        cycles += cycle_table[opcode]
+                        result = dispatch[opcode](self)
+                    else:
+                        count += size
+                        cycles += block_cycles
+                        for op in ops:
+                            op()
+                        if end is not None:
+                            registers.PC = end
+                            result = dispatch[memory[end]](self)
+                    if result is not None:
+                        break
+                    next_event = interrupts.next_event
+                    if next_event is not None and self.cycles + cycles >= next_event:
+                        self.cycles += cycles
+                        cycles = 0
+                        interrupts.service(self)
+                        next_event = interrupts.next_event
+            else:
+                for count in range(1, chunk + 1):
+                    pc = registers.PC
+                    opcode = memory[pc]
+                    trace(pc, opcode)
+                    self.cycles += cycle_table[opcode]
+                    result = dispatch[opcode](self)
+                    if result is not None:
+                        break
+                    if interrupts.next_event is not None and self.cycles >= interrupts.next_event:
+                        interrupts.service(self)
+            executed += count
+            if result is not None:
+                self.cycles += cycles
+                cycles = 0
+                if not (result.get('halt') and self._wake_from_halt()):
+                    break
+                result = None
+                next_event = interrupts.next_event
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        self.is_running = False
+        self.cycles += cycles
+        return self._finish_run(result, executed, self.cycles - start_cycles)
+
+    def _wake_from_halt(self):
+        """After HLT, idle until an interrupt is taken; False if none can come"""
+        interrupts = self.interrupts
+        if interrupts.next_event is None or not interrupts.wait(self):
+            return False
+        # Execution resumes after the HLT once the interrupt returns
+        self.registers.PC = (self.registers.PC + 1) & 0xFFFF
+        self.is_running = True
+        interrupts.service(self)
+        return True
+
+    def _run_debug(self, max_instructions, deadline, trace):
+        """run() one instruction at a time, stopping at breakpoints and watchpoints
+
+        A breakpoint stops the run before the instruction at its address
+        executes, unless the run resumes from that breakpoint. Memory
+        watches stop it after an instruction reads or writes a watched
+        byte, and register watches after an instruction makes their
+        condition true.
+        """
+        dispatch = _DISPATCH
+        memory = self.memory
+        registers = self.registers
+        cycle_table = _CYCLES
+        break_map = self.break_map
+        watch_map = self.watch_map
+        register_watches = self.register_watches
+        interrupts = self.interrupts
+        comparisons = [(watch, _REGISTER_COMPARISONS[watch.op]) for watch in register_watches]
+        held = [compare(registers[watch.register], watch.value) for watch, compare in comparisons]
+        # Budget pauses resume where they stopped, breakpoint stops step past it
+        resume_pc = None if self.run_status == 'paused' else registers.PC
+        start_cycles = self.cycles
+        executed = 0
+        result = None
+        hit = None
+        self.is_running = True
+        while executed < max_instructions:
+            pc = registers.PC
+            if break_map is not None and break_map[pc] and pc != resume_pc:
+                hit = {'type': 'breakpoint', 'address': pc}
+                break
+            resume_pc = None
+            opcode = memory[pc]
+            access = None
+            if watch_map is not None:
+                access = _watched_access(self, opcode, watch_map)
+            if trace is not None:
+                trace(pc, opcode)
+            self.cycles += cycle_table[opcode]
+            result = dispatch[opcode](self)
+            executed += 1
+            if result is None:
+                if interrupts.next_event is not None and self.cycles >= interrupts.next_event:
+                    interrupts.service(self)
+            elif result.get('halt') and self._wake_from_halt():
+                result = None
+            if access is not None:
+                hit = {'type': 'watchpoint', 'access': access[0], 'address': access[1],
+                       'instruction': pc}
+            for index, (watch, compare) in enumerate(comparisons):
+                now = compare(registers[watch.register], watch.value)
+                if now and not held[index] and hit is None:
+                    hit = {'type': 'register', 'register': watch.register, 'op': watch.op,
+                           'value': watch.value, 'instruction': pc}
+                held[index] = now
+            if result is not None or hit is not None:
+                break
+            if (deadline is not None and executed % DEADLINE_CHECK_INTERVAL == 0
+                    and time.monotonic() >= deadline):
+                break
+        self.is_running = False
+        return self._finish_run(result, executed, self.cycles - start_cycles, hit)
+
+    def _finish_run(self, result, executed, cycles, hit=None):
+        """Record and describe the outcome of a run given the last handler result"""
+        if result is None:
+            status = 'breakpoint' if hit is not None else 'paused'
+        elif result.get('halt'):
+            status = 'halted'
+        else:
+            status = 'error'
+        self.run_status = status
+        outcome = {'status': status, 'executed': executed, 'cycles': cycles,
+                   'pc': self.registers.PC}
+        if status == 'error':
+            outcome['error'] = result.get('error')
+        elif status == 'breakpoint':
+            outcome['hit'] = hit
+        return outcome
+
+    def run_until_halt(self, since=None, max_instructions=None, time_limit=None):
+        """Execute instructions until HLT (or the execution budget) and return the state"""
+        outcome = self.run(max_instructions, time_limit)
+        state = self.get_state(since)
+        state.update(outcome)
+        return state
+
+    def to_snapshot(self):
+        """Serialize the CPU into the compact snapshot format (see SNAPSHOT_HEADER)"""
+        registers = self.registers
+        page_versions = array('I', self.page_versions)
+        if sys.byteorder != 'little':
+            page_versions.byteswap()
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, bytes(registers.gpr),
+            registers.PC, registers.SP, RUN_STATUSES.index(self.run_status),
+            self.mem_epoch.encode('ascii'), self.mem_version, self.cycles)
+        return header + zlib.compress(
+            bytes(self.memory) + page_versions.tobytes() + self._pack_checkpoints()
+            + self._pack_debug() + self._pack_ports() + self._pack_interrupts(), 1)
+
+    def _pack_checkpoints(self):
+        index = {}
+        entries = []
+        for name, checkpoint in self.checkpoints.items():
+            refs = array('H', [index.setdefault(page, len(index)) for page in checkpoint.pages])
+            if sys.byteorder != 'little':
+                refs.byteswap()
+            encoded = name.encode('utf-8')
+            entries.append(CHECKPOINT_HEADER.pack(
+                len(encoded), checkpoint.gpr, checkpoint.pc, checkpoint.sp,
+                RUN_STATUSES.index(checkpoint.run_status), checkpoint.cycles))
+            entries.append(encoded)
+            entries.append(refs.tobytes())
+        counts = SNAPSHOT_COUNTS.pack(len(index), len(self.checkpoints))
+        return counts + b''.join(index) + b''.join(entries)
+
+    def _unpack_checkpoints(self, data):
+        page_count, checkpoint_count = SNAPSHOT_COUNTS.unpack_from(data)
+        offset = SNAPSHOT_COUNTS.size
+        pool = self.page_pool
+        pages = []
+        for _ in range(page_count):
+            page = bytes(data[offset:offset + PAGE_SIZE])
+            pages.append(pool.setdefault(page, page))
+            offset += PAGE_SIZE
+        for _ in range(checkpoint_count):
+            name_length, gpr, pc, sp, status, cycles = CHECKPOINT_HEADER.unpack_from(data, offset)
+            offset += CHECKPOINT_HEADER.size
+            name = bytes(data[offset:offset + name_length]).decode('utf-8')
+            offset += name_length
+            refs = array('H')
+            refs.frombytes(data[offset:offset + 2 * PAGE_COUNT])
+            if sys.byteorder != 'little':
+                refs.byteswap()
+            offset += 2 * PAGE_COUNT
+            self.checkpoints[name] = Checkpoint(gpr, pc, sp, RUN_STATUSES[status], cycles,
+                                                tuple(pages[ref] for ref in refs))
+        return offset
+
+    def _pack_debug(self):
+        breakpoints = array('H', self.breakpoints)
+        if sys.byteorder != 'little':
+            breakpoints.byteswap()
+        return b''.join([
+            DEBUG_COUNTS.pack(len(self.breakpoints), len(self.memory_watches),
+                              len(self.register_watches)),
+            breakpoints.tobytes(),
+            *(MEMORY_WATCH.pack(*watch) for watch in self.memory_watches),
+            *(REGISTER_WATCH.pack(watch.register.encode('ascii'),
+                                  REGISTER_WATCH_OPS.index(watch.op), watch.value)
+              for watch in self.register_watches),
+        ])
+
+    def _unpack_debug(self, data):
+        break_count, memory_count, register_count = DEBUG_COUNTS.unpack_from(data)
+        offset = DEBUG_COUNTS.size
+        breakpoints = array('H')
+        breakpoints.frombytes(data[offset:offset + 2 * break_count])
+        if sys.byteorder != 'little':
+            breakpoints.byteswap()
+        offset += 2 * break_count
+        memory_watches = []
+        for _ in range(memory_count):
+            memory_watches.append(MEMORY_WATCH.unpack_from(data, offset))
+            offset += MEMORY_WATCH.size
+        register_watches = []
+        for _ in range(register_count):
+            name, op, value = REGISTER_WATCH.unpack_from(data, offset)
+            register_watches.append((name.rstrip(b'\0').decode('ascii'), REGISTER_WATCH_OPS[op], value))
+            offset += REGISTER_WATCH.size
+        self.set_debug(breakpoints, memory_watches, register_watches)
+        return offset
+
+    def _pack_ports(self):
+        ports = self.scripted_ports()
+        entries = [PORT_COUNT.pack(len(ports))]
+        for port, device in ports.items():
+            entries.append(PORT_HEADER.pack(port, device.default, len(device.input),
+                                            len(device.output), device.dropped))
+            entries.append(bytes(device.input))
+            entries.append(bytes(device.output))
+        return b''.join(entries)
+
+    def _unpack_ports(self, data):
+        count, = PORT_COUNT.unpack_from(data)
+        offset = PORT_COUNT.size
+        for _ in range(count):
+            port, default, input_length, output_length, dropped = PORT_HEADER.unpack_from(data, offset)
+            offset += PORT_HEADER.size
+            device = ScriptedPort(data[offset:offset + input_length], default)
+            offset += input_length
+            device.output[:] = data[offset:offset + output_length]
+            offset += output_length
+            if len(device.input) != input_length or len(device.output) != output_length:
+                raise IndexError('port data truncated')
+            device.dropped = dropped
+            self.ports[port] = device
+        return offset
+
+    def _pack_interrupts(self):
+        interrupts = self.interrupts
+        flags = (interrupts.enabled | interrupts.enable_pending << 1 | interrupts.sod << 2
+                 | (interrupts.trap_enabled is not None) << 3 | bool(interrupts.trap_enabled) << 4)
+        entries = [INTERRUPT_STATE.pack(flags, interrupts.masks, interrupts.lines, interrupts.intr_vector,
+                                        len(interrupts.events))]
+        for _, _, event in sorted(interrupts.events):
+            entries.append(INTERRUPT_EVENT.pack(event.cycle, INTERRUPT_LINES.index(event.line),
+                                                event.action == 'lower', event.period, event.vector))
+        return b''.join(entries)
+
+    def _unpack_interrupts(self, data):
+        flags, masks, lines, vector, count = INTERRUPT_STATE.unpack_from(data)
+        offset = INTERRUPT_STATE.size
+        interrupts = self.interrupts
+        interrupts.enabled = bool(flags & 0x01)
+        interrupts.enable_pending = bool(flags & 0x02)
+        interrupts.sod = (flags >> 2) & 1
+        interrupts.trap_enabled = bool(flags & 0x10) if flags & 0x08 else None
+        interrupts.masks = masks & 0x07
+        interrupts.lines = lines & 0x1F
+        interrupts.intr_vector = vector & 0x07
+        for _ in range(count):
+            cycle, line, lower, period, vector = INTERRUPT_EVENT.unpack_from(data, offset)
+            offset += INTERRUPT_EVENT.size
+            interrupts.schedule((cycle, INTERRUPT_LINES[line], 'lower' if lower else 'raise',
+                                 period, vector))
+        interrupts._refresh()
+        return offset
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Rebuild a CPU from bytes produced by to_snapshot()"""
+        header = SNAPSHOT_HEADERS.get(data[4]) if data[:4] == SNAPSHOT_MAGIC else None
+        if header is None:
+            raise ValueError('Unsupported CPU snapshot')
+        (magic, fmt, gpr, pc, sp, status, epoch,
+         mem_version, *cycles) = header.unpack_from(data)
+        body = zlib.decompress(data[header.size:])
+        state_size = 65536 + 4 * PAGE_COUNT
+        if len(body) < state_size or (fmt < 3 and len(body) != state_size):
+            raise ValueError('Truncated CPU snapshot')
+        page_versions = array('I')
+        page_versions.frombytes(body[65536:state_size])
+        if sys.byteorder != 'little':
+            page_versions.byteswap()
+
+        cpu = cls()
+        cpu.registers.gpr[:] = gpr
+        cpu.registers.PC = pc
+        cpu.registers.SP = sp
+        cpu.run_status = RUN_STATUSES[status]
+        cpu.memory[:] = body[:65536]
+        cpu.page_versions = array('L', page_versions)
+        cpu.mem_epoch = epoch.decode('ascii')
+        cpu.mem_version = mem_version
+        cpu.cycles = cycles[0] if cycles else 0
+        # The memory came from elsewhere, so its pages must be compared
+        cpu.checkpoint_pages = None
+        if fmt >= 3:
+            try:
+                offset = state_size + cpu._unpack_checkpoints(memoryview(body)[state_size:])
+                if fmt >= 4:
+                    offset += cpu._unpack_debug(memoryview(body)[offset:])
+                if fmt >= 5:
+                    offset += cpu._unpack_ports(memoryview(body)[offset:])
+                if fmt >= 6:
+                    cpu._unpack_interrupts(memoryview(body)[offset:])
+            except (struct.error, IndexError, UnicodeDecodeError) as e:
+                raise ValueError(f'Corrupt CPU snapshot: {e}')
+        return cpu
+
+    def restore_snapshot(self, data):
+        """Replace this CPU's state with a snapshot, keeping the object, checkpoints and debugger settings
+
+        Scripted ports and the interrupt controller are taken from the
+        snapshot; other devices stay attached.
+        """
+        other = Microprocessor8085.from_snapshot(data)
+        self.interrupts = other.interrupts
+        for port, device in enumerate(self.ports):
+            if device is None or isinstance(device, ScriptedPort):
+                self.ports[port] = other.ports[port]
+        self.registers.gpr[:] = other.registers.gpr
+        self.registers.PC = other.registers.PC
+        self.registers.SP = other.registers.SP
+        self.memory[:] = other.memory
+        self.page_versions = other.page_versions
+        self.mem_epoch = other.mem_epoch
+        self.mem_version = other.mem_version
+        self.run_status = other.run_status
+        self.cycles = other.cycles
+        self.checkpoint_pages = None
+        self.undo.clear()
+        self.blocks.clear()
+        self.page_blocks.clear()
+        self.code_pages[:] = bytes(PAGE_COUNT)
+
+# ---------------------------------------------------------------------------
+# Assembler
+#
+# Two-pass 8085 assembler over the decode table: the first pass assigns
+# addresses (instruction lengths come from DECODE_TABLE), the second emits
+# bytes once every label is known. Statements are "[label:] mnemonic
+# operands [; comment]"; directives are ORG, DB, DW, DS, EQU and END.
+# Numbers may be decimal, 0x.., ..H, ..B (binary) or ..O/..Q (octal);
+# operands are sums and differences of numbers, symbols, 'c' and $.
+# ---------------------------------------------------------------------------
+
+class AssemblyError(ValueError):
+    """Raised for a program that does not assemble; `errors` lists (line, message)"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(f'line {line}: {message}' for line, message in errors))
+        self.errors = errors
+
+
+# A finished assembly: `segments` are (start, bytes) runs in source order,
+# `lines` (line, address, size) for every line that emits bytes, `symbols`
+# the labels and EQU values, and `start` the first emitted address
+Assembly = namedtuple('Assembly', 'segments lines symbols start')
+
+# Opcodes by their mnemonic in DECODE_TABLE, e.g. 'MOV A,M', 'MVI B', 'JMP'
+_ASSEMBLY_OPCODES = {info.mnemonic: opcode for opcode, info in enumerate(DECODE_TABLE)
+                     if info.mnemonic != 'UNKNOWN'}
+_EQU = re.compile(r'EQU\b', re.IGNORECASE)
+_STATEMENT = re.compile(r"^\s*(?:(?P<label>[A-Za-z_?@.][\w?@.]*)\s*:)?\s*"
+                        r"(?:(?P<name>[A-Za-z_?@.][\w?@.]*)\s*(?P<operands>.*?))?\s*$")
+_EXPRESSION_TOKEN = re.compile(r"\s*(?:(?P<number>0[xX][0-9A-Fa-f]+|[0-9][0-9A-Fa-f]*[HhOoQq]?)"
+                               r"|(?P<char>'[^']')|(?P<symbol>[A-Za-z_?@.][\w?@.]*)"
+                               r"|(?P<here>\$)|(?P<op>[-+]))")
+
+
+def _strip_comment(text):
+    """Drop a ';' comment, ignoring semicolons inside quotes"""
+    quoted = False
+    for index, char in enumerate(text):
+        if char == "'":
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            return text[:index]
+    return text
+
+
+def _split_operands(text):
+    """Split an operand list on commas outside quotes"""
+    operands = []
+    current = []
+    quoted = False
+    for char in text:
+        if char == "'":
+            quoted = not quoted
+        if char == ',' and not quoted:
+            operands.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if current or operands:
+        operands.append(''.join(current).strip())
+    return operands
+
+
+def _parse_number(text):
+    upper = text.upper()
+    if upper.startswith('0X'):
+        return int(upper[2:], 16)
+    if upper.endswith('H'):
+        return int(upper[:-1], 16)
+    if upper.endswith(('O', 'Q')):
+        return int(upper[:-1], 8)
+    if upper.endswith('B') and set(upper[:-1]) <= {'0', '1'}:
+        return int(upper[:-1], 2)
+    if upper.endswith('D') and upper[:-1].isdigit():
+        return int(upper[:-1])
+    return int(upper, 10)
+
+
+def _evaluate(text, symbols, here):
+    """Evaluate an operand expression; KeyError names an undefined symbol"""
+    position = 0
+    total = 0
+    sign = 1
+    expect_term = True
+    text = text.strip()
+    if not text:
+        raise ValueError('Missing operand')
+    while position < len(text):
+        match = _EXPRESSION_TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f'Cannot parse operand: {text}')
+        position = match.end()
+        if match.group('op'):
+            if match.group('op') == '-':
+                sign = -sign
+            expect_term = True
+            continue
+        if not expect_term:
+            raise ValueError(f'Missing operator in: {text}')
+        if match.group('number'):
+            try:
+                value = _parse_number(match.group('number'))
+            except ValueError:
+                raise ValueError(f'Invalid number: {match.group("number")}')
+        elif match.group('char'):
+            value = ord(match.group('char')[1])
+        elif match.group('here'):
+            value = here
+        else:
+            value = symbols[match.group('symbol').upper()]
+        total += sign * value
+        sign = 1
+        expect_term = False
+    if expect_term:
+        raise ValueError(f'Incomplete operand: {text}')
+    return total
+
+
+def _check_range(value, width):
+    """Return value as an unsigned `width`-bit number, accepting negatives"""
+    limit = 1 << width
+    if not -(limit >> 1) <= value < limit:
+        raise ValueError(f'Value {value} does not fit in {width} bits')
+    return value & (limit - 1)
+
+
+def _find_opcode(name, operands):
+    """Match a mnemonic and its operands to (opcode, immediate operand text or None)"""
+    registers = [operand.upper() for operand in operands]
+    for split in (len(operands), len(operands) - 1):
+        if split < 0:
+            continue
+        key = f"{name} {','.join(registers[:split])}" if split else name
+        opcode = _ASSEMBLY_OPCODES.get(key)
+        if opcode is None:
+            continue
+        if bool(DECODE_TABLE[opcode].operand) == (split < len(operands)):
+            return opcode, operands[split] if split < len(operands) else None
+    raise ValueError(f"Unknown instruction: {name} {','.join(operands)}".rstrip())
+
+
+def _db_bytes(operands, symbols, here):
+    data = bytearray()
+    for operand in operands:
+        if len(operand) > 3 and operand[0] == operand[-1] == "'":
+            data += operand[1:-1].encode('latin-1')
+        else:
+            data.append(_check_range(_evaluate(operand, symbols, here + len(data)), 8))
+    return bytes(data)
+
+
+def assemble(source):
+    """Assemble 8085 source text into an Assembly; raises AssemblyError"""
+    statements = []
+    symbols = {}
+    errors = []
+    address = 0
+
+    # Pass 1: labels, EQU values and the address of every statement
+    for number, text in enumerate(source.splitlines(), 1):
+        match = _STATEMENT.match(_strip_comment(text))
+        if match is None:
+            errors.append((number, 'Cannot parse line'))
+            continue
+        label, name, operand_text = match.group('label', 'name', 'operands')
+        operands = _split_operands(operand_text or '')
+        name = name.upper() if name else None
+        # "NAME EQU value" may leave out the colon
+        if label is None and name and _EQU.match(operand_text):
+            label, name = name, 'EQU'
+            operands = _split_operands(operand_text[3:])
+        try:
+            if name == 'EQU':
+                if label is None:
+                    raise ValueError('EQU needs a name')
+                symbols[label.upper()] = _evaluate(','.join(operands), symbols, address)
+                continue
+            if label is not None:
+                if label.upper() in symbols:
+                    raise ValueError(f'Duplicate label: {label}')
+                symbols[label.upper()] = address
+            if name is None:
+                continue
+            if name == 'END':
+                break
+            if name == 'ORG':
+                address = _check_range(_evaluate(operand_text, symbols, address), 16)
+                continue
+            if name == 'DS':
+                size = _evaluate(operand_text, symbols, address)
+                if size < 0:
+                    raise ValueError('Negative DS size')
+                statements.append((number, address, name, operands, size))
+                address += size
+                continue
+            if name == 'DB':
+                size = sum(len(operand) - 2 if len(operand) > 3 and operand[0] == operand[-1] == "'"
+                           else 1 for operand in operands)
+            elif name == 'DW':
+                size = 2 * len(operands)
+            else:
+                size = DECODE_TABLE[_find_opcode(name, operands)[0]].length
+            statements.append((number, address, name, operands, size))
+            address += size
+        except KeyError as e:
+            errors.append((number, f'Undefined symbol: {e.args[0]}'))
+        except ValueError as e:
+            errors.append((number, str(e)))
+        if address > 0x10000:
+            errors.append((number, 'Program runs past FFFFH'))
+            break
+
+    # Pass 2: emit bytes now that every label is known
+    segments = []
+    lines = []
+    for number, address, name, operands, size in statements:
+        try:
+            if name == 'DS':
+                data = bytes(size)
+            elif name == 'DB':
+                data = _db_bytes(operands, symbols, address)
+            elif name == 'DW':
+                data = b''.join(
+                    _check_range(_evaluate(operand, symbols, address), 16).to_bytes(2, 'little')
+                    for operand in operands)
+            else:
+                opcode, operand = _find_opcode(name, operands)
+                kind = DECODE_TABLE[opcode].operand
+                data = bytes([opcode])
+                if kind == 'd8':
+                    data += bytes([_check_range(_evaluate(operand, symbols, address), 8)])
+                elif kind:
+                    data += _check_range(_evaluate(operand, symbols, address), 16).to_bytes(2, 'little')
+        except KeyError as e:
+            errors.append((number, f'Undefined symbol: {e.args[0]}'))
+            continue
+        except ValueError as e:
+            errors.append((number, str(e)))
+            continue
+        if not data:
+            continue
+        lines.append((number, address, len(data)))
+        if segments and segments[-1][0] + len(segments[-1][1]) == address:
+            segments[-1][1].extend(data)
+        else:
+            segments.append((address, bytearray(data)))
+
+    if errors:
+        raise AssemblyError(sorted(errors))
+    segments = tuple((start, bytes(data)) for start, data in segments)
+    start = segments[0][0] if segments else 0
+    return Assembly(segments, tuple(lines), symbols, start)
+
+
+class AssemblyCache:
+    """Assemblies (or their assembly errors) by SHA-256 of the source, least recently used first"""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, source):
+        """Return (key, Assembly), assembling on a miss; raises AssemblyError"""
+        key = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        with self._lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if result is None:
+            # Entries are (assembly, errors); errors are kept as the list, not
+            # the exception, so no traceback (and its frames) is cached
+            try:
+                result = (assemble(source), None)
+            except AssemblyError as e:
+                result = (None, e.errors)
+            with self._lock:
+                self.misses += 1
+                self.entries[key] = result
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+        assembly, errors = result
+        if errors is not None:
+            raise AssemblyError(errors)
+        return key, assembly
+
+
+# ---------------------------------------------------------------------------
+# Program images
+#
+# Intel HEX records are ":LLAAAATT<data>CC". Types 00 (data), 01 (end of
+# file), 03 and 05 (start address) are read; 02 and 04 (extended segment
+# and linear address) are accepted only when they keep the image inside
+# the 8085's 64K, so nothing wraps around FFFFH.
+# ---------------------------------------------------------------------------
+
+class ImageError(ValueError):
+    """Raised for a program image that cannot be read or does not fit in memory"""
+
+
+def check_segments(segments):
+    """Raise ImageError unless every (start, data) segment fits in 0000H-FFFFH"""
+    for start, data in segments:
+        if not 0 <= start <= 0xFFFF or start + len(data) > 0x10000:
+            raise ImageError(f'{len(data)} bytes at {start:04X}H do not fit below FFFFH')
+
+
+def parse_intel_hex(text):
+    """Parse Intel HEX text into ((start, bytes), ...) segments and a start address
+
+    Contiguous data records are merged into one segment. The start address
+    comes from a type 03 or 05 record, else the first segment; it is None
+    for an image with no data and no start record.
+    """
+    segments = []
+    start = None
+    base = 0
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != ':':
+            raise ImageError(f'line {number}: records must start with ":"')
+        try:
+            record = bytes.fromhex(line[1:])
+        except ValueError:
+            raise ImageError(f'line {number}: not hex')
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise ImageError(f'line {number}: record length does not match its byte count')
+        if sum(record) & 0xFF:
+            raise ImageError(f'line {number}: bad checksum')
+        kind, data = record[3], record[4:-1]
+        if kind == 0x00:
+            address = base + (record[1] << 8 | record[2])
+            if address + len(data) > 0x10000:
+                raise ImageError(f'line {number}: data runs past FFFFH')
+            if segments and segments[-1][0] + len(segments[-1][1]) == address:
+                segments[-1][1].extend(data)
+            else:
+                segments.append((address, bytearray(data)))
+        elif kind == 0x01:
+            break
+        elif kind in (0x02, 0x04) and len(data) == 2:
+            base = (data[0] << 8 | data[1]) << (4 if kind == 0x02 else 16)
+            if base > 0xFFFF:
+                raise ImageError(f'line {number}: extended address is outside 64K')
+        elif kind in (0x03, 0x05) and len(data) == 4:
+            if kind == 0x03:
+                start = (data[0] << 8 | data[1]) * 16 + (data[2] << 8 | data[3])
+            else:
+                start = int.from_bytes(data, 'big')
+            if start > 0xFFFF:
+                raise ImageError(f'line {number}: start address is outside 64K')
+        else:
+            raise ImageError(f'line {number}: unsupported record type {kind:02X}')
+    segments = tuple((address, bytes(data)) for address, data in segments)
+    if start is None and segments:
+        start = segments[0][0]
+    return segments, start
@@ -0,0 +1,286 @@
+"""Headless 8085 runner: load program images, run them, dump the machine.
+
+Imports only the CPU core (cpu8085.py), never Flask, so it starts fast
+enough to grade many programs from a script. Each image runs on a fresh
+CPU; give several to run them all in one process.
+
+    python run8085.py prog.bin
+    python run8085.py prog.hex --dump 2000:16 --max-instructions 5000000
+    python run8085.py *.asm --set B=10 --poke 2000:01020304 --json
+    python run8085.py echo.asm --port 01:48656C6C6F --port 02
+    python run8085.py timer.asm --irq RST7.5@1000/5000
+
+Images are raw binary, hex text ("3E 05 76", as /api/load takes), Intel
+HEX or assembly source, chosen by --format or else by file extension
+(.ihx and .ihex are Intel HEX, .hex and .txt hex text, .asm and .s
+assembly, anything else binary). A hex text file whose first record
+starts with ":" is read as Intel HEX, which may hold several segments and
+its own start address.
+Addresses and register values are hex; --dump lengths are decimal.
+--port attaches a scripted I/O port: IN reads its input bytes (then FFH)
+and OUT is captured and printed with the report. --irq raises an
+interrupt line (TRAP, RST7.5, RST6.5, RST5.5, or INTR0-INTR7 for INTR
+answered with RST n) at a T-state count, optionally repeating.
+
+The exit status is 0 when every program halted, 1 when one stopped with
+an error or could not be loaded, and otherwise 3 when one ran out of
+budget.
+"""
+import argparse
+import json
+import sys
+import time
+
+from cpu8085 import (CLOCK_HZ, INTERRUPT_LINES, MAX_RUN_INSTRUCTIONS, AssemblyError, ImageError,
+                     InterruptController, InterruptEvent, Microprocessor8085, ScriptedPort, assemble,
+                     check_segments, parse_intel_hex)
+
+FORMATS = ('bin', 'hex', 'ihex', 'asm')
+EXTENSION_FORMATS = {'.ihx': 'ihex', '.ihex': 'ihex', '.hex': 'hex', '.txt': 'hex', '.asm': 'asm', '.s': 'asm'}
+
+
+def parse_hex(text):
+    """Parse a hex number, with or without a 0x prefix or H suffix"""
+    text = text.strip()
+    if text[-1:] in ('h', 'H'):
+        text = text[:-1]
+    return int(text, 16)
+
+
+def parse_assignment(text):
+    """Parse REG=VALUE for --set"""
+    name, sep, value = text.partition('=')
+    name = name.strip().upper()
+    if not sep or name not in ('A', 'B', 'C', 'D', 'E', 'H', 'L', 'PC', 'SP'):
+        raise argparse.ArgumentTypeError(f'expected REG=VALUE with REG one of A-L, PC or SP: {text!r}')
+    try:
+        return name, parse_hex(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'bad value in {text!r}')
+
+
+def parse_poke(text):
+    """Parse ADDR:HEXBYTES for --poke"""
+    address, sep, data = text.partition(':')
+    try:
+        address, data = parse_hex(address), bytes.fromhex(data)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected ADDR:HEXBYTES, e.g. 2000:0A0B: {text!r}')
+    if not 0 <= address <= 0x10000 - len(data):
+        raise argparse.ArgumentTypeError(f'{text!r} does not fit in memory')
+    return address, data
+
+
+def parse_port(text):
+    """Parse PORT[:HEXBYTES] for --port"""
+    port, sep, data = text.partition(':')
+    try:
+        port, data = parse_hex(port), bytes.fromhex(data)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected PORT[:HEXBYTES], e.g. 01:0A0B: {text!r}')
+    if not 0 <= port <= 0xFF:
+        raise argparse.ArgumentTypeError(f'port out of range: {text!r}')
+    return port, data
+
+
+def parse_irq(text):
+    """Parse LINE@CYCLE[/PERIOD] for --irq"""
+    line, _, timing = text.upper().partition('@')
+    cycle, _, period = timing.partition('/')
+    vector = 0
+    if line.startswith('INTR') and line[4:]:
+        line, vector = 'INTR', line[4:]
+    try:
+        return InterruptController.check_event(
+            InterruptEvent(int(cycle), line, 'raise', int(period or 0), int(vector)))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected LINE@CYCLE[/PERIOD] with LINE one of {', '.join(INTERRUPT_LINES)}: {text!r}")
+
+
+def parse_range(text):
+    """Parse START:LENGTH for --dump"""
+    start, sep, length = text.partition(':')
+    try:
+        start, length = parse_hex(start), int(length, 0) if sep else 16
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected START:LENGTH, e.g. 2000:16: {text!r}')
+    if not 0 <= start <= 0xFFFF or length < 0:
+        raise argparse.ArgumentTypeError(f'{text!r} is outside memory')
+    # Ranges are clipped at FFFFH
+    return start, min(length, 0x10000 - start)
+
+
+def image_format(path, requested):
+    """Pick the image format from --format or the file extension"""
+    if requested:
+        return requested
+    dot = path.rfind('.')
+    return EXTENSION_FORMATS.get(path[dot:].lower() if dot > 0 else '', 'bin')
+
+
+def read_image(path, fmt, origin):
+    """Read one image as a list of (start, bytes) segments and the start address"""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError as e:
+        raise ImageError(f'{path}: {e.strerror}')
+    if fmt == 'asm':
+        try:
+            assembly = assemble(raw.decode('utf-8', 'replace'))
+        except AssemblyError as e:
+            raise ImageError(f'{path}: {e}')
+        return list(assembly.segments), assembly.start
+    if fmt in ('hex', 'ihex'):
+        try:
+            text = raw.decode('ascii')
+        except UnicodeDecodeError:
+            raise ImageError(f'{path}: not hex text')
+        if fmt == 'ihex' or text.lstrip().startswith(':'):
+            try:
+                segments, start = parse_intel_hex(text)
+            except ImageError as e:
+                raise ImageError(f'{path}: {e}')
+            return list(segments), start if start is not None else origin
+        try:
+            raw = bytes.fromhex(text)
+        except ValueError:
+            raise ImageError(f'{path}: not hex text')
+    try:
+        check_segments([(origin, raw)])
+    except ImageError as e:
+        raise ImageError(f'{path}: {e}')
+    return [(origin, raw)], origin
+
+
+def load_image(cpu, segments, start):
+    """Write image segments into memory and point PC at `start`"""
+    cpu.load_segments(segments, start)
+
+
+def run_image(path, args):
+    """Run one image on a fresh CPU and return its report"""
+    segments, start = read_image(path, image_format(path, args.format), args.origin)
+    cpu = Microprocessor8085()
+    try:
+        load_image(cpu, segments, args.start if args.start is not None else start)
+    except ImageError as e:
+        raise ImageError(f'{path}: {e}')
+    cpu.load_segments(args.poke)
+    for name, value in args.set:
+        cpu.registers[name] = value
+    for port, data in args.port:
+        cpu.attach_port(port, ScriptedPort(data))
+    for event in args.irq:
+        cpu.interrupts.schedule(event)
+
+    began = time.perf_counter()
+    outcome = cpu.run(max_instructions=args.max_instructions, time_limit=args.time_limit)
+    elapsed = time.perf_counter() - began
+
+    report = {
+        'image': path,
+        'status': outcome['status'],
+        'executed': outcome['executed'],
+        'cycles': outcome['cycles'],
+        'seconds': elapsed,
+        'instructions_per_second': outcome['executed'] / elapsed if elapsed else 0.0,
+        'simulated_seconds': outcome['cycles'] / args.clock_hz,
+        'registers': cpu.registers.to_dict(),
+        'flags': cpu.flags.to_dict(),
+        'memory': [{'start': start, 'data': cpu.read_memory(start, length).hex()}
+                   for start, length in args.dump],
+        'ports': [{'port': port, 'pending_input': len(device.input),
+                   'output': device.output.hex(), 'dropped': device.dropped}
+                  for port, device in cpu.scripted_ports().items()],
+    }
+    if cpu.interrupts.active():
+        report['interrupts'] = cpu.interrupts.to_dict()
+    if 'error' in outcome:
+        report['error'] = outcome['error']
+    return report
+
+
+def format_dump(start, data):
+    """Format memory as 16-byte hex dump lines"""
+    return [f'  {start + offset:04X}: ' + ' '.join(f'{byte:02X}' for byte in data[offset:offset + 16])
+            for offset in range(0, len(data), 16)]
+
+
+def print_report(report):
+    """Print one report for a person to read"""
+    line = f"{report['image']}: {report['status']}"
+    if 'error' in report:
+        line += f" ({report['error']})"
+    print(line)
+    print(f"  {report['executed']:,} instructions, {report['cycles']:,} T-states "
+          f"({report['simulated_seconds'] * 1000:.3f} ms simulated) in {report['seconds'] * 1000:.3f} ms, "
+          f"{report['instructions_per_second']:,.0f} instr/s")
+    registers = report['registers']
+    print('  ' + ' '.join(f'{name}={registers[name]:02X}' for name in 'ABCDEHL')
+          + f" PC={registers['PC']:04X} SP={registers['SP']:04X}")
+    print('  ' + ' '.join(f'{name}={int(value)}' for name, value in report['flags'].items()))
+    for window in report['memory']:
+        for line in format_dump(window['start'], bytes.fromhex(window['data'])):
+            print(line)
+    for port in report['ports']:
+        output = bytes.fromhex(port['output'])
+        print(f"  port {port['port']:02X}: {len(output)} bytes out, {port['pending_input']} unread in"
+              + (f", {port['dropped']} dropped" if port['dropped'] else ''))
+        for line in format_dump(0, output):
+            print(line)
+    interrupts = report.get('interrupts')
+    if interrupts:
+        masked = [line for line, masked in interrupts['masks'].items() if masked]
+        print(f"  interrupts {'enabled' if interrupts['enabled'] else 'disabled'}, "
+              f"masked: {' '.join(masked) or 'none'}, pending: {' '.join(interrupts['pending']) or 'none'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', nargs='+', help='program images to run, each on a fresh CPU')
+    parser.add_argument('--format', choices=FORMATS, help='image format (default: by file extension)')
+    parser.add_argument('--origin', type=parse_hex, default=0,
+                        help='load address for bin and hex text images (default: 0000H)')
+    parser.add_argument('--start', type=parse_hex, help="initial PC (default: the image's start address or first loaded address)")
+    parser.add_argument('--set', type=parse_assignment, action='append', default=[], metavar='REG=VALUE',
+                        help='set a register before running (repeatable)')
+    parser.add_argument('--poke', type=parse_poke, action='append', default=[], metavar='ADDR:HEX',
+                        help='write bytes to memory before running (repeatable)')
+    parser.add_argument('--port', type=parse_port, action='append', default=[], metavar='PORT[:HEX]',
+                        help='attach a scripted I/O port with optional input bytes (repeatable)')
+    parser.add_argument('--irq', type=parse_irq, action='append', default=[], metavar='LINE@CYCLE[/PERIOD]',
+                        help='raise an interrupt line at a T-state count, repeating every PERIOD (repeatable)')
+    parser.add_argument('--dump', type=parse_range, action='append', default=[], metavar='START:LENGTH',
+                        help='memory range to print afterwards (repeatable)')
+    parser.add_argument('--max-instructions', type=int, default=MAX_RUN_INSTRUCTIONS,
+                        help='instruction budget per image (default: %(default)s)')
+    parser.add_argument('--time-limit', type=float, default=0,
+                        help='wall-clock seconds per image, 0 for none (default: %(default)s)')
+    parser.add_argument('--clock-hz', type=int, default=CLOCK_HZ,
+                        help='clock rate for simulated time (default: %(default)s)')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per image')
+    args = parser.parse_args(argv)
+
+    statuses = set()
+    for path in args.images:
+        try:
+            report = run_image(path, args)
+        except ImageError as e:
+            report = {'image': path, 'status': 'error', 'error': str(e)}
+            if not args.json:
+                print(e, file=sys.stderr)
+        else:
+            if not args.json:
+                print_report(report)
+        if args.json:
+            print(json.dumps(report))
+        statuses.add(report['status'])
+    if 'error' in statuses:
+        return 1
+    return 3 if 'paused' in statuses else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,75 @@
+// Client-side copy of the simulator memory. Requests report the version we
+// hold in the X-Memory-Version header and the server replies with only the
+// memory ranges written since then ('memory_delta'), or the full 'memory'.
+let memoryMirror = new Array(65536).fill(0);
+let memoryEpoch = null;
+let memoryVersion = 0;
+
+// Add the X-Memory-Version header to fetch options
+function withMemoryVersion(options = {}) {
+    const headers = Object.assign({}, options.headers);
+    if (memoryEpoch !== null) {
+        headers['X-Memory-Version'] = `${memoryEpoch}:${memoryVersion}`;
+    }
+    return Object.assign({}, options, { headers: headers });
+}
+
+// Copy a window of bytes into the memory mirror
+function mergeMemoryWindow(start, data) {
+    for (let i = 0; i < data.length; i++) {
+        memoryMirror[start + i] = data[i];
+    }
+}
+
+// Merge the memory payload of a state into the mirror and expose the
+// mirror as state.memory, so callers always see all 64KB
+function syncMemory(state) {
+    if (state && typeof state === 'object' && state.window) {
+        // Windowed responses carry fresh bytes for the displayed range only
+        mergeMemoryWindow(state.window.start, state.window.data);
+        state.memory = memoryMirror;
+        return state;
+    }
+    if (!state || typeof state !== 'object' || state.memory_epoch === undefined) {
+        return state;
+    }
+    
+    const isNewer = state.memory_epoch !== memoryEpoch || state.memory_version > memoryVersion;
+    if (isNewer) {
+        if (Array.isArray(state.memory)) {
+            memoryMirror = state.memory;
+        } else if (Array.isArray(state.memory_delta)) {
+            for (const range of state.memory_delta) {
+                mergeMemoryWindow(range.start, range.data);
+            }
+        }
+        memoryEpoch = state.memory_epoch;
+        memoryVersion = state.memory_version;
+    }
+    
+    state.memory = memoryMirror;
+    return state;
+}
+
+// Read `length` bytes starting at `start` from /api/memory and merge them
+// into the mirror. Resolves to { start, data: Uint8Array, pc }.
+async function fetchMemoryWindow(start, length) {
+    const response = await fetch(`/api/memory?start=${start}&length=${length}&encoding=base64`);
+    if (!response.ok) {
+        throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+    
+    const result = await response.json();
+    const raw = atob(result.data);
+    const data = new Uint8Array(raw.length);
+    for (let i = 0; i < raw.length; i++) {
+        data[i] = raw.charCodeAt(i);
+    }
+    mergeMemoryWindow(result.start, data);
+    
+    return { start: result.start, data: data, pc: result.pc };
+}
+
 // Update the UI with the current state
 function updateState(data) {
     // Update registers
@@ -63,6 +135,12 @@ function updateUI(state) {
             }
         }
         
+        // T-states executed since reset
+        const cyclesElement = document.getElementById('cpu-cycles');
+        if (cyclesElement && state.cycles !== undefined) {
+            cyclesElement.textContent = state.cycles.toLocaleString();
+        }
+        
         console.log("Updating flags...");
         // Update flags with null checks
         const flagElements = {
@@ -191,7 +269,7 @@ async function loadProgram() {
         // Get current address from memory address input
         const currentAddress = parseInt(document.getElementById('memory-address').value, 16);
         
-        const response = await fetch('/api/load', {
+        const response = await fetch('/api/load', withMemoryVersion({
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -200,9 +278,14 @@ async function loadProgram() {
                 program: program,
                 start_address: currentAddress 
             }),
-        });
+        }));
+        
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.error || 'Failed to load program');
+        }
         
-        const state = await response.json();
+        const state = syncMemory(await response.json());
         updateUI(state);
     } catch (error) {
         alert('Error loading program: ' + error.message);
@@ -212,11 +295,11 @@ async function loadProgram() {
 // Step through the program
 async function step() {
     try {
-        const response = await fetch('/api/step', {
+        const response = await fetch('/api/step', withMemoryVersion({
             method: 'POST',
-        });
+        }));
         
-        const state = await response.json();
+        const state = syncMemory(await response.json());
         updateUI(state);
         addInstructionToHistory(state);
     } catch (error) {
@@ -227,16 +310,16 @@ async function step() {
 // Reset the simulator
 async function reset() {
     try {
-        const response = await fetch('/api/reset', {
+        const response = await fetch('/api/reset', withMemoryVersion({
             method: 'POST',
-        });
+        }));
         
         if (!response.ok) {
             const errorData = await response.json();
             throw new Error(errorData.error || 'Failed to reset simulator');
         }
         
-        const state = await response.json();
+        const state = syncMemory(await response.json());
         updateUI(state);
         
         // Clear instruction history if the element exists
@@ -374,27 +457,22 @@ async function executeInstruction() {
         const pc = currentAddress;
         console.log(`Executing instruction at address: 0x${pc.toString(16).toUpperCase()}`);
         
-        // Fetch current memory state
-        const memoryResponse = await fetch('/get_memory');
-        const memoryData = await memoryResponse.json();
+        // Fetch the instruction bytes (opcode plus up to two operands)
+        const instructionBytes = await fetchMemoryWindow(pc, 3);
         
         // Get the opcode at this address to know what we're executing
-        const opcode = memoryData.memory[pc];
+        const opcode = instructionBytes.data[0];
         console.log(`Opcode at address ${pc.toString(16).toUpperCase()}: 0x${opcode.toString(16).toUpperCase()}`);
         
         // Make sure the PC is set correctly for instruction execution
         await fetch('/api/goto', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ address: pc })
+            body: JSON.stringify({ address: pc, window: { start: pc, length: 0 } })
         });
         
-        // Get memory state after PC is set (to be safe)
-        const updatedMemoryResponse = await fetch('/get_memory');
-        const updatedMemoryData = await updatedMemoryResponse.json();
-        
         // Decode the instruction at the current address
-        const instructionInfo = getInstructionInfo(opcode, updatedMemoryData.memory, pc);
+        const instructionInfo = getInstructionInfo(opcode, memoryMirror, pc);
         console.log(`Executing instruction: ${instructionInfo.mnemonic} ${instructionInfo.operand} (${instructionInfo.machineCode})`);
         
         // Update instruction history with the instruction that is about to be executed
@@ -406,17 +484,18 @@ async function executeInstruction() {
         );
         
         // Call the execute_instruction endpoint
-        const response = await fetch('/execute_instruction', {
+        const response = await fetch('/execute_instruction', withMemoryVersion({
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ address: pc })
-        });
+        }));
         
         if (!response.ok) {
             throw new Error(`HTTP error: ${response.status}`);
         }
         
         const data = await response.json();
+        syncMemory(data.state);
         
         if (!data.success) {
             throw new Error(data.error || "Error executing instruction");
@@ -452,251 +531,47 @@ async function executeInstruction() {
     }
 }
 
-// Get instruction information based on opcode
+// Undo the last stepped instruction and drop it from the history table
+async function stepBack() {
+    try {
+        const response = await fetch('/api/step_back', withMemoryVersion({
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ count: 1 })
+        }));
+        
+        const data = await response.json();
+        if (!response.ok || !data.success) {
+            throw new Error(data.error || `HTTP error: ${response.status}`);
+        }
+        if (data.undone === 0) {
+            alert('Nothing to step back: only single-stepped instructions can be undone.');
+            return;
+        }
+        
+        const state = syncMemory(data.state);
+        updateUI(state);
+        
+        const tbody = document.querySelector('#instruction-history tbody');
+        if (tbody && tbody.lastChild) {
+            tbody.removeChild(tbody.lastChild);
+        }
+        
+        // Point the editor at the instruction that will run next
+        const pc = state.registers.PC;
+        document.getElementById('memory-address').value = pc.toString(16).toUpperCase().padStart(4, '0');
+        document.getElementById('machine-code').value = state.memory[pc].toString(16).toUpperCase().padStart(2, '0');
+    } catch (error) {
+        console.error("Error stepping back:", error);
+        alert(`Error stepping back: ${error.message}`);
+    }
+}
+
+// Get instruction information based on opcode. INSTRUCTION_SET is the
+// server's decode table ({ mnemonic, length } by opcode), embedded in the page.
 function getInstructionInfo(opcode, memory, pc) {
-    // Complete instruction set
-    const instructionSet = {
-        // Data Transfer Group
-        0x40: { mnemonic: 'MOV B,B', operand: '', length: 1 },
-        0x41: { mnemonic: 'MOV B,C', operand: '', length: 1 },
-        0x42: { mnemonic: 'MOV B,D', operand: '', length: 1 },
-        0x43: { mnemonic: 'MOV B,E', operand: '', length: 1 },
-        0x44: { mnemonic: 'MOV B,H', operand: '', length: 1 },
-        0x45: { mnemonic: 'MOV B,L', operand: '', length: 1 },
-        0x46: { mnemonic: 'MOV B,M', operand: '', length: 1 },
-        0x47: { mnemonic: 'MOV B,A', operand: '', length: 1 },
-        0x48: { mnemonic: 'MOV C,B', operand: '', length: 1 },
-        0x49: { mnemonic: 'MOV C,C', operand: '', length: 1 },
-        0x4A: { mnemonic: 'MOV C,D', operand: '', length: 1 },
-        0x4B: { mnemonic: 'MOV C,E', operand: '', length: 1 },
-        0x4C: { mnemonic: 'MOV C,H', operand: '', length: 1 },
-        0x4D: { mnemonic: 'MOV C,L', operand: '', length: 1 },
-        0x4E: { mnemonic: 'MOV C,M', operand: '', length: 1 },
-        0x4F: { mnemonic: 'MOV C,A', operand: '', length: 1 },
-        0x50: { mnemonic: 'MOV D,B', operand: '', length: 1 },
-        0x51: { mnemonic: 'MOV D,C', operand: '', length: 1 },
-        0x52: { mnemonic: 'MOV D,D', operand: '', length: 1 },
-        0x53: { mnemonic: 'MOV D,E', operand: '', length: 1 },
-        0x54: { mnemonic: 'MOV D,H', operand: '', length: 1 },
-        0x55: { mnemonic: 'MOV D,L', operand: '', length: 1 },
-        0x56: { mnemonic: 'MOV D,M', operand: '', length: 1 },
-        0x57: { mnemonic: 'MOV D,A', operand: '', length: 1 },
-        0x58: { mnemonic: 'MOV E,B', operand: '', length: 1 },
-        0x59: { mnemonic: 'MOV E,C', operand: '', length: 1 },
-        0x5A: { mnemonic: 'MOV E,D', operand: '', length: 1 },
-        0x5B: { mnemonic: 'MOV E,E', operand: '', length: 1 },
-        0x5C: { mnemonic: 'MOV E,H', operand: '', length: 1 },
-        0x5D: { mnemonic: 'MOV E,L', operand: '', length: 1 },
-        0x5E: { mnemonic: 'MOV E,M', operand: '', length: 1 },
-        0x5F: { mnemonic: 'MOV E,A', operand: '', length: 1 },
-        0x60: { mnemonic: 'MOV H,B', operand: '', length: 1 },
-        0x61: { mnemonic: 'MOV H,C', operand: '', length: 1 },
-        0x62: { mnemonic: 'MOV H,D', operand: '', length: 1 },
-        0x63: { mnemonic: 'MOV H,E', operand: '', length: 1 },
-        0x64: { mnemonic: 'MOV H,H', operand: '', length: 1 },
-        0x65: { mnemonic: 'MOV H,L', operand: '', length: 1 },
-        0x66: { mnemonic: 'MOV H,M', operand: '', length: 1 },
-        0x67: { mnemonic: 'MOV H,A', operand: '', length: 1 },
-        0x68: { mnemonic: 'MOV L,B', operand: '', length: 1 },
-        0x69: { mnemonic: 'MOV L,C', operand: '', length: 1 },
-        0x6A: { mnemonic: 'MOV L,D', operand: '', length: 1 },
-        0x6B: { mnemonic: 'MOV L,E', operand: '', length: 1 },
-        0x6C: { mnemonic: 'MOV L,H', operand: '', length: 1 },
-        0x6D: { mnemonic: 'MOV L,L', operand: '', length: 1 },
-        0x6E: { mnemonic: 'MOV L,M', operand: '', length: 1 },
-        0x6F: { mnemonic: 'MOV L,A', operand: '', length: 1 },
-        0x70: { mnemonic: 'MOV M,B', operand: '', length: 1 },
-        0x71: { mnemonic: 'MOV M,C', operand: '', length: 1 },
-        0x72: { mnemonic: 'MOV M,D', operand: '', length: 1 },
-        0x73: { mnemonic: 'MOV M,E', operand: '', length: 1 },
-        0x74: { mnemonic: 'MOV M,H', operand: '', length: 1 },
-        0x75: { mnemonic: 'MOV M,L', operand: '', length: 1 },
-        0x77: { mnemonic: 'MOV M,A', operand: '', length: 1 },
-        0x78: { mnemonic: 'MOV A,B', operand: '', length: 1 },
-        0x79: { mnemonic: 'MOV A,C', operand: '', length: 1 },
-        0x7A: { mnemonic: 'MOV A,D', operand: '', length: 1 },
-        0x7B: { mnemonic: 'MOV A,E', operand: '', length: 1 },
-        0x7C: { mnemonic: 'MOV A,H', operand: '', length: 1 },
-        0x7D: { mnemonic: 'MOV A,L', operand: '', length: 1 },
-        0x7E: { mnemonic: 'MOV A,M', operand: '', length: 1 },
-        0x7F: { mnemonic: 'MOV A,A', operand: '', length: 1 },
-        
-        // Immediate Data Transfer
-        0x06: { mnemonic: 'MVI B', operand: '', length: 2 },
-        0x0E: { mnemonic: 'MVI C', operand: '', length: 2 },
-        0x16: { mnemonic: 'MVI D', operand: '', length: 2 },
-        0x1E: { mnemonic: 'MVI E', operand: '', length: 2 },
-        0x26: { mnemonic: 'MVI H', operand: '', length: 2 },
-        0x2E: { mnemonic: 'MVI L', operand: '', length: 2 },
-        0x36: { mnemonic: 'MVI M', operand: '', length: 2 },
-        0x3E: { mnemonic: 'MVI A', operand: '', length: 2 },
-        
-        // Register Pair Instructions
-        0x01: { mnemonic: 'LXI B', operand: '', length: 3 },
-        0x11: { mnemonic: 'LXI D', operand: '', length: 3 },
-        0x21: { mnemonic: 'LXI H', operand: '', length: 3 },
-        0x31: { mnemonic: 'LXI SP', operand: '', length: 3 },
-        0x03: { mnemonic: 'INX B', operand: '', length: 1 },
-        0x13: { mnemonic: 'INX D', operand: '', length: 1 },
-        0x23: { mnemonic: 'INX H', operand: '', length: 1 },
-        0x33: { mnemonic: 'INX SP', operand: '', length: 1 },
-        0x0B: { mnemonic: 'DCX B', operand: '', length: 1 },
-        0x1B: { mnemonic: 'DCX D', operand: '', length: 1 },
-        0x2B: { mnemonic: 'DCX H', operand: '', length: 1 },
-        0x3B: { mnemonic: 'DCX SP', operand: '', length: 1 },
-        
-        // Direct Addressing Instructions
-        0x32: { mnemonic: 'STA', operand: '', length: 3 },
-        0x3A: { mnemonic: 'LDA', operand: '', length: 3 },
-        0x22: { mnemonic: 'SHLD', operand: '', length: 3 },
-        0x2A: { mnemonic: 'LHLD', operand: '', length: 3 },
-        
-        // Indirect Addressing Instructions
-        0x02: { mnemonic: 'STAX B', operand: '', length: 1 },
-        0x12: { mnemonic: 'STAX D', operand: '', length: 1 },
-        0x0A: { mnemonic: 'LDAX B', operand: '', length: 1 },
-        0x1A: { mnemonic: 'LDAX D', operand: '', length: 1 },
-        
-        // Arithmetic Group
-        0x80: { mnemonic: 'ADD B', operand: '', length: 1 },
-        0x81: { mnemonic: 'ADD C', operand: '', length: 1 },
-        0x82: { mnemonic: 'ADD D', operand: '', length: 1 },
-        0x83: { mnemonic: 'ADD E', operand: '', length: 1 },
-        0x84: { mnemonic: 'ADD H', operand: '', length: 1 },
-        0x85: { mnemonic: 'ADD L', operand: '', length: 1 },
-        0x86: { mnemonic: 'ADD M', operand: '', length: 1 },
-        0x87: { mnemonic: 'ADD A', operand: '', length: 1 },
-        0xC6: { mnemonic: 'ADI', operand: '', length: 2 },
-        
-        0x88: { mnemonic: 'ADC B', operand: '', length: 1 },
-        0x89: { mnemonic: 'ADC C', operand: '', length: 1 },
-        0x8A: { mnemonic: 'ADC D', operand: '', length: 1 },
-        0x8B: { mnemonic: 'ADC E', operand: '', length: 1 },
-        0x8C: { mnemonic: 'ADC H', operand: '', length: 1 },
-        0x8D: { mnemonic: 'ADC L', operand: '', length: 1 },
-        0x8E: { mnemonic: 'ADC M', operand: '', length: 1 },
-        0x8F: { mnemonic: 'ADC A', operand: '', length: 1 },
-        0xCE: { mnemonic: 'ACI', operand: '', length: 2 },
-        
-        0x90: { mnemonic: 'SUB B', operand: '', length: 1 },
-        0x91: { mnemonic: 'SUB C', operand: '', length: 1 },
-        0x92: { mnemonic: 'SUB D', operand: '', length: 1 },
-        0x93: { mnemonic: 'SUB E', operand: '', length: 1 },
-        0x94: { mnemonic: 'SUB H', operand: '', length: 1 },
-        0x95: { mnemonic: 'SUB L', operand: '', length: 1 },
-        0x96: { mnemonic: 'SUB M', operand: '', length: 1 },
-        0x97: { mnemonic: 'SUB A', operand: '', length: 1 },
-        0xD6: { mnemonic: 'SUI', operand: '', length: 2 },
-        
-        // Branch Group
-        0xC3: { mnemonic: 'JMP', operand: '', length: 3 },
-        0xC2: { mnemonic: 'JNZ', operand: '', length: 3 },
-        0xCA: { mnemonic: 'JZ', operand: '', length: 3 },
-        0xD2: { mnemonic: 'JNC', operand: '', length: 3 },
-        0xDA: { mnemonic: 'JC', operand: '', length: 3 },
-        0xE2: { mnemonic: 'JPO', operand: '', length: 3 },
-        0xEA: { mnemonic: 'JPE', operand: '', length: 3 },
-        0xF2: { mnemonic: 'JP', operand: '', length: 3 },
-        0xFA: { mnemonic: 'JM', operand: '', length: 3 },
-        
-        // Call and Return Group
-        0xCD: { mnemonic: 'CALL', operand: '', length: 3 },
-        0xC4: { mnemonic: 'CNZ', operand: '', length: 3 },
-        0xCC: { mnemonic: 'CZ', operand: '', length: 3 },
-        0xD4: { mnemonic: 'CNC', operand: '', length: 3 },
-        0xDC: { mnemonic: 'CC', operand: '', length: 3 },
-        0xE4: { mnemonic: 'CPO', operand: '', length: 3 },
-        0xEC: { mnemonic: 'CPE', operand: '', length: 3 },
-        0xF4: { mnemonic: 'CP', operand: '', length: 3 },
-        0xFC: { mnemonic: 'CM', operand: '', length: 3 },
-        
-        0xC9: { mnemonic: 'RET', operand: '', length: 1 },
-        0xC0: { mnemonic: 'RNZ', operand: '', length: 1 },
-        0xC8: { mnemonic: 'RZ', operand: '', length: 1 },
-        0xD0: { mnemonic: 'RNC', operand: '', length: 1 },
-        0xD8: { mnemonic: 'RC', operand: '', length: 1 },
-        0xE0: { mnemonic: 'RPO', operand: '', length: 1 },
-        0xE8: { mnemonic: 'RPE', operand: '', length: 1 },
-        0xF0: { mnemonic: 'RP', operand: '', length: 1 },
-        0xF8: { mnemonic: 'RM', operand: '', length: 1 },
-        
-        // Stack Operations
-        0xC5: { mnemonic: 'PUSH B', operand: '', length: 1 },
-        0xD5: { mnemonic: 'PUSH D', operand: '', length: 1 },
-        0xE5: { mnemonic: 'PUSH H', operand: '', length: 1 },
-        0xF5: { mnemonic: 'PUSH PSW', operand: '', length: 1 },
-        0xC1: { mnemonic: 'POP B', operand: '', length: 1 },
-        0xD1: { mnemonic: 'POP D', operand: '', length: 1 },
-        0xE1: { mnemonic: 'POP H', operand: '', length: 1 },
-        0xF1: { mnemonic: 'POP PSW', operand: '', length: 1 },
-        
-        // Special Instructions
-        0x00: { mnemonic: 'NOP', operand: '', length: 1 },
-        0x76: { mnemonic: 'HLT', operand: '', length: 1 },
-        0xF3: { mnemonic: 'DI', operand: '', length: 1 },
-        0xFB: { mnemonic: 'EI', operand: '', length: 1 },
-        0x2F: { mnemonic: 'CMA', operand: '', length: 1 },
-        0x3F: { mnemonic: 'CMC', operand: '', length: 1 },
-        0x37: { mnemonic: 'STC', operand: '', length: 1 },
-        
-        // Logical Group
-        0xA0: { mnemonic: 'ANA B', operand: '', length: 1 },
-        0xA1: { mnemonic: 'ANA C', operand: '', length: 1 },
-        0xA2: { mnemonic: 'ANA D', operand: '', length: 1 },
-        0xA3: { mnemonic: 'ANA E', operand: '', length: 1 },
-        0xA4: { mnemonic: 'ANA H', operand: '', length: 1 },
-        0xA5: { mnemonic: 'ANA L', operand: '', length: 1 },
-        0xA6: { mnemonic: 'ANA M', operand: '', length: 1 },
-        0xA7: { mnemonic: 'ANA A', operand: '', length: 1 },
-        0xE6: { mnemonic: 'ANI', operand: '', length: 2 },
-        
-        0xB0: { mnemonic: 'ORA B', operand: '', length: 1 },
-        0xB1: { mnemonic: 'ORA C', operand: '', length: 1 },
-        0xB2: { mnemonic: 'ORA D', operand: '', length: 1 },
-        0xB3: { mnemonic: 'ORA E', operand: '', length: 1 },
-        0xB4: { mnemonic: 'ORA H', operand: '', length: 1 },
-        0xB5: { mnemonic: 'ORA L', operand: '', length: 1 },
-        0xB6: { mnemonic: 'ORA M', operand: '', length: 1 },
-        0xB7: { mnemonic: 'ORA A', operand: '', length: 1 },
-        0xF6: { mnemonic: 'ORI', operand: '', length: 2 },
-        
-        0xA8: { mnemonic: 'XRA B', operand: '', length: 1 },
-        0xA9: { mnemonic: 'XRA C', operand: '', length: 1 },
-        0xAA: { mnemonic: 'XRA D', operand: '', length: 1 },
-        0xAB: { mnemonic: 'XRA E', operand: '', length: 1 },
-        0xAC: { mnemonic: 'XRA H', operand: '', length: 1 },
-        0xAD: { mnemonic: 'XRA L', operand: '', length: 1 },
-        0xAE: { mnemonic: 'XRA M', operand: '', length: 1 },
-        0xAF: { mnemonic: 'XRA A', operand: '', length: 1 },
-        0xEE: { mnemonic: 'XRI', operand: '', length: 2 },
-        
-        0xB8: { mnemonic: 'CMP B', operand: '', length: 1 },
-        0xB9: { mnemonic: 'CMP C', operand: '', length: 1 },
-        0xBA: { mnemonic: 'CMP D', operand: '', length: 1 },
-        0xBB: { mnemonic: 'CMP E', operand: '', length: 1 },
-        0xBC: { mnemonic: 'CMP H', operand: '', length: 1 },
-        0xBD: { mnemonic: 'CMP L', operand: '', length: 1 },
-        0xBE: { mnemonic: 'CMP M', operand: '', length: 1 },
-        0xBF: { mnemonic: 'CMP A', operand: '', length: 1 },
-        0xFE: { mnemonic: 'CPI', operand: '', length: 2 },
-        
-        // Rotate Group
-        0x07: { mnemonic: 'RLC', operand: '', length: 1 },
-        0x0F: { mnemonic: 'RRC', operand: '', length: 1 },
-        0x17: { mnemonic: 'RAL', operand: '', length: 1 },
-        0x1F: { mnemonic: 'RAR', operand: '', length: 1 },
-        
-        // I/O Instructions
-        0xDB: { mnemonic: 'IN', operand: '', length: 2 },
-        0xD3: { mnemonic: 'OUT', operand: '', length: 2 },
-        
-        // Interrupt Instructions
-        0xF0: { mnemonic: 'SIM', operand: '', length: 1 },
-        0x20: { mnemonic: 'RIM', operand: '', length: 1 }
-    };
-    
     // Get the instruction info
-    const info = instructionSet[opcode] || { mnemonic: 'UNKNOWN', operand: '', length: 1 };
+    const info = INSTRUCTION_SET[opcode] || { mnemonic: 'UNKNOWN', length: 1 };
     
     // Build the machine code array for formatting
     let machineCodeArray = [opcode];
@@ -744,7 +619,7 @@ function getInstructionInfo(opcode, memory, pc) {
 }
 
 // Load a sample program
-function loadSampleProgram() {
+async function loadSampleProgram() {
     // A simple program that adds two numbers: 5 + 3 = 8
     // MVI A, 05  - Load 5 into register A
     // MVI B, 03  - Load 3 into register B
@@ -759,9 +634,7 @@ function loadSampleProgram() {
     ];
     
     // Write the program to memory
-    program.forEach((byte, index) => {
-        writeToMemoryAt(index, byte);
-    });
+    await loadSegments([{ start: 0, data: program }]);
     
     // Reset the program counter to 0
     goToAddressAt(0);
@@ -769,6 +642,43 @@ function loadSampleProgram() {
     alert('Sample program loaded! This program adds 5 + 3 = 8');
 }
 
+// Base64-encode an array of byte values for /api/load
+function bytesToBase64(bytes) {
+    let raw = '';
+    // Chunked so large tables stay under the argument limit of fromCharCode
+    for (let i = 0; i < bytes.length; i += 0x8000) {
+        raw += String.fromCharCode.apply(null, bytes.slice(i, i + 0x8000));
+    }
+    return btoa(raw);
+}
+
+// Helper function to write runs of bytes in a single /api/load request.
+// `segments` is a list of { start, data } with data an array of byte
+// values; PC goes to `pc`, or to the first segment when it is omitted.
+async function loadSegments(segments, pc) {
+    const response = await fetch('/api/load', withMemoryVersion({
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            encoding: 'base64',
+            segments: segments.map(segment => ({
+                start: segment.start,
+                data: bytesToBase64(segment.data)
+            })),
+            pc: pc
+        }),
+    }));
+    
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.error || 'Failed to load memory');
+    }
+    
+    return syncMemory(await response.json());
+}
+
 // Helper function to write to memory at a specific address
 async function writeToMemoryAt(address, value) {
     try {
@@ -783,23 +693,25 @@ async function writeToMemoryAt(address, value) {
             throw new Error(`Invalid memory value: ${value}`);
         }
         
-        const response = await fetch('/api/write', {
+        const response = await fetch('/api/write', withMemoryVersion({
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({ 
                 address: address,
-                value: value
+                value: value,
+                // Only the written byte needs to come back
+                window: { start: address, length: 1 }
             }),
-        });
+        }));
         
         if (!response.ok) {
             const errorData = await response.json();
             throw new Error(errorData.error || 'Failed to write to memory');
         }
         
-        const result = await response.json();
+        const result = syncMemory(await response.json());
         console.log(`Successfully wrote to memory. New state:`, result);
         return result;
     } catch (error) {
@@ -812,13 +724,17 @@ async function writeToMemoryAt(address, value) {
 async function goToAddressAt(address) {
     try {
         console.log(`Navigating to address: 0x${address.toString(16).toUpperCase()}`);
-        const response = await fetch('/api/goto', {
+        const response = await fetch('/api/goto', withMemoryVersion({
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ address: address }),
-        });
+            body: JSON.stringify({
+                address: address,
+                // Only the 4 rows shown by the memory viewer
+                window: { start: Math.floor(address / 16) * 16, length: 64 }
+            }),
+        }));
         
         if (!response.ok) {
             let errorMsg = `Failed to go to address ${address.toString(16).toUpperCase()}`;
@@ -830,7 +746,7 @@ async function goToAddressAt(address) {
             throw new Error(errorMsg);
         }
         
-        const state = await response.json();
+        const state = syncMemory(await response.json());
 
         // Verify the structure of the received state
         if (!state || typeof state !== 'object' || !state.registers || !state.flags || !state.memory || !Array.isArray(state.memory)) {
@@ -952,6 +868,13 @@ document.addEventListener('DOMContentLoaded', function() {
         console.warn("Step instruction button not found");
     }
     
+    const stepBackBtn = document.getElementById('step-back');
+    if (stepBackBtn) {
+        stepBackBtn.addEventListener('click', stepBack);
+    } else {
+        console.warn("Step back button not found");
+    }
+    
     const runProgramBtn = document.getElementById('run-program');
     if (runProgramBtn) {
         runProgramBtn.addEventListener('click', runProgram);
@@ -1083,57 +1006,186 @@ async function runProgram() {
         
         console.log(`Starting program execution at address: 0x${startAddress.toString(16).toUpperCase()}`);
         
-        // Call the backend endpoint to run the program
-        const response = await fetch('/run_from_address', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ address: startAddress })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! Status: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        
-        if (!data.success) {
-            throw new Error(data.error || "Unknown error during program execution");
-        }
-        
-        console.log("Program execution completed, updating UI with results");
-        
-        // Update the UI with the final state
-        updateUI(data.state);
-        
         // Clear existing history
         clearInstructionHistory();
         
-        // Process each instruction in the execution trace from the server
-        if (data.instruction_history && Array.isArray(data.instruction_history)) {
-            console.log(`Adding ${data.instruction_history.length} instructions to history`);
+        // Call the backend endpoint to run the program; the trace is
+        // streamed into the history table while the program runs
+        let data = await postRunRequest('/run_from_address', { address: startAddress });
+        
+        // The server runs with an execution budget; a program that has not
+        // halted when it runs out comes back 'paused' and can be continued
+        while (true) {
+            console.log(`Run slice finished with status '${data.status}' after ${data.executed} instructions`);
             
-            data.instruction_history.forEach(instruction => {
-                updateInstructionHistoryTable(
-                    instruction.address,
-                    instruction.mnemonic,
-                    instruction.operand,
-                    instruction.machine_code
-                );
-            });
-        } else {
-            console.warn("No instruction history received from server");
+            // Update the UI with the state at the end of this slice
+            updateUI(syncMemory(data.state));
+            
+            if (data.status !== 'paused') {
+                break;
+            }
+            
+            const keepRunning = confirm(
+                `The program has not halted after ${data.executed} more instructions ` +
+                `(PC = ${formatHex(data.pc, 4)}H). Continue running?`
+            );
+            if (!keepRunning) {
+                break;
+            }
+            data = await postRunRequest('/api/continue', {});
         }
         
-        console.log("Program execution finished successfully");
-        alert('Program execution completed!');
+        if (data.status === 'error') {
+            alert('Program stopped: ' + data.error);
+        } else if (data.status === 'breakpoint') {
+            // Running again from the stop address resumes past the breakpoint
+            addressInput.value = formatHex(data.pc, 4);
+            alert(`Program stopped at ${formatHex(data.pc, 4)}H: ${describeHit(data.hit)}`);
+        } else if (data.status === 'halted') {
+            console.log("Program execution finished successfully");
+            alert('Program execution completed!');
+        }
     } catch (error) {
         console.error('Error running program:', error);
         alert('Error running program: ' + error.message);
     }
 }
 
+// Describe the breakpoint or watchpoint that stopped a run
+function describeHit(hit) {
+    if (hit.type === 'breakpoint') {
+        return 'breakpoint';
+    }
+    if (hit.type === 'watchpoint') {
+        return `${hit.access} of ${formatHex(hit.address, 4)}H by the instruction at ${formatHex(hit.instruction, 4)}H`;
+    }
+    return `${hit.register} ${hit.op} ${formatHex(hit.value, 2)}H after the instruction at ${formatHex(hit.instruction, 4)}H`;
+}
+
+// POST to a run endpoint with a streamed (NDJSON) trace. Trace records are
+// added to the history table as they arrive; returns the final result.
+async function postRunRequest(url, body) {
+    const response = await fetch(url, withMemoryVersion({
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ ...body, stream: 'ndjson', trace_format: 'binary' })
+    }));
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let data = null;
+    
+    const handleLine = (line) => {
+        if (!line.trim()) {
+            return;
+        }
+        const message = JSON.parse(line);
+        if (message.type === 'trace') {
+            if (message.records_binary !== undefined) {
+                appendRunHistory(decodeTraceRecords(message.records_binary, 100));
+            } else {
+                appendRunHistory(message.records);
+            }
+        } else if (message.type === 'progress') {
+            console.log(`Executed ${message.executed} instructions, PC = ${formatHex(message.pc, 4)}H`);
+        } else if (message.type === 'result') {
+            data = message;
+        }
+    };
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        lines.forEach(handleLine);
+    }
+    handleLine(buffered + decoder.decode());
+    
+    if (!data || !data.success) {
+        throw new Error((data && data.error) || "Unknown error during program execution");
+    }
+    
+    if (data.trace_truncated) {
+        console.log("Execution trace was truncated by the server");
+    }
+    
+    return data;
+}
+
+// Size in bytes of one binary trace record (TRACE_RECORD in app.py):
+// address (u16), opcode, two operand bytes, B C D E H L F A, SP (u16), pad
+const TRACE_RECORD_SIZE = 16;
+const TRACE_REGISTER_NAMES = ['B', 'C', 'D', 'E', 'H', 'L', 'F', 'A'];
+
+// Decode (the last `maxRecords` of) a base64 binary trace into history
+// entries, resolving mnemonics and lengths from INSTRUCTION_SET
+function decodeTraceRecords(encoded, maxRecords) {
+    const binary = atob(encoded);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    
+    const view = new DataView(bytes.buffer);
+    const count = Math.floor(bytes.length / TRACE_RECORD_SIZE);
+    const first = maxRecords ? Math.max(0, count - maxRecords) : 0;
+    const records = [];
+    
+    for (let i = first; i < count; i++) {
+        const offset = i * TRACE_RECORD_SIZE;
+        const address = view.getUint16(offset, true);
+        const code = [view.getUint8(offset + 2), view.getUint8(offset + 3), view.getUint8(offset + 4)];
+        const info = getInstructionInfo(code[0], code, 0);
+        const registers = {};
+        TRACE_REGISTER_NAMES.forEach((name, index) => {
+            registers[name] = view.getUint8(offset + 5 + index);
+        });
+        registers.SP = view.getUint16(offset + 13, true);
+        
+        records.push({
+            address: address,
+            opcode: code[0],
+            mnemonic: info.mnemonic,
+            operand: info.operand,
+            machine_code: info.machineCode,
+            registers: registers
+        });
+    }
+    
+    return records;
+}
+
+// Add the tail of a run's execution trace to the history table
+function appendRunHistory(instructionHistory) {
+    if (!instructionHistory || !Array.isArray(instructionHistory)) {
+        console.warn("No instruction history received from server");
+        return;
+    }
+    
+    console.log(`Received ${instructionHistory.length} instructions of history`);
+    
+    // The table only keeps the last 100 rows, so don't render the rest
+    instructionHistory.slice(-100).forEach(instruction => {
+        updateInstructionHistoryTable(
+            instruction.address,
+            instruction.mnemonic,
+            instruction.operand,
+            instruction.machine_code
+        );
+    });
+}
+
 // Get the length of an instruction in bytes
 function getInstructionLength(opcode) {
     // Instructions with 1 byte operand (2 bytes total)
@@ -1161,14 +1213,21 @@ function getInstructionLength(opcode) {
 }
 
 function updateMemoryDisplay() {
-    fetch('/get_memory')
-        .then(response => {
-            if (!response.ok) {
-                throw new Error(`HTTP error! Status: ${response.status}`);
-            }
-            return response.json();
-        })
-        .then(data => {
+    // Get current address from input field
+    const currentAddressInput = document.getElementById('memory-address');
+    if (!currentAddressInput) {
+        console.error('Memory address input not found');
+        return Promise.resolve();
+    }
+    
+    const currentAddress = parseInt(currentAddressInput.value, 16) || 0;
+    
+    // Calculate the starting address for display (aligned to 16-byte boundary)
+    const startAddress = Math.floor(currentAddress / 16) * 16;
+    
+    // Only the 4 displayed rows are fetched from the server
+    return fetchMemoryWindow(startAddress, 64)
+        .then(memoryWindow => {
             const memoryDisplay = document.getElementById('memory-display');
             if (!memoryDisplay) {
                 console.error('Memory display element not found');
@@ -1177,18 +1236,6 @@ function updateMemoryDisplay() {
             
             memoryDisplay.innerHTML = '';
             
-            // Get current address from input field
-            const currentAddressInput = document.getElementById('memory-address');
-            if (!currentAddressInput) {
-                console.error('Memory address input not found');
-                return;
-            }
-            
-            const currentAddress = parseInt(currentAddressInput.value, 16) || 0;
-            
-            // Calculate the starting address for display (aligned to 16-byte boundary)
-            const startAddress = Math.floor(currentAddress / 16) * 16;
-            
             // Display 4 rows of 16 bytes
             for (let row = 0; row < 4; row++) {
                 const rowAddress = startAddress + (row * 16);
@@ -1217,7 +1264,7 @@ function updateMemoryDisplay() {
                     cell.className = 'memory-cell';
                     
                     // Get the value at this address
-                    const value = data.memory[cellAddress] || 0;
+                    const value = memoryWindow.data[cellAddress - startAddress] || 0;
                     cell.textContent = value.toString(16).padStart(2, '0').toUpperCase();
                     
                     // Add address as data attribute
@@ -1229,7 +1276,7 @@ function updateMemoryDisplay() {
                     }
                     
                     // Highlight program counter
-                    if (cellAddress === data.registers.PC) {
+                    if (cellAddress === memoryWindow.pc) {
                         cell.classList.add('program-counter');
                     }
                     
@@ -1262,13 +1309,13 @@ async function runFromCurrentAddress() {
         const startAddress = parseInt(addressInput.value, 16);
         
         // Call the backend endpoint to run the program
-        const response = await fetch('/run_from_address', {
+        const response = await fetch('/run_from_address', withMemoryVersion({
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({ address: startAddress })
-        });
+        }));
         
         if (!response.ok) {
             throw new Error(`HTTP error! Status: ${response.status}`);
@@ -1281,7 +1328,7 @@ async function runFromCurrentAddress() {
         }
         
         // Update the UI with the final state
-        updateUI(data.state);
+        updateUI(syncMemory(data.state));
         
         // Add instructions to history
         const instructionHistory = document.getElementById('instruction-history');
@@ -1426,40 +1473,25 @@ async function loadSwapProgram() {
         // 200E: HLT         (76)       - Halt execution
         
         const program = [
-            { address: 0x2000, opcode: 0x3A }, // LDA 2500
-            { address: 0x2001, opcode: 0x00 },
-            { address: 0x2002, opcode: 0x25 },
-            { address: 0x2003, opcode: 0x47 }, // MOV B,A
-            { address: 0x2004, opcode: 0x3A }, // LDA 2501
-            { address: 0x2005, opcode: 0x01 },
-            { address: 0x2006, opcode: 0x25 },
-            { address: 0x2007, opcode: 0x32 }, // STA 2500
-            { address: 0x2008, opcode: 0x00 },
-            { address: 0x2009, opcode: 0x25 },
-            { address: 0x200A, opcode: 0x78 }, // MOV A,B
-            { address: 0x200B, opcode: 0x32 }, // STA 2501
-            { address: 0x200C, opcode: 0x01 },
-            { address: 0x200D, opcode: 0x25 },
-            { address: 0x200E, opcode: 0x76 }  // HLT
+            0x3A, 0x00, 0x25, // LDA 2500
+            0x47,             // MOV B,A
+            0x3A, 0x01, 0x25, // LDA 2501
+            0x32, 0x00, 0x25, // STA 2500
+            0x78,             // MOV A,B
+            0x32, 0x01, 0x25, // STA 2501
+            0x76              // HLT
         ];
         
-        // Initialize sample data at memory addresses
-        const data = [
-            { address: 0x2500, value: 0x55 }, // First value to swap
-            { address: 0x2501, value: 0xAA }  // Second value to swap
-        ];
+        // Sample data: the two values to swap at 2500 and 2501
+        const data = [0x55, 0xAA];
         
-        // Write program bytes to memory
-        for (const instruction of program) {
-            await writeToMemoryAt(instruction.address, instruction.opcode);
-        }
-        
-        // Write sample data
-        for (const item of data) {
-            await writeToMemoryAt(item.address, item.value);
-        }
+        // Write the program and its data in one request, with PC at 2000
+        await loadSegments([
+            { start: 0x2000, data: program },
+            { start: 0x2500, data: data }
+        ], 0x2000);
         
-        // Set program counter to start address
+        // Show the start address in the editor
         const addressInput = document.getElementById('memory-address');
         addressInput.value = '2000';
         
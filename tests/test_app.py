@@ -0,0 +1,45 @@
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('route', ['/run_from_address', '/api/continue'])
+@pytest.mark.parametrize('options', [{'stream': 'bogus'}, {'trace_format': 'bogus'}])
+def test_run_rejects_unknown_formats(client, route, options):
+    response = client.post(route, json=dict(options, address=0))
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+@pytest.mark.parametrize('registers, flags, message', [
+    ({'A': 300}, {}, 'Register A must be 0-FFH'),
+    ({'SP': 0x10000}, {}, 'Register SP must be 0-FFFFH'),
+    ({'B': 'zz'}, {}, 'Register B must be 0-FFH'),
+    ({'Q': 1}, {}, "Unknown register 'Q'"),
+    ({}, {'X': True}, "Unknown flag 'X'"),
+])
+def test_batch_rejects_bad_registers(client, registers, flags, message):
+    jobs = [{'program': '76', 'registers': registers, 'flags': flags},
+            {'program': '76', 'registers': {'A': '0x2C', 'PC': 0, 'SP': 0xFFFF}, 'flags': {'CY': True}}]
+    results = client.post('/api/batch', json={'jobs': jobs}).get_json()['results']
+    assert results[0]['success'] is False
+    assert results[0]['error'].startswith(message)
+    assert results[1]['success'] is True
+    assert results[1]['registers']['A'] == 0x2C
+
+
+@pytest.mark.parametrize('body', [
+    {'max_instructions': 'lots'},
+    {'time_limit': 'soon'},
+    {'max_instructions': [1]},
+    {'address': 'start'},
+])
+def test_job_rejects_bad_budget(client, body):
+    response = client.post('/api/jobs', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,31 @@
+import pytest
+
+from cpu8085 import Microprocessor8085
+
+
+def load(program):
+    cpu = Microprocessor8085()
+    cpu.load_program(bytes(program))
+    return cpu
+
+
+# MVI A,01H; MVI B,02H; ANA B; HLT and MVI A,01H; ANI 02H; HLT. Bit 3 of
+# every operand is clear, which is where the 8080 and the 8085 differ.
+@pytest.mark.parametrize('program', [
+    [0x3E, 0x01, 0x06, 0x02, 0xA0, 0x76],
+    [0x3E, 0x01, 0xE6, 0x02, 0x76],
+])
+def test_ana_sets_ac_and_clears_cy(program):
+    # Once through the block translator (run) and once per instruction
+    for stepped in (False, True):
+        cpu = load([0x37] + program)  # STC first, so CY starts set
+        if stepped:
+            for _ in program:
+                if cpu.execute_instruction().get('halt'):
+                    break
+        else:
+            assert cpu.run()['status'] == 'halted'
+        flags = cpu.flags.to_dict()
+        assert cpu.registers['A'] == 0x00
+        assert flags['AC'] and not flags['CY']
+        assert flags['Z'] and flags['P'] and not flags['S']